@@ -9,12 +9,16 @@ from gstwebrtcapp.run.builders import (
     make_connector,
     make_connector_coro,
     make_controller_coro,
+    make_coordinator_coro,
     make_feed_controller,
+    make_sharded_feed_controller,
+    parse_allocation_groups,
     parse_feed_configs,
     parse_mqtt_broker_config,
     parse_monitor_configs,
 )
 from gstwebrtcapp.run.feed_controller import FeedController
+from gstwebrtcapp.run.sharding import ShardedFeedController, get_feed_shard, get_shard_topic
 from gstwebrtcapp.run.wrappers import executor_wrapper, threaded_wrapper
 from gstwebrtcapp.utils.base import LOGGER
 
@@ -26,7 +30,7 @@ except ImportError:
 
 async def main(
     connectors: List[SinkConnector | AhoyConnector],
-    controller: FeedController | None,
+    controller: FeedController | ShardedFeedController | None,
     is_alloc_coro: bool = True,
 ) -> None:
     for connector in connectors:
@@ -39,7 +43,18 @@ async def main(
 
     tasks = []
 
-    if controller:
+    if isinstance(controller, ShardedFeedController):
+        # the shards run their own coroutines in their processes
+        tasks.append(
+            asyncio.create_task(
+                executor_wrapper(
+                    make_coordinator_coro,
+                    controller,
+                    is_raise_exception=False,
+                )
+            )
+        )
+    elif controller:
         tasks.append(
             asyncio.create_task(
                 executor_wrapper(
@@ -84,9 +99,24 @@ if __name__ == "__main__":
     parser.add_argument('-mp', '--mqtt-prefix', dest='mqtt_prefix', type=str, default="", help='MQTT prefix for all topics, e.g., main/gstreamer')
     parser.add_argument('-at', '--aggregation-topic', dest='aggregation_topic', type=str, default="internal/aggregation", help='aggregation topic. NOTE: if empty, there would be no allocation, individual agents actions are directly sent to connectors')
     parser.add_argument('-ct', '--controller-topic', dest='controller_topic', type=str, default="internal/controller", help='controller topic. NOTE: if empty, there would be no controller, i.e., one should send actions directly to each feed connector')
+    parser.add_argument('-as', '--allocation-strategy', dest='allocation_strategy', type=str, choices=["weights", "utility"], default="weights", help='allocation strategy: weights -- split by the static weights, utility -- maximize the total utility using the feeds stats')
+    parser.add_argument('-agc', '--allocation-groups-cfg', dest='allocation_groups_yaml', type=str, default=None, help='hierarchical allocation groups configuration (site -> uplink -> group -> feed)')
+    parser.add_argument('-pu', '--pool-uplink', dest='pool_uplink', action='store_true', help='allocate the bitrate against the shared uplink capacity pooled from the GCC estimates of all feeds')
+    parser.add_argument('-npt', '--no-passthrough', dest='no_passthrough', action='store_true', help='always aggregate the agents actions in the controller, otherwise the agents of the independent or the only allocated feed publish straight to their connectors')
+    parser.add_argument('-ns', '--num-shards', dest='num_shards', type=int, default=0, help='number of feed controller processes, the feeds are hash-partitioned between them. NOTE: 0 or 1 -- one in-process controller, not compatible with allocation groups')
+    parser.add_argument('-mtb', '--max-total-bitrate', dest='max_total_bitrate', type=float, default=0.0, help='global cap of the bitrate in kbps the shards share, 0 -- the sum of the shards demands. NOTE: num_shards must be > 1')
     parser.add_argument('-ec', '--external-controller', dest='external_controller', action='store_true', help='use external feed controller')
     parser.add_argument('-rm', '--recorder-modes', dest='recorder_modes', type=str, default="", help="c-s values, e.g.: 'mqtt':(prefix/feed_name/recorder), 'csv': (./logs/feed_name), 'dc' (feedname_recoder relay dc)')")
+    parser.add_argument('-rrw', '--recorder-relay-window', dest='recorder_relay_window', type=float, default=0.0, help='window in seconds to reduce the recorder stats relayed to the UI to, 0 -- relay every row. NOTE: recorder_modes must contain "dc"')
+    parser.add_argument('-rrm', '--recorder-relay-mode', dest='recorder_relay_mode', type=str, default="summary", choices=["summary", "lttb"], help='reduction of the relayed recorder stats per window: min/mean/max summary or the rows picked by LTTB')
     parser.add_argument('-bdc', '--bidirectional-data-channel', dest='bidirectional_data_channel', action='store_true', help='use bidirectional data channel (consumer -> producer leg). NOTE: recorder_modes must contain "dc"')
+    parser.add_argument('-nkp', '--no-keep-pipeline', dest='no_keep_pipeline', action='store_true', help='rebuild the whole pipeline for each viewer session of the ahoy connector, otherwise only its webrtcbin is swapped')
+    parser.add_argument('-wp', '--warm-pipeline', dest='warm_pipeline', action='store_true', help='build the pipelines of the ahoy connector feeds on start and keep them running until the first viewer comes')
+    parser.add_argument('-ti', '--trickle-ice', dest='trickle_ice', action='store_true', help='send the local ICE candidates of the ahoy connector feeds to the Director as soon as they are gathered. NOTE: the Director must support iceCandidate messages')
+    parser.add_argument('-ss', '--shared-signalling', dest='shared_signalling', action='store_true', help='signal all ahoy connector feeds over one shared connection to the Director. NOTE: the Director must support the feed registration over the signalling channel, otherwise the feeds fall back to own connections')
+    parser.add_argument('-mv', '--max-viewers', dest='max_viewers', type=int, default=1, help='max number of concurrent viewers of each ahoy connector feed, they share its encoder')
+    parser.add_argument('-dcbi', '--dc-batch-interval', dest='dc_batch_interval', type=float, default=0.0, help='interval in seconds to batch the messages sent over the external data channel within, 0 -- no batching')
+    parser.add_argument('-dcbin', '--dc-binary', dest='dc_binary', action='store_true', help='send the messages over the external data channel as binary zlib-compressed JSON. NOTE: the UI must support it')
     parser.add_argument('-w', '--warmup', dest='warmup', type=float, default=10.0, help='warmup time in seconds')
     # fmt: on
     args = parser.parse_args()
@@ -102,10 +132,25 @@ if __name__ == "__main__":
     mqtt_prefix = args.mqtt_prefix
     aggregation_topic = args.aggregation_topic
     controller_topic = args.controller_topic
+    allocation_strategy = args.allocation_strategy
+    allocation_groups_yaml = args.allocation_groups_yaml
+    pool_uplink = args.pool_uplink
+    num_shards = args.num_shards
+    max_total_bitrate = args.max_total_bitrate
+    no_passthrough = args.no_passthrough
     external_controller = args.external_controller
     recorder_modes = args.recorder_modes
+    recorder_relay_window = args.recorder_relay_window
+    recorder_relay_mode = args.recorder_relay_mode
     bidirectional_data_channel = args.bidirectional_data_channel
     warmup = args.warmup
+    no_keep_pipeline = args.no_keep_pipeline
+    warm_pipeline = args.warm_pipeline
+    trickle_ice = args.trickle_ice
+    shared_signalling = args.shared_signalling
+    max_viewers = args.max_viewers
+    dc_batch_interval = args.dc_batch_interval
+    dc_binary = args.dc_binary
 
     # create broker config
     broker_cfg = parse_mqtt_broker_config(broker_yaml)
@@ -113,9 +158,17 @@ if __name__ == "__main__":
     # create feed configs
     feed_cfgs = parse_feed_configs(feeds_yaml, connector_type)
 
+    # create allocation groups
+    allocation_groups = parse_allocation_groups(allocation_groups_yaml) if allocation_groups_yaml else None
+
     # create monitor configs
     ca_monitor_cfgs = parse_monitor_configs(control_agent_monitors_yaml) if control_agent_monitors_yaml else None
 
+    # the agents publish to the shard subtopics only if the sharded feed controller subscribes to them
+    is_sharded = num_shards > 1 and bool(controller_topic) and bool(aggregation_topic) and not external_controller
+    if is_sharded and allocation_groups:
+        raise ValueError("allocation groups are not supported with the sharded feed controller")
+
     # create connectors
     connectors = [
         make_connector(
@@ -130,18 +183,32 @@ if __name__ == "__main__":
             control_agent_model_file=control_agent_model_file,
             control_agent_monitor_configs=ca_monitor_cfgs,
             mqtt_prefix=mqtt_prefix,
-            aggregation_topic=aggregation_topic,
+            aggregation_topic=(
+                get_shard_topic(aggregation_topic, get_feed_shard(feed_name, num_shards))
+                if is_sharded
+                else aggregation_topic
+            ),
             controller_topic=controller_topic,
             recorder_modes=recorder_modes,
             is_bidirectional_data_channel=bidirectional_data_channel,
             warmup=warmup,
+            is_keep_pipeline=not no_keep_pipeline,
+            is_warm_pipeline=warm_pipeline,
+            is_trickle_ice=trickle_ice,
+            is_shared_signalling=shared_signalling,
+            max_viewers=max_viewers,
+            dc_batch_interval=dc_batch_interval,
+            is_dc_binary=dc_binary,
+            recorder_relay_window=recorder_relay_window,
+            recorder_relay_mode=recorder_relay_mode,
         )
         for feed_name, feed_cfg in feed_cfgs.items()
     ]
 
     # create feed controller
-    controller = (
-        make_feed_controller(
+    if is_sharded:
+        controller = make_sharded_feed_controller(
+            num_shards=num_shards,
             feeds=feed_cfgs,
             broker_config=broker_cfg,
             mqtt_prefix=mqtt_prefix,
@@ -149,10 +216,29 @@ if __name__ == "__main__":
             aggregation_topic=aggregation_topic,
             max_aggregation_time=control_agent_action_period * 2,
             warmup=warmup,
+            allocation_strategy=allocation_strategy,
+            is_pool_uplink=pool_uplink,
+            is_passthrough=not no_passthrough,
+            max_total_bitrate=max_total_bitrate or None,
+        )
+    else:
+        controller = (
+            make_feed_controller(
+                feeds=feed_cfgs,
+                broker_config=broker_cfg,
+                mqtt_prefix=mqtt_prefix,
+                controller_topic=controller_topic,
+                aggregation_topic=aggregation_topic,
+                max_aggregation_time=control_agent_action_period * 2,
+                warmup=warmup,
+                allocation_strategy=allocation_strategy,
+                allocation_groups=allocation_groups,
+                is_pool_uplink=pool_uplink,
+                is_passthrough=not no_passthrough,
+            )
+            if controller_topic and not external_controller
+            else None
         )
-        if controller_topic and not external_controller
-        else None
-    )
 
     # main
     try:
@@ -0,0 +1,23 @@
+from gstwebrtcapp.control.drl.sweep import DrlSweepConfig, DrlSweepRunner
+
+if __name__ == "__main__":
+    # FIXME: adapt params
+    config = DrlSweepConfig(
+        search_space={
+            "learning_rate": [1e-3, 3e-4, 1e-4],
+            "gamma": [0.9, 0.99],
+        },
+        model_name="sac",  # check control/drl/mconfigurator.py for available models
+        hyperparams_cfg="../gstwebrtcapp/control/drl/hparams/sac.json",  # base hyperparams, the searched ones override them
+        mdps=["viewer_seq", "viewer_seq_no_baseline"],  # check control/drl/sweep.py for available MDPs
+        reward_functions=["qoe_ahoy_seq", "qoe_ahoy_seq_sensible"],  # check control/drl/reward.py
+        strategy="random",  # or "grid"
+        num_trials=16,
+        traces=None,  # trace csv files, the bundled sample is used by default
+        episodes=30,
+        episode_length=256,
+        early_stopping_patience=5,
+        num_workers=4,
+        results_path="logs/sweep_results.csv",
+    )
+    DrlSweepRunner(config).run()
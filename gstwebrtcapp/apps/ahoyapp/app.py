@@ -12,8 +12,9 @@ License:
 
 """
 
-import asyncio
-from typing import Any, List
+from dataclasses import dataclass, field
+import time
+from typing import Any, Callable, Dict, List
 import gi
 
 gi.require_version("Gst", "1.0")
@@ -26,13 +27,44 @@ from gi.repository import GstWebRTC
 from gstwebrtcapp.apps.app import GstWebRTCApp, GstWebRTCAppConfig
 from gstwebrtcapp.apps.pipelines import BIN_H264_IN_H264_OUT_PIPELINE
 from gstwebrtcapp.utils.base import GSTWEBRTCAPP_EXCEPTION, LOGGER
+from gstwebrtcapp.utils.bridge import SignalBridge
 from gstwebrtcapp.utils.gst import DEFAULT_GCC_SETTINGS, get_app_transceiver_properties, dump_to_dot
 from gstwebrtcapp.utils.webrtc import TWCC_URI
 
+# webrtcbin properties set in the pipeline string that are carried over to a swapped webrtcbin
+WEBRTCBIN_SWAPPED_PROPERTIES = ("bundle-policy", "latency", "stun-server", "turn-server", "ice-transport-policy")
+# payloader properties carried over to the payloaders of the additional viewers
+PAYLOADER_COPIED_PROPERTIES = ("mtu", "pt", "config-interval", "aggregate-mode")
+
+
+@dataclass
+class AhoyViewer:
+    """
+    An additional viewer of the AhoyApp's encoded stream. It has its own branch after the tee that splits the encoded
+    stream: a queue, a payloader and webrtcbin, so its own RTP session, transceivers and stats.
+
+    :param str id: Viewer id, e.g., the uuid of its sdpRequest
+    :param Gst.Element webrtcbin: Viewer's webrtcbin
+    :param Gst.Pad tee_pad: Tee's request pad that feeds the viewer's branch
+    :param List[Gst.Element] elements: Elements of the viewer's branch
+    :param List[GstWebRTC.WebRTCRTPTransceiver] transceivers: Transceivers of the viewer's webrtcbin
+    :param bool is_waiting_keyframe: True if the branch skips the delta frames after a drop until the next keyframe
+    """
+
+    id: str
+    webrtcbin: Gst.Element
+    tee_pad: Gst.Pad
+    elements: List[Gst.Element] = field(default_factory=lambda: [])
+    transceivers: List[GstWebRTC.WebRTCRTPTransceiver] = field(default_factory=lambda: [])
+    is_waiting_keyframe: bool = False
+
 
 class AhoyApp(GstWebRTCApp):
     """
     An application that uses GStreamer's WEBRTCBIN plugin to stream the video source to the AhoyMedia WebRTC client.
+
+    Besides the main webrtcbin, the encoded stream could be fanned out to the additional viewers (see ``add_viewer``).
+    The source, the decoder and the encoder are shared, each viewer costs only its own packetization and SRTP.
     """
 
     def __init__(
@@ -42,6 +74,10 @@ class AhoyApp(GstWebRTCApp):
         self.pipeline = None
         self.webrtcbin = None
         self.webrtcbin_elements = []
+        self.webrtcbin_properties = {}
+        self.parked_sink = None
+        self.attach_time = time.monotonic()
+        self.first_frame_latency = None
         self.source = None
         self.raw_caps = None
         self.raw_capsfilter = None
@@ -49,7 +85,11 @@ class AhoyApp(GstWebRTCApp):
         self.pay_capsfilter = None
         self.transceivers = []
         self.gcc = None
-        self.gcc_estimated_bitrates = asyncio.Queue()
+        self.twcc_extension = None
+        self.tee = None
+        self.viewers: Dict[str, AhoyViewer] = {}
+        # notify::estimated-bitrate fires in a streaming thread on every change, only the latest one per 100 ms matters
+        self.gcc_estimated_bitrates = SignalBridge("gcc_estimated_bitrates", conflate_interval=0.1)
         self.bus = None
 
         super().__init__(config)
@@ -68,7 +108,9 @@ class AhoyApp(GstWebRTCApp):
             LOGGER.info("OK: webrtcbin is found in the pipeline")
             self.webrtcbin.connect('deep-element-added', self._cb_deep_element_added)
             for dc_cfg in self.data_channels_cfgs:
-                self.create_data_channel(dc_cfg["name"], dc_cfg["options"], dc_cfg["callbacks"])
+                self.create_data_channel(
+                    dc_cfg["name"], dc_cfg["options"], dc_cfg["callbacks"], dc_cfg.get("sender", None)
+                )
         else:
             raise GSTWEBRTCAPP_EXCEPTION("can't find webrtcbin in the pipeline")
 
@@ -88,8 +130,9 @@ class AhoyApp(GstWebRTCApp):
             raise GSTWEBRTCAPP_EXCEPTION("can't find needed elements in the pipeline")
 
         # set video source location
-        if self.source.get_property("location") is not None:
-            # NOTE: only sources with location property are supported now (Gst plugins of *src group)
+        if self.source.find_property("location") is not None and self.source.get_property("location") is not None:
+            # NOTE: only sources with location property are supported now (Gst plugins of *src group), the others,
+            # e.g., videotestsrc, are used as they are
             self.source.set_property("location", self.video_url)
             LOGGER.info(f"OK: video location is set to {self.video_url}")
 
@@ -121,6 +164,10 @@ class AhoyApp(GstWebRTCApp):
 
         LOGGER.info("OK: pipeline is built")
 
+        for sink_pad in self.webrtcbin.sinkpads:
+            if sink_pad.get_peer() is not None:
+                self._probe_first_frame(sink_pad.get_peer())
+
         # switch to playing state
         r = self.pipeline.set_state(Gst.State.PLAYING)
         if r != Gst.StateChangeReturn.SUCCESS:
@@ -137,13 +184,305 @@ class AhoyApp(GstWebRTCApp):
         self.gcc = Gst.ElementFactory.make("rtpgccbwe")
         if not self.gcc:
             raise GSTWEBRTCAPP_EXCEPTION("Can't create rtpgccbwe")
-        twcc_ext = GstRtp.RTPHeaderExtension.create_from_uri(TWCC_URI)
-        twcc_ext.set_id(1)
-        self.payloader.emit("add-extension", twcc_ext)
+        if self.twcc_extension is None:
+            # the payloader outlives swapped webrtcbins, the extension is added once
+            self.twcc_extension = GstRtp.RTPHeaderExtension.create_from_uri(TWCC_URI)
+            self.twcc_extension.set_id(1)
+            self.payloader.emit("add-extension", self.twcc_extension)
         self.webrtcbin.connect("request-aux-sender", self._cb_add_gcc)
         self.webrtcbin.connect('deep-element-added', lambda _, __, ___: None)
         LOGGER.info("OK: gcc is set")
 
+    def swap_webrtcbin(self) -> bool:
+        """
+        Attach a new webrtcbin for the next peer instead of the current one or of the parked sink. The capture,
+        decoding and encoding part of the pipeline stays in the PLAYING state, so a reconnecting peer does not wait for
+        the source and the encoder to start again.
+
+        :return: True if webrtcbin is swapped, False otherwise. Then the pipeline should be rebuilt.
+        """
+        if not self.is_running or not (self.is_webrtc_ready() or self.parked_sink):
+            return False
+        webrtcbin = Gst.ElementFactory.make("webrtcbin", "webrtc")
+        if not webrtcbin:
+            LOGGER.error("ERROR: can't swap webrtcbin, can't create a new one")
+            return False
+        for prop, value in self.webrtcbin_properties.items():
+            webrtcbin.set_property(prop, value)
+
+        def _setup_webrtcbin() -> None:
+            # the same setup as in _init_pipeline
+            self.webrtcbin = webrtcbin
+            self.webrtcbin_elements = []
+            self.webrtcbin.connect('deep-element-added', self._cb_deep_element_added)
+            if self.gcc_settings is not None:
+                self.set_gcc()
+            self.webrtcbin.connect('on-new-transceiver', self._cb_on_new_transceiver)
+            self.get_transceivers()
+            self.set_data_channels()
+            self.set_priority(self.priority)
+            self.set_fec_percentage(self.fec_percentage)
+
+        if not self._replace_branch_sink(webrtcbin, _setup_webrtcbin):
+            return False
+        self.parked_sink = None
+        LOGGER.info("OK: webrtcbin is swapped, the pipeline is kept running")
+        return True
+
+    def park_webrtcbin(self) -> bool:
+        """
+        Replace webrtcbin with a fakesink, e.g., when its peer has left or before the first peer comes. The pipeline
+        keeps running, so the source and the encoder are warm when the next peer attaches a new webrtcbin.
+
+        :return: True if webrtcbin is parked, False otherwise. Then the pipeline should be rebuilt.
+        """
+        if not self.is_running or not self.is_webrtc_ready():
+            return False
+        sink = Gst.ElementFactory.make("fakesink", "webrtc_parking")
+        if not sink:
+            LOGGER.error("ERROR: can't park webrtcbin, can't create fakesink")
+            return False
+        sink.set_property("sync", False)
+        sink.set_property("async", False)
+        sink.set_property("enable-last-sample", False)
+        if not self._replace_branch_sink(sink, None):
+            return False
+        self.parked_sink = sink
+        self.webrtcbin = None
+        LOGGER.info("OK: webrtcbin is parked, the pipeline is kept running")
+        return True
+
+    def _replace_branch_sink(self, new_sink: Gst.Element, setup: Callable[[], None] | None) -> bool:
+        # swaps the element the encoded branches end with, the branches are blocked meanwhile
+        old_sink = self.webrtcbin or self.parked_sink
+        if self.webrtcbin is not None:
+            self.webrtcbin_properties = {
+                prop: self.webrtcbin.get_property(prop) for prop in WEBRTCBIN_SWAPPED_PROPERTIES
+            }
+        self.attach_time = time.monotonic()
+        upstream_pads = []
+        try:
+            for sink_pad in old_sink.sinkpads:
+                upstream_pad = sink_pad.get_peer()
+                if upstream_pad is not None:
+                    probe_id = upstream_pad.add_probe(
+                        Gst.PadProbeType.BLOCK_DOWNSTREAM,
+                        lambda *_: Gst.PadProbeReturn.OK,
+                    )
+                    upstream_pads.append((upstream_pad, probe_id))
+                    upstream_pad.unlink(sink_pad)
+            self.close_data_channels_senders()
+            for data_channel in self.data_channels.values():
+                data_channel.emit('close')
+            old_sink.set_state(Gst.State.NULL)
+            self.pipeline.remove(old_sink)
+            self.transceivers = []
+            self.data_channels = {}
+            self.gcc = None
+
+            self.pipeline.add(new_sink)
+            for upstream_pad, _ in upstream_pads:
+                # fakesink has the static sink pad, webrtcbin has the request ones
+                sink_pad = new_sink.get_static_pad("sink") or new_sink.request_pad_simple("sink_%u")
+                if upstream_pad.link(sink_pad) != Gst.PadLinkReturn.OK:
+                    raise GSTWEBRTCAPP_EXCEPTION(f"can't link {upstream_pad.get_name()} to {new_sink.get_name()}")
+                self._probe_first_frame(upstream_pad)
+            if setup is not None:
+                setup()
+            if not new_sink.sync_state_with_parent():
+                raise GSTWEBRTCAPP_EXCEPTION(f"can't sync the state of {new_sink.get_name()} with the pipeline")
+        except Exception as e:
+            LOGGER.error(f"ERROR: can't replace {old_sink.get_name()} with {new_sink.get_name()}, reason: {e}")
+            return False
+        finally:
+            for upstream_pad, probe_id in upstream_pads:
+                upstream_pad.remove_probe(probe_id)
+        return True
+
+    def add_viewer(self, viewer_id: str) -> AhoyViewer | None:
+        """
+        Fan the encoded stream out to an additional viewer with its own webrtcbin. The encoded stream is split with a
+        tee on the first call, the main branch and the running viewers are not interrupted.
+
+        :param viewer_id: Viewer id
+        :return: The viewer whose webrtcbin is ready to negotiate, None if it can't be added.
+        """
+        if not self.is_running or viewer_id in self.viewers:
+            return None
+        if self.tee is None and not self._insert_tee():
+            return None
+        queue = Gst.ElementFactory.make("queue")
+        payloader = Gst.ElementFactory.make(self.payloader.get_factory().get_name())
+        capsfilter = Gst.ElementFactory.make("capsfilter")
+        webrtcbin = Gst.ElementFactory.make("webrtcbin")
+        if not queue or not payloader or not capsfilter or not webrtcbin:
+            LOGGER.error(f"ERROR: can't add viewer {viewer_id}, can't create its branch")
+            return None
+
+        # the viewer's queue drops the oldest buffers instead of stalling the tee and thus the other viewers. The frames
+        # after a drop reference the dropped ones, so the branch then skips to the next keyframe (see overrun handler)
+        queue.set_property("max-size-buffers", 10)
+        queue.set_property("max-size-time", 0)
+        queue.set_property("max-size-bytes", 0)
+        Gst.util_set_object_arg(queue, "leaky", "downstream")
+        queue.connect("overrun", self._on_viewer_queue_overrun, viewer_id)
+        for prop in PAYLOADER_COPIED_PROPERTIES:
+            if self.payloader.find_property(prop) is not None:
+                payloader.set_property(prop, self.payloader.get_property(prop))
+        if self.twcc_extension is not None:
+            twcc_extension = GstRtp.RTPHeaderExtension.create_from_uri(TWCC_URI)
+            twcc_extension.set_id(1)
+            payloader.emit("add-extension", twcc_extension)
+        capsfilter.set_property("caps", self.pay_capsfilter.get_property("caps"))
+        webrtcbin_properties = (
+            {prop: self.webrtcbin.get_property(prop) for prop in WEBRTCBIN_SWAPPED_PROPERTIES}
+            if self.webrtcbin is not None
+            else self.webrtcbin_properties
+        )
+        for prop, value in webrtcbin_properties.items():
+            webrtcbin.set_property(prop, value)
+
+        elements = [queue, payloader, capsfilter, webrtcbin]
+        tee_pad = None
+        try:
+            for element in elements:
+                self.pipeline.add(element)
+            if not queue.link(payloader) or not payloader.link(capsfilter):
+                raise GSTWEBRTCAPP_EXCEPTION("can't link the viewer's payloader")
+            if capsfilter.get_static_pad("src").link(webrtcbin.request_pad_simple("sink_%u")) != Gst.PadLinkReturn.OK:
+                raise GSTWEBRTCAPP_EXCEPTION("can't link the viewer's payloader to its webrtcbin")
+            viewer = AhoyViewer(id=viewer_id, webrtcbin=webrtcbin, tee_pad=None, elements=elements)
+            index = 0
+            while (transceiver := webrtcbin.emit('get-transceiver', index)) is not None:
+                self.set_app_transceiver_properties(
+                    transceiver=transceiver,
+                    props_dict=get_app_transceiver_properties(self.transceiver_settings),
+                )
+                viewer.transceivers.append(transceiver)
+                index += 1
+            if not viewer.transceivers:
+                raise GSTWEBRTCAPP_EXCEPTION("can't get any single transceiver from the viewer's webrtcbin")
+            for transceiver in viewer.transceivers:
+                transceiver.set_property("fec-percentage", self.fec_percentage)
+            # downstream elements first, so that the first buffers are not pushed into a stopped element
+            for element in reversed(elements):
+                if not element.sync_state_with_parent():
+                    raise GSTWEBRTCAPP_EXCEPTION(f"can't sync the state of {element.get_name()} with the pipeline")
+            tee_pad = self.tee.request_pad_simple("src_%u")
+            if tee_pad.link(queue.get_static_pad("sink")) != Gst.PadLinkReturn.OK:
+                raise GSTWEBRTCAPP_EXCEPTION("can't link the viewer's branch to the tee")
+            viewer.tee_pad = tee_pad
+        except Exception as e:
+            LOGGER.error(f"ERROR: can't add viewer {viewer_id}, reason: {e}")
+            if tee_pad is not None:
+                self.tee.release_request_pad(tee_pad)
+            for element in elements:
+                element.set_state(Gst.State.NULL)
+                if element.get_parent() is not None:
+                    self.pipeline.remove(element)
+            return None
+
+        self.viewers[viewer_id] = viewer
+        LOGGER.info(f"OK: viewer {viewer_id} is added, total {len(self.viewers)} additional viewers")
+        return viewer
+
+    def remove_viewer(self, viewer_id: str) -> bool:
+        """
+        Release the additional viewer's branch. The encoded stream keeps flowing to the other branches.
+
+        :param viewer_id: Viewer id
+        :return: True if the viewer is removed, False if there is no such viewer.
+        """
+        viewer = self.viewers.pop(viewer_id, None)
+        if viewer is None:
+            return False
+        probe_id = viewer.tee_pad.add_probe(Gst.PadProbeType.BLOCK_DOWNSTREAM, lambda *_: Gst.PadProbeReturn.OK)
+        viewer.tee_pad.unlink(viewer.elements[0].get_static_pad("sink"))
+        viewer.tee_pad.remove_probe(probe_id)
+        self.tee.release_request_pad(viewer.tee_pad)
+        for element in viewer.elements:
+            element.set_state(Gst.State.NULL)
+            self.pipeline.remove(element)
+        LOGGER.info(f"OK: viewer {viewer_id} is removed, total {len(self.viewers)} additional viewers")
+        return True
+
+    def _on_viewer_queue_overrun(self, queue: Gst.Element, viewer_id: str) -> None:
+        # in a streaming thread, the leaky queue is about to drop its oldest buffer
+        viewer = self.viewers.get(viewer_id, None)
+        if viewer is None or viewer.is_waiting_keyframe:
+            return
+        viewer.is_waiting_keyframe = True
+
+        def _cb_drop_until_keyframe(_, info) -> Gst.PadProbeReturn:
+            if info.get_buffer().has_flags(Gst.BufferFlags.DELTA_UNIT):
+                return Gst.PadProbeReturn.DROP
+            viewer.is_waiting_keyframe = False
+            return Gst.PadProbeReturn.REMOVE
+
+        _ = queue.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, _cb_drop_until_keyframe)
+        LOGGER.warning(f"WARNING: viewer {viewer_id} is lagging behind, its branch skips to the next keyframe")
+        self.request_keyframe()
+
+    def _insert_tee(self) -> bool:
+        # splits the encoded stream in front of the main payloader, the main branch is blocked meanwhile
+        payloader_pad = self.payloader.get_static_pad("sink")
+        upstream_pad = payloader_pad.get_peer()
+        if upstream_pad is None:
+            LOGGER.error("ERROR: can't insert tee, the payloader is not linked")
+            return False
+        tee = Gst.ElementFactory.make("tee", "viewers_tee")
+        if not tee:
+            LOGGER.error("ERROR: can't insert tee, can't create it")
+            return False
+        # a viewer's branch being (un)linked must not stop the stream
+        tee.set_property("allow-not-linked", True)
+        probe_id = upstream_pad.add_probe(Gst.PadProbeType.BLOCK_DOWNSTREAM, lambda *_: Gst.PadProbeReturn.OK)
+        try:
+            upstream_pad.unlink(payloader_pad)
+            self.pipeline.add(tee)
+            if upstream_pad.link(tee.get_static_pad("sink")) != Gst.PadLinkReturn.OK:
+                raise GSTWEBRTCAPP_EXCEPTION("can't link the encoded stream to the tee")
+            if tee.request_pad_simple("src_%u").link(payloader_pad) != Gst.PadLinkReturn.OK:
+                raise GSTWEBRTCAPP_EXCEPTION("can't link the tee to the payloader")
+            if not tee.sync_state_with_parent():
+                raise GSTWEBRTCAPP_EXCEPTION("can't sync the state of the tee with the pipeline")
+        except Exception as e:
+            LOGGER.error(f"ERROR: can't insert tee, reason: {e}")
+            return False
+        finally:
+            upstream_pad.remove_probe(probe_id)
+        self.tee = tee
+        LOGGER.info("OK: tee is inserted, the encoded stream could be fanned out to the additional viewers")
+        return True
+
+    def _probe_first_frame(self, pad: Gst.Pad) -> None:
+        # time-to-first-frame: from the creation of the pipeline or from the swap of its sink to the first keyframe
+        # handed over to it, the delta frames before it can't be decoded by the peer
+        self.first_frame_latency = None
+
+        def _cb_first_keyframe(_, info: Gst.PadProbeInfo) -> Gst.PadProbeReturn:
+            if info.get_buffer().has_flags(Gst.BufferFlags.DELTA_UNIT):
+                return Gst.PadProbeReturn.OK
+            self.first_frame_latency = time.monotonic() - self.attach_time
+            LOGGER.info(f"INFO: first keyframe has reached the branch sink in {self.first_frame_latency * 1000:.0f} ms")
+            return Gst.PadProbeReturn.REMOVE
+
+        _ = pad.add_probe(Gst.PadProbeType.BUFFER, _cb_first_keyframe)
+
+    def request_keyframe(self) -> bool:
+        """
+        Request a keyframe with the headers from the encoder, e.g., for a peer joining the running stream.
+
+        :return: True if the request is sent to the encoder, False otherwise.
+        """
+        if not self.encoder:
+            return False
+        event = Gst.Event.new_custom(
+            Gst.EventType.CUSTOM_UPSTREAM,
+            Gst.Structure.new_from_string("GstForceKeyUnit, all-headers=(boolean)true"),
+        )
+        return self.encoder.get_static_pad("src").send_event(event)
+
     def get_transceivers(self) -> List[GstWebRTC.WebRTCRTPTransceiver]:
         # get transceivers from webrtcbin and set NACK and FEC properties
         if len(self.transceivers) > 0:
@@ -246,6 +585,9 @@ class AhoyApp(GstWebRTCApp):
         else:
             for transceiver in self.transceivers:
                 transceiver.set_property("fec-percentage", percentage)
+            for viewer in self.viewers.values():
+                for transceiver in viewer.transceivers:
+                    transceiver.set_property("fec-percentage", percentage)
 
         self.fec_percentage = percentage
         return True
@@ -303,6 +645,6 @@ class AhoyApp(GstWebRTCApp):
     def _on_estimated_bitrate_changed(self, bwe, pspec) -> None:
         if bwe and pspec.name == "estimated-bitrate":
             estimated_bitrate = self.gcc.get_property(pspec.name)
-            self.gcc_estimated_bitrates.put_nowait(estimated_bitrate)
+            self.gcc_estimated_bitrates.emit(estimated_bitrate)
         else:
             raise GSTWEBRTCAPP_EXCEPTION("Can't get estimated bitrate by gcc")
@@ -11,12 +11,12 @@ License:
 
 """
 
-from aiortc import RTCPeerConnection, RTCSessionDescription, RTCConfiguration, RTCIceServer
+from aiortc import RTCPeerConnection, RTCConfiguration
 import asyncio
 import json
-import requests
 import threading
-from typing import List
+import time
+from typing import Any, Dict, List, Tuple
 
 import gi
 
@@ -29,15 +29,21 @@ from gi.repository import GstSdp
 from gi.repository import GstWebRTC
 
 from gstwebrtcapp.apps.app import GstWebRTCAppConfig
-from gstwebrtcapp.apps.ahoyapp.app import AhoyApp
+from gstwebrtcapp.apps.ahoyapp.app import AhoyApp, AhoyViewer
+from gstwebrtcapp.apps.ahoyapp.director import DirectorClient
+from gstwebrtcapp.apps.ahoyapp.signalling import DEFAULT_ICE_SERVERS, DirectorSignallingMux, connect_pc_out
 from gstwebrtcapp.control.agent import Agent, AgentType
 from gstwebrtcapp.control.safety.switcher import SwitchingPair
 from gstwebrtcapp.media.preset import get_video_preset, get_video_preset_by_bitrate
-from gstwebrtcapp.message.client import MqttConfig, MqttPair, MqttPublisher, MqttSubscriber
+from gstwebrtcapp.message.client import MqttConfig, MqttPair, MqttPassthrough, MqttPublisher, MqttSubscriber
 from gstwebrtcapp.network.controller import NetworkController
 from gstwebrtcapp.utils.app import get_agent_type_by_switch_code, get_switch_code_by_agent_type
-from gstwebrtcapp.utils.base import LOGGER, wait_for_condition, async_wait_for_condition
-from gstwebrtcapp.utils.gst import GstWebRTCStatsType, find_stat, stats_to_dict
+from gstwebrtcapp.utils.base import LOGGER, GSTWEBRTCAPP_EXCEPTION, async_wait_for_condition
+from gstwebrtcapp.utils.bridge import SignalBridge
+from gstwebrtcapp.utils.gst import GstWebRTCStatsType, await_promise, find_stat, stats_to_dict
+
+# timeout in seconds of a webrtcbin stats request, the stats are requested every 100 ms
+STATS_TIMEOUT = 1.0
 
 
 class AhoyConnector:
@@ -55,6 +61,19 @@ class AhoyConnector:
     :param network_controller: Network controller that optionally controls the network rules. Nullable.
     :param switching_pair: Pair of agents for safety detector and switching. Nullable.
     :param share_ice_topic: Topic for sharing ICE candidates. Nullable.
+    :param signalling_mux: Signalling multiplexer shared by the feeds of the process instead of the own connection
+        to the Director. If the feed can't be attached to it, the feed connects on its own. Nullable.
+    :param is_keep_pipeline: If True, the pipeline keeps running between the sessions and only its webrtcbin is
+        swapped for the next peer. Otherwise, the pipeline is rebuilt for each session.
+    :param is_warm_pipeline: If True, the pipeline is built on connecting and runs into a parked sink until the first
+        peer comes, so the first peer does not wait for the pipeline to start.
+    :param is_trickle_ice: If True, the local ICE candidates are sent to the Director with ``iceCandidate`` messages as
+        soon as they are gathered. The remote ones are always applied on arrival.
+    :param max_viewers: Max number of concurrent viewers of the feed. The viewers joining the running session get their
+        own webrtcbin fed by the shared encoder, their stats are published to the stats topic + ``/<sdpRequest uuid>``.
+    :param max_session_retries: Max number of successive sessions failed with an exception to await the next one after.
+    :param session_backoff: Initial and max backoff in seconds before awaiting the next session after a failed one.
+        A session that lasted longer than the max backoff resets the series of failures.
     """
 
     def __init__(
@@ -70,15 +89,31 @@ class AhoyConnector:
         network_controller: NetworkController | None = None,
         switching_pair: SwitchingPair | None = None,
         share_ice_topic: str | None = None,
+        signalling_mux: DirectorSignallingMux | None = None,
+        is_keep_pipeline: bool = True,
+        is_warm_pipeline: bool = False,
+        is_trickle_ice: bool = False,
+        max_viewers: int = 1,
+        max_session_retries: int = 5,
+        session_backoff: Tuple[float, float] = (1.0, 30.0),
     ):
         self.server = server
         self.api_key = api_key
         self.feed_name = feed_name
-
-        # pc_out is used to send SDP offer to Ahoy and receive SDP answer to set the signalling data channel
-        self.pc_out = RTCPeerConnection(RTCConfiguration([RTCIceServer("stun:stun.l.google.com:19302")]))
-        self.signalling_channel = self.pc_out.createDataChannel(signalling_channel_name, ordered=True)
-        self.stats_channel = self.pc_out.createDataChannel(stats_channel_name, ordered=True)
+        # the feeds of the process registering at the same Director share its client
+        self.director = DirectorClient.get_shared(self.server)
+
+        # pc_out is used to send SDP offer to Ahoy and receive SDP answer to set the signalling data channel.
+        # With the signalling multiplexer, the feeds of the process share its connection instead
+        self.signalling_mux = signalling_mux
+        self.signalling_channel_name = signalling_channel_name
+        self.stats_channel_name = stats_channel_name
+        self.pc_out = None
+        self.signalling_channel = None
+        self.stats_channel = None
+        if self.signalling_mux is None:
+            self._make_pc_out()
+        self.loop = None
 
         # internal webrtc
         self._app = None
@@ -87,6 +122,8 @@ class AhoyConnector:
         self.webrtcbin_sdp = None
         self.webrtcbin_ice_connection_state = GstWebRTC.WebRTCICEConnectionState.NEW
         self.pc_out_ice_connection_state = "new"
+        # wakes up the ICE connection handler on every state change of webrtcbin or pc_out
+        self.ice_connection_state_changes = SignalBridge("ice_connection_state_changes", maxsize=8)
 
         # agents
         self.agents = {}
@@ -110,160 +147,277 @@ class AhoyConnector:
 
         self.webrtc_coro_control_task = None
 
+        # sessions
+        self.is_keep_pipeline = is_keep_pipeline
+        self.is_warm_pipeline = is_warm_pipeline
+        self.is_trickle_ice = is_trickle_ice
+        self.sdp_request_uuid = None
+        self.is_answer_sent = False
+        self.setup_start_time = time.monotonic()
+        self.setup_stats = {"answer_ms": None, "connected_ms": None}
+        self._sdp_request_task = None
+        self._viewer_tasks = set()
+        self.stats_requests_counters = {"sent": 0, "skipped": 0, "failed": 0}
+        # viewer id -> its latest receiver reports (remote inbound RTP stats) merged into the feed's stats
+        self.viewers_stats: Dict[str, List[Dict[str, Any]]] = {}
+        self._pending_local_candidates = []
+        self.max_viewers = max(1, max_viewers)
+        self.is_pipeline_kept = False
+        self._ice_state_handler_id = None
+        self._pipeline_task = None
+        self.max_session_retries = max_session_retries
+        self.session_backoff = session_backoff
+        self.session_stats = {"started": 0, "stopped": 0, "interrupted": 0, "failed": 0, "restarts": 0}
+        self._session_tasks = []
+
     async def connect_coro(self) -> None:
         LOGGER.info(f"OK: connecting to AhoyMedia...")
+        self.loop = asyncio.get_running_loop()
+
+        if self.is_warm_pipeline and self._app is None:
+            await self._warm_up_pipeline()
+
+        if self.signalling_mux is not None:
+            try:
+                await self.signalling_mux.attach(self)
+                LOGGER.info(f"OK: feed {self.feed_name} signals over the shared connection, waiting for messages...")
+                return
+            except GSTWEBRTCAPP_EXCEPTION as e:
+                LOGGER.warning(f"WARNING: {e}, feed {self.feed_name} connects on its own...")
+                self.signalling_mux = None
+                self._make_pc_out()
 
         # set handlers for pc_out
         self._set_pc_out_handlers()
 
-        # create local offer
-        local_offer = await self.pc_out.createOffer()
-        await self.pc_out.setLocalDescription(local_offer)
-
-        # send request to ahoy director
-        headers = {
-            "accept": "application/json",
-            "x-api-key": self.api_key,
-            "content-type": "application/json",
-        }
-        data = {
-            "sdp": self.pc_out.localDescription.sdp,
-            "candidates": "",
-            "capabilities": {"video": {"codecs": [self.app_config.codec.upper()]}},
-            "name": self.feed_name,
-        }
-        request = requests.post(
-            self.server + requests.utils.quote(self.feed_name),
-            headers=headers,
-            data=json.dumps(data),
-        )
-        LOGGER.info(f"INFO: connect, request ... {request}")
-        LOGGER.info(f"INFO: connect, request.status_code ... {request.status_code}")
-
-        # retrieve response
-        response = request.json()
-        LOGGER.info(f"INFO: connect_pc_out, response ... {response}")
-
-        # create sdp with candidates
-        sdp_lines = response["sdp"].split("\r\n")[:-1]
-        sdp_candidates = [f"a={candidate['candidate']}" for candidate in response["candidates"]]
-        remote_sdp = "\r\n".join([*sdp_lines, *sdp_candidates, ""])
-        LOGGER.info(f"INFO: connect_pc_out, remote_sdp ... {remote_sdp}")
-
-        # create remote answer
-        remote_answer = RTCSessionDescription(type="answer", sdp=remote_sdp)
-        await self.pc_out.setRemoteDescription(remote_answer)
+        await connect_pc_out(self.pc_out, self.director, self.feed_name, self.api_key, self.app_config.codec)
         LOGGER.info(f"OK: webrtc signalling is finished, waiting for messages on signalling channel...")
 
+    def _make_pc_out(self) -> None:
+        self.pc_out = RTCPeerConnection(RTCConfiguration(DEFAULT_ICE_SERVERS))
+        self.signalling_channel = self.pc_out.createDataChannel(self.signalling_channel_name, ordered=True)
+        self.stats_channel = self.pc_out.createDataChannel(self.stats_channel_name, ordered=True)
+
     def _set_pc_out_handlers(self) -> None:
         @self.pc_out.on("connectionstatechange")
         async def on_connectionstatechange() -> None:
             LOGGER.info(f"INFO: on_connectionstatechange, pc_out ... {self.pc_out.connectionState}")
-            self.pc_out_ice_connection_state = self.pc_out.connectionState
+            self._on_pc_out_state_change(self.pc_out.connectionState)
 
         @self.signalling_channel.on("message")
         async def on_message(msg) -> None:
-            msg = json.loads(msg)
-            if "streamStartRequest" in msg:
-                # streamStartRequest is received when the stream is played on the Ahoy side
-                if msg["streamStartRequest"]["feedUuid"] == self.feed_name:
-                    LOGGER.info(f"INFO: SIGNALLING CHANNEL received streamStartRequest {msg}")
+            self._handle_signalling_message(json.loads(msg))
+
+        @self.stats_channel.on("message")
+        async def on_message(msg) -> None:
+            # TODO: currently nothing comes from Ahoy to trigger this handler
+            LOGGER.info(f"INFO: STATS CHANNEL received stats message {msg}")
+
+    def _on_pc_out_state_change(self, state: str) -> None:
+        self.pc_out_ice_connection_state = state
+        self.ice_connection_state_changes.emit(self.pc_out_ice_connection_state)
+
+    def _handle_signalling_message(self, msg: Dict[str, Any]) -> None:
+        # messages from the signalling channel
+        if "streamStartRequest" in msg:
+            # streamStartRequest is received when the stream is played on the Ahoy side
+            if msg["streamStartRequest"]["feedUuid"] == self.feed_name:
+                LOGGER.info(f"INFO: SIGNALLING CHANNEL received streamStartRequest {msg}")
 
-                    self.is_running = True
+                self.is_running = True
+                if self.max_viewers == 1 or self.webrtc_coro_control_task is None:
+                    # with several viewers, the next viewer's sdpRequest should not restart the running session
                     self.is_locked = False
 
-                    streamStartResponse = {
-                        "streamStartResponse": {
-                            "success": True,
-                            "uuid": msg["streamStartRequest"]["uuid"],
-                            "feedUuid": msg["streamStartRequest"]["feedUuid"],
-                        }
+                streamStartResponse = {
+                    "streamStartResponse": {
+                        "success": True,
+                        "uuid": msg["streamStartRequest"]["uuid"],
+                        "feedUuid": msg["streamStartRequest"]["feedUuid"],
                     }
-                    data = {
-                        "message": {
-                            "to": f"director.api_{self.api_key}",
-                            "payload": streamStartResponse,
-                        }
-                    }
-                    self.signalling_channel.send(json.dumps(data))
-            elif "sdpRequest" in msg:
-                # sdpRequest is received next after streamStartRequest to set up the WebRTC connection
-                if not self.is_locked:
-                    self.is_locked = True
-                    LOGGER.info(f"INFO: SIGNALLING CHANNEL received sdpRequest {msg}")
+                }
+                self._send_signalling_message(streamStartResponse)
+        elif "sdpRequest" in msg:
+            # sdpRequest is received next after streamStartRequest to set up the WebRTC connection
+            if not self.is_locked:
+                self.is_locked = True
+                LOGGER.info(f"INFO: SIGNALLING CHANNEL received sdpRequest {msg}")
+                # the answer is awaited in a task, the loop keeps serving the signalling meanwhile
+                self._sdp_request_task = asyncio.create_task(self._handle_sdp_request(msg["sdpRequest"]))
+            elif self._is_viewer_slot_free(msg["sdpRequest"]["uuid"]):
+                LOGGER.info(f"INFO: SIGNALLING CHANNEL received sdpRequest of an additional viewer {msg}")
+                self._add_viewer(msg["sdpRequest"])
+        elif "iceCandidate" in msg:
+            # a trickled remote candidate, webrtcbin queues it if the remote description is not set yet
+            if msg["iceCandidate"].get("feedUuid", self.feed_name) == self.feed_name and self.is_locked:
+                candidate = msg["iceCandidate"]
+                if self._app is not None and candidate.get("uuid", None) in self._app.viewers:
+                    webrtcbin = self._app.viewers[candidate["uuid"]].webrtcbin
+                    webrtcbin.emit('add-ice-candidate', candidate['sdpMLineIndex'], candidate['candidate'])
+                elif self._app is not None and self._app.is_webrtc_ready():
+                    self._app.webrtcbin.emit('add-ice-candidate', candidate['sdpMLineIndex'], candidate['candidate'])
+        elif "streamStopRequest" in msg:
+            # streamStopRequest is received when the stream is stopped on the Ahoy side
+            if msg["streamStopRequest"]["feedUuid"] == self.feed_name:
+                if self._app is not None and msg["streamStopRequest"].get("uuid", None) in self._app.viewers:
+                    # only an additional viewer has left
+                    LOGGER.info(f"INFO: SIGNALLING CHANNEL received streamStopRequest of an additional viewer {msg}")
+                    self._remove_viewer(msg["streamStopRequest"]["uuid"])
+                elif self.is_running:
+                    LOGGER.info(f"INFO: SIGNALLING CHANNEL received streamStopRequest {msg}")
+                    is_first_viewer = msg["streamStopRequest"].get("uuid", None) == self.sdp_request_uuid
+                    if is_first_viewer and self._app is not None and self._app.viewers and self._app.is_webrtc_ready():
+                        # the first viewer has left, the additional ones keep the session running
+                        self._release_first_viewer()
+                    else:
+                        self._stop_session()
+        else:
+            LOGGER.info(f"INFO: SIGNALLING CHANNEL received currently unhandled message {msg}")
 
-                    self._on_received_sdp_request(msg["sdpRequest"]["sdp"])
+    async def _handle_sdp_request(self, sdp_request: Dict[str, Any]) -> None:
+        self.setup_start_time = time.monotonic()
+        self.setup_stats = {"answer_ms": None, "connected_ms": None}
+        self.sdp_request_uuid = sdp_request["uuid"]
+        self.is_answer_sent = False
+        self._pending_local_candidates = []
 
-                    wait_for_condition(lambda: self.webrtcbin_sdp is not None, self._app.max_timeout)
-                    LOGGER.info(
-                        f"INFO: on_message, succesfully created local answer for webrtcbin on incoming SDP request..."
-                    )
-
-                    candidates = msg["sdpRequest"]["candidates"]
-                    for candidate in candidates:
-                        LOGGER.info(f"INFO: on_message, adding ice candidate ... {candidate['candidate']}")
-                        self._app.webrtcbin.emit(
-                            'add-ice-candidate', candidate['sdpMLineIndex'], candidate['candidate']
-                        )
+        remote_offer = await self._on_received_sdp_request(sdp_request["sdp"])
+        if remote_offer is None:
+            return
+        try:
+            answer = await self._negotiate(self._app.webrtcbin, remote_offer, sdp_request["candidates"])
+        except (asyncio.TimeoutError, GSTWEBRTCAPP_EXCEPTION) as e:
+            LOGGER.error(f"ERROR: feed {self.feed_name} has failed to create the answer, reason: {str(e) or 'timeout'}")
+            self.terminate_webrtc_coro()
+            return
+        self.webrtcbin_sdp = answer.sdp
+        LOGGER.info(f"INFO: on_message, succesfully created local answer for webrtcbin on incoming SDP request...")
+
+        sdpResponse = {
+            "sdpResponse": {
+                "success": True,
+                "uuid": self.sdp_request_uuid,
+                "sdp": answer.sdp.as_text(),
+            }
+        }
+        self._send_signalling_message(sdpResponse)
+        self.is_answer_sent = True
+        self.setup_stats["answer_ms"] = round((time.monotonic() - self.setup_start_time) * 1000)
+        LOGGER.info(f"INFO: feed {self.feed_name} has answered the SDP request in {self.setup_stats['answer_ms']} ms")
+        # the candidates gathered before the answer follow it
+        for candidate in self._pending_local_candidates:
+            self._send_signalling_message(candidate)
+        self._pending_local_candidates = []
+
+    def _on_local_ice_candidate(self, _, sdp_mline_index: int, candidate: str) -> None:
+        # in a GStreamer thread
+        payload = {
+            "iceCandidate": {
+                "uuid": self.sdp_request_uuid,
+                "feedUuid": self.feed_name,
+                "candidate": candidate,
+                "sdpMLineIndex": sdp_mline_index,
+            }
+        }
+        self.loop.call_soon_threadsafe(self._trickle_local_ice_candidate, payload)
 
-                    sdpResponse = {
-                        "sdpResponse": {
-                            "success": True,
-                            "uuid": msg["sdpRequest"]["uuid"],
-                            "sdp": self.webrtcbin_sdp.as_text(),
-                        }
-                    }
-                    data = {"message": {"to": f"director.api_{self.api_key}", "payload": sdpResponse}}
-                    self.signalling_channel.send(json.dumps(data))
-            elif "streamStopRequest" in msg:
-                # streamStopRequest is received when the stream is stopped on the Ahoy side
-                if msg["streamStopRequest"]["feedUuid"] == self.feed_name:
-                    if self.is_running:
-                        LOGGER.info(f"INFO: SIGNALLING CHANNEL received streamStopRequest {msg}")
-                        if self.mqtts.publisher.client.is_connected() and self.mqtt_config.topics.controller:
-                            # if it is terminated by the UI, notify the controller
-                            self.mqtts.publisher.publish(
-                                self.mqtt_config.topics.controller,
-                                json.dumps({self.feed_name: {"off": False}}),
-                            )
-                        self.terminate_webrtc_coro(is_restart_webrtc_coro=True)
-            else:
-                LOGGER.info(f"INFO: SIGNALLING CHANNEL received currently unhandled message {msg}")
+    def _trickle_local_ice_candidate(self, payload: Dict[str, Any]) -> None:
+        if self.is_answer_sent:
+            self._send_signalling_message(payload)
+        else:
+            self._pending_local_candidates.append(payload)
 
-        @self.stats_channel.on("message")
-        async def on_message(msg) -> None:
-            # TODO: currently nothing comes from Ahoy to trigger this handler
-            LOGGER.info(f"INFO: STATS CHANNEL received stats message {msg}")
+    async def _negotiate(
+        self,
+        webrtcbin: Gst.Element,
+        remote_offer: GstWebRTC.WebRTCSessionDescription,
+        candidates: List[Dict[str, Any]],
+    ) -> GstWebRTC.WebRTCSessionDescription:
+        # the offer/answer exchange is awaited in the loop, the GStreamer threads only reply to the promises
+        timeout = self._app.max_timeout
+
+        def _set_remote_description(promise: Gst.Promise) -> None:
+            webrtcbin.emit('set-remote-description', remote_offer, promise)
+            # the remote candidates follow the offer right away, not after its promise is replied: webrtcbin applies
+            # them in order after the offer, so the connectivity checks start while the answer is being created
+            for candidate in candidates:
+                LOGGER.info(f"INFO: on_message, adding ice candidate ... {candidate['candidate']}")
+                webrtcbin.emit('add-ice-candidate', candidate['sdpMLineIndex'], candidate['candidate'])
+
+        _ = await await_promise(_set_remote_description, timeout)
+        reply = await await_promise(lambda promise: webrtcbin.emit('create-answer', None, promise), timeout)
+        answer = reply.get_value('answer')
+        self._patch_answer_sdp(answer.sdp)
+        _ = await await_promise(lambda promise: webrtcbin.emit('set-local-description', answer, promise), timeout)
+        return answer
+
+    def get_setup_stats(self) -> Dict[str, int | None]:
+        """
+        Get the connection setup times of the last session.
+
+        :return: Time in ms from the sdpRequest to the sent answer and to the established ICE connection. Nullable
+        """
+        return dict(self.setup_stats)
+
+    def _send_signalling_message(self, payload: Dict[str, Any]) -> None:
+        if self.signalling_mux is not None:
+            # tagged with the feed name by the multiplexer
+            self.signalling_mux.send(self.feed_name, payload)
+            return
+        data = {"message": {"to": f"director.api_{self.api_key}", "payload": payload}}
+        self.signalling_channel.send(json.dumps(data))
 
-    def _on_received_sdp_request(self, sdp) -> None:
+    async def _on_received_sdp_request(self, sdp) -> GstWebRTC.WebRTCSessionDescription | None:
         LOGGER.info(f"INFO: _on_received_sdp_request callback, processing the incoming SDP request...")
         res, sdpmsg = GstSdp.SDPMessage.new_from_text(sdp)
         if res < 0:
             LOGGER.error(f"ERROR: _on_received_sdp_request callback, failed to parse remote offer SDP")
             self.terminate_webrtc_coro()
-
-        # NOTE: the app (GstPipeline) starts first when the video content is requested. Before that this object is None
-        try:
-            self._app = AhoyApp(self.app_config)
-            if self._app is None:
-                LOGGER.error(f"ERROR: _on_received_sdp_request callback, failed to create AhoyApp object")
+            return None
+
+        # NOTE: the app (GstPipeline) starts first when the video content is requested. Before that this object is None.
+        # If the pipeline is kept from the previous session or warmed up, only a new webrtcbin is attached to it
+        is_swapped = False
+        if self.is_pipeline_kept:
+            self.is_pipeline_kept = False
+            is_swapped = self._app.swap_webrtcbin()
+            if not is_swapped:
+                LOGGER.warning(f"WARNING: feed {self.feed_name} can't reuse the pipeline, rebuilding it...")
+        if not is_swapped:
+            if self._app is not None:
+                self._terminate_idle_pipeline()
+            try:
+                # building the pipeline takes long, e.g., to connect to the RTSP source, so it runs off the loop
+                self._app = await self.loop.run_in_executor(None, AhoyApp, self.app_config)
+                if self._app is None:
+                    LOGGER.error(f"ERROR: _on_received_sdp_request callback, failed to create AhoyApp object")
+                    self.terminate_webrtc_coro()
+                    return None
+            except Exception as e:
+                LOGGER.error(
+                    f"ERROR: _on_received_sdp_request callback, failed to create AhoyApp object due to an excepion:\n {str(e)}..."
+                )
                 self.terminate_webrtc_coro()
-        except Exception as e:
-            LOGGER.error(
-                f"ERROR: _on_received_sdp_request callback, failed to create AhoyApp object due to an excepion:\n {str(e)}..."
-            )
-            self.terminate_webrtc_coro()
-        wait_for_condition(lambda: self._app.is_webrtc_ready(), self._app.max_timeout)
+                return None
+            if not self.is_running:
+                # the stream has been stopped while the pipeline was being built
+                LOGGER.info(f"INFO: feed {self.feed_name} has been stopped before the pipeline is built, dropping it")
+                self._terminate_idle_pipeline()
+                return None
+        await async_wait_for_condition(lambda: self._app.is_webrtc_ready(), self._app.max_timeout)
         self._app.webrtcbin.connect('on-negotiation-needed', lambda _: None)
-        self._app.webrtcbin.connect('notify::ice-connection-state', self._on_ice_connection_state_notify)
+        self._ice_state_handler_id = self._app.webrtcbin.connect(
+            'notify::ice-connection-state', self._on_ice_connection_state_notify
+        )
+        if self.is_trickle_ice:
+            # the local candidates are sent as soon as they are gathered, not only found by the peer's checks
+            self._app.webrtcbin.connect('on-ice-candidate', self._on_local_ice_candidate)
 
         # add new transceiver
         # self._add_transceiver(sdpmsg)
 
-        # set remote offer and create answer
-        remote_offer = GstWebRTC.WebRTCSessionDescription.new(GstWebRTC.WebRTCSDPType.OFFER, sdpmsg)
-        promise = Gst.Promise.new_with_change_func(self._on_offer_set, None, None)
-        self._app.webrtcbin.emit('set-remote-description', remote_offer, promise)
+        # the remote offer is set and the answer is created in _negotiate
+        return GstWebRTC.WebRTCSessionDescription.new(GstWebRTC.WebRTCSDPType.OFFER, sdpmsg)
 
     def _add_transceiver(self, sdpmsg) -> None:
         # assign new media, we assumed that we are interested only in the first one
@@ -297,58 +451,142 @@ class AhoyConnector:
             f" {self._app.webrtcbin.emit('get-transceivers').len} transceivers in webrtcbin"
         )
 
-    def _on_offer_set(self, promise, _, __) -> None:
-        assert promise.wait() == Gst.PromiseResult.REPLIED, "FAIL: offer set promise was not replied"
-        promise = Gst.Promise.new_with_change_func(self._on_answer_created, None, None)
-        self._app.webrtcbin.emit('create-answer', None, promise)
-
-    def _on_answer_created(self, promise, _, __) -> None:
-        assert promise.wait() == Gst.PromiseResult.REPLIED, "FAIL: create answer promise was not replied"
-        reply = promise.get_reply()
-        answer = reply.get_value('answer')
-        answer_sdp = answer.sdp
+    def _patch_answer_sdp(self, answer_sdp: GstSdp.SDPMessage) -> None:
         for i in range(0, answer_sdp.medias_len()):
             media = answer_sdp.get_media(i)
             for j in range(0, media.attributes_len()):
                 attr = media.get_attribute(j)
                 if attr.key == 'recvonly':
-                    LOGGER.info(f"INFO: _on_answer_created callback, found recvonly attribute")
+                    LOGGER.info(f"INFO: _patch_answer_sdp, found recvonly attribute")
                     media.remove_attribute(j)
                     attr = GstSdp.SDPAttribute()
                     attr.set('sendrecv', attr.value)
                     media.insert_attribute(j, attr)
-                    LOGGER.info(f"INFO: _on_answer_created callback, changed recvonly to sendrecv")
+                    LOGGER.info(f"INFO: _patch_answer_sdp, changed recvonly to sendrecv")
                 if attr.key == 'fmtp':
                     self.payload_type = int(attr.value.split(' ')[0])
-                    LOGGER.info(f"INFO: _on_answer_created callback, found payload type {self.payload_type}")
-        promise = Gst.Promise.new()
-        self._app.webrtcbin.emit('set-local-description', answer, promise)
-        promise.interrupt()
-        self.webrtcbin_sdp = answer.sdp
-        LOGGER.info(f"INFO: _on_answer_created callback, successfully created a local answer for webrtcbin")
+                    LOGGER.info(f"INFO: _patch_answer_sdp, found payload type {self.payload_type}")
+
+    def _is_viewer_slot_free(self, viewer_id: str) -> bool:
+        return (
+            self.max_viewers > 1
+            and self.webrtc_coro_control_task is not None
+            and self._app is not None
+            and viewer_id != self.sdp_request_uuid
+            and viewer_id not in self._app.viewers
+            and len(self._app.viewers) + (self._app.webrtcbin is not None) < self.max_viewers
+        )
+
+    def _add_viewer(self, sdp_request: Dict[str, Any]) -> None:
+        # the additional viewer joins the running session with its own webrtcbin fed by the shared encoder
+        viewer_id = sdp_request["uuid"]
+        res, sdpmsg = GstSdp.SDPMessage.new_from_text(sdp_request["sdp"])
+        viewer = self._app.add_viewer(viewer_id) if res >= 0 else None
+        if viewer is None:
+            LOGGER.error(f"ERROR: feed {self.feed_name} can't add viewer {viewer_id}")
+            self._send_signalling_message({"sdpResponse": {"success": False, "uuid": viewer_id}})
+            return
+        viewer.webrtcbin.connect('on-negotiation-needed', lambda _: None)
+        viewer.webrtcbin.connect('notify::ice-connection-state', self._on_viewer_ice_connection_state_notify, viewer_id)
+        remote_offer = GstWebRTC.WebRTCSessionDescription.new(GstWebRTC.WebRTCSDPType.OFFER, sdpmsg)
+        task = asyncio.create_task(self._answer_viewer(viewer, remote_offer, sdp_request["candidates"]))
+        self._viewer_tasks.add(task)
+        task.add_done_callback(self._viewer_tasks.discard)
+
+    async def _answer_viewer(
+        self,
+        viewer: AhoyViewer,
+        remote_offer: GstWebRTC.WebRTCSessionDescription,
+        candidates: List[Dict[str, Any]],
+    ) -> None:
+        try:
+            answer = await self._negotiate(viewer.webrtcbin, remote_offer, candidates)
+        except (asyncio.TimeoutError, GSTWEBRTCAPP_EXCEPTION) as e:
+            LOGGER.error(f"ERROR: feed {self.feed_name} can't answer viewer {viewer.id}, reason: {str(e) or 'timeout'}")
+            self._remove_viewer(viewer.id)
+            self._send_signalling_message({"sdpResponse": {"success": False, "uuid": viewer.id}})
+            return
+        sdpResponse = {"sdpResponse": {"success": True, "uuid": viewer.id, "sdp": answer.sdp.as_text()}}
+        self._send_signalling_message(sdpResponse)
+        LOGGER.info(f"INFO: feed {self.feed_name} has created the answer for viewer {viewer.id}")
+
+    def _on_viewer_ice_connection_state_notify(self, webrtcbin, _, viewer_id: str) -> None:
+        # in a GStreamer thread
+        state = webrtcbin.get_property('ice-connection-state')
+        LOGGER.info(f"INFO: viewer {viewer_id}'s ICE connecting state has been changed to {state}")
+        if state == GstWebRTC.WebRTCICEConnectionState.CONNECTED:
+            self._app.request_keyframe()
+        elif state in (GstWebRTC.WebRTCICEConnectionState.FAILED, GstWebRTC.WebRTCICEConnectionState.CLOSED):
+            # DISCONNECTED is transient, ICE could recover from it on its own
+            self.loop.call_soon_threadsafe(self._remove_viewer, viewer_id)
+
+    def _remove_viewer(self, viewer_id: str) -> None:
+        _ = self.viewers_stats.pop(viewer_id, None)
+        if self._app is not None and self._app.remove_viewer(viewer_id):
+            LOGGER.info(f"OK: feed {self.feed_name} has released viewer {viewer_id}")
+            if self.is_running and self._app.webrtcbin is None and not self._app.viewers:
+                # the first viewer has already left, so the session is over with its last additional viewer
+                self._stop_session()
+
+    def _release_first_viewer(self) -> None:
+        # only the main webrtcbin is parked, the encoder and the additional viewers' branches keep running
+        if self._ice_state_handler_id is not None:
+            self._app.webrtcbin.disconnect(self._ice_state_handler_id)
+            self._ice_state_handler_id = None
+        if not self._app.park_webrtcbin():
+            LOGGER.warning(f"WARNING: feed {self.feed_name} can't release the first viewer, stopping the session...")
+            self._stop_session()
+            return
+        LOGGER.info(
+            f"OK: feed {self.feed_name} has released the first viewer, {len(self._app.viewers)} additional viewers "
+            "keep the session running"
+        )
+
+    def _stop_session(self) -> None:
+        if self.mqtts.publisher.client.is_connected() and self.mqtt_config.topics.controller:
+            # if it is terminated by the UI, notify the controller
+            self.mqtts.publisher.publish(
+                self.mqtt_config.topics.controller,
+                json.dumps({self.feed_name: {"off": False}}),
+            )
+        self.terminate_webrtc_coro(is_restart_webrtc_coro=True)
 
     def _on_ice_connection_state_notify(self, pspec, _) -> None:
         self.webrtcbin_ice_connection_state = self._app.webrtcbin.get_property('ice-connection-state')
         LOGGER.info(f"INFO: webrtcbin's ICE connecting state has been changed to {self.webrtcbin_ice_connection_state}")
+        self.ice_connection_state_changes.emit(self.webrtcbin_ice_connection_state)
         if self.webrtcbin_ice_connection_state == GstWebRTC.WebRTCICEConnectionState.CONNECTED:
-            LOGGER.info("OK: ICE connection is established")
+            if self.setup_stats["answer_ms"] is not None and self.setup_stats["connected_ms"] is None:
+                self.setup_stats["connected_ms"] = round((time.monotonic() - self.setup_start_time) * 1000)
+            LOGGER.info(
+                f"OK: ICE connection is established, connection setup took {self.setup_stats['connected_ms']} ms"
+            )
+            # a peer joining the running encoder should not wait for the next scheduled keyframe
+            self._app.request_keyframe()
             if self.share_ice_topic and not self.is_share_ice:
                 self.is_share_ice = True
 
-    def _on_get_webrtcbin_stats(self, promise, _, __) -> None:
-        assert promise.wait() == Gst.PromiseResult.REPLIED, "FAIL: get webrtcbin stats promise was not replied"
-        stats = {}
-        stats_struct = promise.get_reply()
-        if stats_struct.n_fields() > 0:
-            session_struct_n_fields = stats_struct.n_fields()
-            for i in range(session_struct_n_fields):
-                stat_name = stats_struct.nth_field_name(i)
-                stat_value = stats_struct.get_value(stat_name)
-                if isinstance(stat_value, Gst.Structure):
-                    stats[stat_name] = stats_to_dict(stat_value.to_string())
-        else:
-            LOGGER.error(f"ERROR: no stats to save...")
+    async def _request_webrtcbin_stats(self, webrtcbin: Gst.Element, viewer_id: str | None = None) -> None:
+        self.stats_requests_counters["sent"] += 1
+        try:
+            reply = await await_promise(lambda promise: webrtcbin.emit('get-stats', None, promise), STATS_TIMEOUT)
+        except (asyncio.TimeoutError, GSTWEBRTCAPP_EXCEPTION):
+            self.stats_requests_counters["failed"] += 1
+            return
+        # parsed and published in the loop, not in the GStreamer thread that has replied
+        stats = self._get_stats_from_reply(reply)
+        if viewer_id is None:
+            self._publish_webrtcbin_stats(stats)
+            return
+        self.mqtts.publisher.publish(f"{self.mqtt_config.topics.stats}/{viewer_id}", json.dumps(stats))
+        if self._app is None or viewer_id not in self._app.viewers:
+            return
+        self.viewers_stats[viewer_id] = find_stat(stats, GstWebRTCStatsType.RTP_REMOTE_INBOUND_STREAM)
+        if not self._app.is_webrtc_ready() and viewer_id == next(iter(self._app.viewers)):
+            # the first viewer has left, the earliest additional viewer stands in for it
+            self._publish_webrtcbin_stats(stats, viewer_id)
 
+    def _publish_webrtcbin_stats(self, stats: Dict[str, Any], viewer_id: str | None = None) -> None:
         if self.is_share_ice:
             self.is_share_ice = False
             icls = find_stat(stats, GstWebRTCStatsType.ICE_CANDIDATE_LOCAL)
@@ -361,8 +599,25 @@ class AhoyConnector:
                 }
                 self.mqtts.publisher.publish(self.share_ice_topic, json.dumps(payload))
 
+        # the additional viewers share the encoder, so the controller should see their receiver reports as well
+        viewers_stats = {i: s for i, s in self.viewers_stats.items() if i != viewer_id and s}
+        if viewers_stats:
+            stats = {**stats, "viewers": viewers_stats}
         self.mqtts.publisher.publish(self.mqtt_config.topics.stats, json.dumps(stats))
 
+    def _get_stats_from_reply(self, stats_struct: Gst.Structure | None) -> Dict[str, Any]:
+        stats = {}
+        if stats_struct is not None and stats_struct.n_fields() > 0:
+            session_struct_n_fields = stats_struct.n_fields()
+            for i in range(session_struct_n_fields):
+                stat_name = stats_struct.nth_field_name(i)
+                stat_value = stats_struct.get_value(stat_name)
+                if isinstance(stat_value, Gst.Structure):
+                    stats[stat_name] = stats_to_dict(stat_value.to_string())
+        else:
+            LOGGER.error(f"ERROR: no stats to save...")
+        return stats
+
     async def handle_ice_connection(self) -> None:
         LOGGER.info(f"OK: ICE CONNECTION HANDLER IS ON -- ready to check for ICE connection state")
         while (
@@ -373,7 +628,8 @@ class AhoyConnector:
             and self.pc_out_ice_connection_state != "disconnected"
             and self.pc_out_ice_connection_state != "closed"
         ):
-            await asyncio.sleep(0.1)
+            # the states are re-checked on each change, the payload itself is not needed
+            _ = await self.ice_connection_state_changes.get()
         LOGGER.info(f"OK: ICE CONNECTION HANDLER IS OFF!")
         if self.is_running:
             LOGGER.error(
@@ -384,12 +640,27 @@ class AhoyConnector:
 
     async def handle_webrtcbin_stats(self) -> None:
         LOGGER.info(f"OK: WEBRTCBIN STATS HANDLER IS ON -- ready to check for stats")
-        while self.is_running:
-            await asyncio.sleep(0.1)
-            promise = Gst.Promise.new_with_change_func(self._on_get_webrtcbin_stats, None, None)
-            if self._app and self._app.webrtcbin:
-                self._app.webrtcbin.emit('get-stats', None, promise)
-        LOGGER.info(f"OK: WEBRTCBIN STATS HANDLER IS OFF!")
+        # viewer id (None for the main webrtcbin) -> its stats request. At most one request per webrtcbin is in flight,
+        # a slow reply skips the next ticks instead of piling the requests up
+        requests = {}
+        try:
+            while self.is_running:
+                await asyncio.sleep(0.1)
+                if not self._app:
+                    continue
+                webrtcbins = {None: self._app.webrtcbin, **{i: v.webrtcbin for i, v in self._app.viewers.items()}}
+                for viewer_id, webrtcbin in webrtcbins.items():
+                    if webrtcbin is None:
+                        continue
+                    if viewer_id in requests and not requests[viewer_id].done():
+                        self.stats_requests_counters["skipped"] += 1
+                        continue
+                    requests[viewer_id] = asyncio.create_task(self._request_webrtcbin_stats(webrtcbin, viewer_id))
+                requests = {i: r for i, r in requests.items() if i in webrtcbins or not r.done()}
+            LOGGER.info(f"OK: WEBRTCBIN STATS HANDLER IS OFF!")
+        finally:
+            for request in requests.values():
+                request.cancel()
 
     async def handle_actions(self) -> None:
         LOGGER.info(f"OK: ACTIONS HANDLER IS ON -- ready to pick and apply actions")
@@ -449,12 +720,21 @@ class AhoyConnector:
                             case "reload_agent":
                                 if self._reload_agent(msg[action]):
                                     LOGGER.info(f"ACTION: feed {self.feed_name} reloaded its {msg[action]} agent")
+                            case "passthrough":
+                                # comes from the controller: a dict to let the agents bypass it or False to stop it
+                                if self._set_passthrough(msg[action]):
+                                    s_str = "on" if msg[action] else "off"
+                                    LOGGER.info(f"ACTION: feed {self.feed_name} turned {s_str} actions pass-through")
                             case "send_dc":
                                 action = msg[action]
                                 if isinstance(action, dict) and "name" in action and "msg" in action:
+                                    # the relayed stats are telemetry, they could be decimated under congestion.
+                                    # The alerts carry the stats too but must reach the UI
+                                    is_telemetry = isinstance(action["msg"], dict) and "stats" in action["msg"]
                                     if self._app.send_data_channel_message(
                                         action["name"],
                                         {"feed_name": self.feed_name, "msg": action["msg"]},
+                                        is_low_priority=is_telemetry and "alert" not in action["msg"],
                                     ):
                                         LOGGER.debug(
                                             f"ACTION: feed {self.feed_name} sent message to {action['name']} dc"
@@ -472,106 +752,185 @@ class AhoyConnector:
 
     async def handle_bandwidth_estimations(self) -> None:
         LOGGER.info(f"OK: BANDWIDTH ESTIMATIONS HANDLER IS ON -- ready to publish bandwidth estimations")
+        loop = asyncio.get_running_loop()
+        next_report_time = loop.time() + 60.0
         while self.is_running:
             gcc_bw = await self._app.gcc_estimated_bitrates.get()
             self.mqtts.publisher.publish(self.mqtt_config.topics.gcc, str(gcc_bw))
+            if loop.time() >= next_report_time:
+                # the counters of the signals handed over from the GStreamer threads, e.g., to spot the drops
+                bridges = [self._app.gcc_estimated_bitrates, *self._app.data_channels_data.values()]
+                LOGGER.info(f"INFO: feed {self.feed_name} signal bridges: {[b.get_stats() for b in bridges]}")
+                LOGGER.info(f"INFO: feed {self.feed_name} stats requests: {self.stats_requests_counters}")
+                if self._app.data_channels_senders:
+                    senders = self._app.data_channels_senders.values()
+                    LOGGER.info(f"INFO: feed {self.feed_name} data channel senders: {[s.get_stats() for s in senders]}")
+                next_report_time = loop.time() + 60.0
         LOGGER.info(f"OK: BANDWIDTH ESTIMATIONS HANDLER IS OFF!")
 
     async def webrtc_coro(self) -> None:
-        while not (self._app and self._app.is_running):
-            await asyncio.sleep(0.1)
-
-        tasks = []
-        try:
-            LOGGER.info(f"OK: main webrtc coroutine has been started!")
-            self.mqtts.publisher.start()
-            self.mqtts.subscriber.start()
-            self.mqtts.subscriber.subscribe([self.mqtt_config.topics.actions])
-            ######################################## TASKS ########################################
-            signalling_task = asyncio.create_task(self.handle_ice_connection())
-            pipeline_task = asyncio.create_task(self._app.handle_pipeline())
-            webrtcbin_stats_task = asyncio.create_task(self.handle_webrtcbin_stats())
-            actions_task = asyncio.create_task(self.handle_actions())
-            be_task = asyncio.create_task(self.handle_bandwidth_estimations())
-            tasks = [signalling_task, pipeline_task, webrtcbin_stats_task, actions_task, be_task]
-            #######################################################################################
-            if self.agents:
-                # start agent threads
-                for agent in self.agents.values():
-                    agent_thread = threading.Thread(target=agent.run, args=(True,))
-                    agent_thread.start()
-                    self.agent_threads[agent.id] = agent_thread
-            if self.network_controller is not None:
-                # start network controller's task
-                network_controller_task = asyncio.create_task(self.network_controller.update_network_rule())
-                tasks.append(network_controller_task)
-            if self.mqtt_config.topics.controller:
-                # notify controller that the feed is on
-                LOGGER.info(f"OK: Feed {self.feed_name} is on, notifying the controller...")
-                self.mqtts.publisher.publish(
-                    self.mqtt_config.topics.controller,
-                    json.dumps({self.feed_name: {"on": self.mqtt_config.topics.actions}}),
-                )
-            #######################################################################################
-            self.webrtc_coro_control_task = asyncio.create_task(asyncio.sleep(float('inf')))
-            tasks = [self.webrtc_coro_control_task, *tasks]
-            await asyncio.gather(*tasks)
-        except asyncio.exceptions.CancelledError:
-            if not self.is_running:
-                # this is on streamStopRequest where self.is_running was set to False.
-                # In this case webrtc_coro will be recursively rescheduled.
-                try:
-                    await async_wait_for_condition(lambda: not self._app.is_running, 5)
-                except Exception:
-                    pass
-                for task in tasks:
-                    task.cancel()
-                if self.agent_threads:
-                    self._terminate_agents()
-                self.mqtts.publisher.stop()
-                self.mqtts.subscriber.stop()
-                self._app = None
-                LOGGER.info("OK: main webrtc coroutine is stopped on streamStopRequest, pending...")
-                return await self.webrtc_coro()
-            else:
-                # this is on some internal exception where self.is_running is True and terminate_webrtc_coro was trigerred.
-                # In this case webrtc_coro will be stopped.
-                try:
-                    await async_wait_for_condition(lambda: not self._app.is_running, 5)
-                except Exception:
-                    pass
-                for task in tasks:
-                    task.cancel()
-                if self.agent_threads:
-                    self._terminate_agents()
-                self.mqtts.publisher.stop()
-                self.mqtts.subscriber.stop()
-                self._app = None
+        # supervised session loop: each iteration serves one session from the sdpRequest to its teardown. The loop
+        # keeps no references to the finished sessions, so the feed could be reconnected any number of times
+        failures = 0
+        while True:
+            # a kept pipeline is running between the sessions, the session starts when the new peer is answered
+            while not (self._app and self._app.is_running and self.webrtcbin_sdp is not None):
+                await asyncio.sleep(0.1)
+
+            self.session_stats["started"] += 1
+            start_time = time.monotonic()
+            is_restart = False
+            try:
+                await self._session_coro()
+            except asyncio.exceptions.CancelledError:
+                if not self.is_running:
+                    # this is on streamStopRequest where self.is_running was set to False.
+                    # In this case the next session is awaited.
+                    is_restart = True
+                    await self._cleanup_session()
+                    self.session_stats["stopped"] += 1
+                    LOGGER.info("OK: main webrtc coroutine is stopped on streamStopRequest, pending...")
+                else:
+                    # this is on some internal exception where self.is_running is True and terminate_webrtc_coro was trigerred.
+                    # In this case webrtc_coro will be stopped.
+                    await self._cleanup_session()
+                    self.session_stats["interrupted"] += 1
+                    LOGGER.error(
+                        "ERROR: main webrtc coroutine has been interrupted due to an internal exception, stopping..."
+                    )
+            except Exception as e:
+                # this is on some external exception where terminate_webrtc_coro was not trigerred e.g., pipeline error msg.
+                # It may be related to the network link failure, so the next session is awaited after a backoff
+                self.terminate_webrtc_coro()
+                await self._cleanup_session()
+                self.session_stats["failed"] += 1
                 LOGGER.error(
-                    "ERROR: main webrtc coroutine has been interrupted due to an internal exception, stopping..."
+                    "ERROR: main webrtc coroutine has been unexpectedly interrupted due to an exception:"
+                    f" '{str(e)}'"
                 )
+                # a session that has been streaming long enough is not a part of a failure series
+                failures = 1 if time.monotonic() - start_time >= self.session_backoff[1] else failures + 1
+                if failures <= self.max_session_retries:
+                    is_restart = True
+                    backoff = min(self.session_backoff[0] * 2 ** (failures - 1), self.session_backoff[1])
+                    LOGGER.info(
+                        f"INFO: feed {self.feed_name} awaits the next session in {backoff:.1f} sec, "
+                        f"retry {failures}/{self.max_session_retries}"
+                    )
+                    await asyncio.sleep(backoff)
+                else:
+                    LOGGER.error(f"ERROR: feed {self.feed_name} has failed {failures} sessions in a row, stopping...")
+
+            LOGGER.info(
+                f"INFO: feed {self.feed_name} session lasted {time.monotonic() - start_time:.1f} sec, "
+                f"session stats: {self.session_stats}, connection setup: {self.setup_stats}"
+            )
+            if not is_restart:
                 return
-        except Exception as e:
-            # this is on some external exception where terminate_webrtc_coro was not trigerred e.g., pipeline error msg.
-            # TODO: maybe also try to rerun it in case of pipeline error? since this may be related to the network link failure
-            self.terminate_webrtc_coro()
-            for task in tasks:
-                task.cancel()
-            if self.agent_threads:
-                self._terminate_agents()
-            self.mqtts.publisher.stop()
-            self.mqtts.subscriber.stop()
-            self._app = None
-            LOGGER.error(
-                "ERROR: main webrtc coroutine has been unexpectedly interrupted due to an exception:"
-                f" '{str(e)}', stopping..."
+            self.session_stats["restarts"] += 1
+
+    async def _session_coro(self) -> None:
+        self._session_tasks = []
+        LOGGER.info(f"OK: main webrtc coroutine has been started!")
+        self.mqtts.publisher.start()
+        self.mqtts.subscriber.start()
+        self.mqtts.subscriber.subscribe([self.mqtt_config.topics.actions])
+        ######################################## TASKS ########################################
+        signalling_task = asyncio.create_task(self.handle_ice_connection())
+        if self._pipeline_task is None or self._pipeline_task.done():
+            # the pipeline handler lives as long as the pipeline, that could outlive the session
+            self._pipeline_task = asyncio.create_task(self._app.handle_pipeline())
+        pipeline_task = asyncio.shield(self._pipeline_task)
+        webrtcbin_stats_task = asyncio.create_task(self.handle_webrtcbin_stats())
+        actions_task = asyncio.create_task(self.handle_actions())
+        be_task = asyncio.create_task(self.handle_bandwidth_estimations())
+        self._session_tasks = [signalling_task, pipeline_task, webrtcbin_stats_task, actions_task, be_task]
+        #######################################################################################
+        if self.agents:
+            # start agent threads
+            for agent in self.agents.values():
+                agent_thread = threading.Thread(target=agent.run, args=(True,))
+                agent_thread.start()
+                self.agent_threads[agent.id] = agent_thread
+        if self.network_controller is not None:
+            # start network controller's task
+            network_controller_task = asyncio.create_task(self.network_controller.update_network_rule())
+            self._session_tasks.append(network_controller_task)
+        if self.mqtt_config.topics.controller:
+            # notify controller that the feed is on
+            LOGGER.info(f"OK: Feed {self.feed_name} is on, notifying the controller...")
+            self.mqtts.publisher.publish(
+                self.mqtt_config.topics.controller,
+                json.dumps({self.feed_name: {"on": self.mqtt_config.topics.actions}}),
             )
-            return
+        #######################################################################################
+        self.webrtc_coro_control_task = asyncio.create_task(asyncio.sleep(float('inf')))
+        self._session_tasks.insert(0, self.webrtc_coro_control_task)
+        await asyncio.gather(*self._session_tasks)
+
+    async def _cleanup_session(self) -> None:
+        # releases everything the session has acquired, the connector is left as before the session. A kept pipeline
+        # and its handler are left running for the next session
+        if not self.is_pipeline_kept:
+            try:
+                await async_wait_for_condition(lambda: not self._app.is_running, 5)
+            except Exception:
+                pass
+            if self._pipeline_task is not None:
+                self._session_tasks.append(self._pipeline_task)
+                self._pipeline_task = None
+        if self._sdp_request_task is not None:
+            self._session_tasks.append(self._sdp_request_task)
+            self._sdp_request_task = None
+        self._session_tasks.extend(self._viewer_tasks)
+        self._viewer_tasks = set()
+        for task in self._session_tasks:
+            task.cancel()
+        # let the cancelled tasks finish, so that neither they nor their frames outlive the session
+        _ = await asyncio.gather(*self._session_tasks, return_exceptions=True)
+        self._session_tasks = []
+        if self.agent_threads:
+            self._terminate_agents()
+            self.agent_threads = {}
+        self.mqtts.publisher.stop()
+        self.mqtts.subscriber.stop()
+        if self.is_pipeline_kept:
+            # the left peer's webrtcbin is released, the pipeline runs into the parked sink until the next peer comes
+            for viewer_id in list(self._app.viewers):
+                self._remove_viewer(viewer_id)
+            if self._ice_state_handler_id is not None:
+                self._app.webrtcbin.disconnect(self._ice_state_handler_id)
+                self._ice_state_handler_id = None
+            # the first viewer's webrtcbin is already parked if it has left before the additional ones
+            if self._app.webrtcbin is not None and not self._app.park_webrtcbin():
+                LOGGER.warning(f"WARNING: feed {self.feed_name} can't park the pipeline, terminating it...")
+                self.is_pipeline_kept = False
+                self._terminate_idle_pipeline()
+        else:
+            if self._app is not None and self._app.is_running:
+                self._app.terminate_pipeline()
+            self._app = None
+            self._ice_state_handler_id = None
+        self.webrtc_coro_control_task = None
+        self.webrtcbin_ice_connection_state = GstWebRTC.WebRTCICEConnectionState.NEW
+
+    def get_session_stats(self) -> Dict[str, int]:
+        """
+        Get the counters of the sessions served by the connector.
+
+        :return: Numbers of the started sessions, the ones stopped by the viewer, interrupted internally, failed with
+            an exception and the restarts
+        """
+        return dict(self.session_stats)
 
     def terminate_webrtc_coro(self, is_restart_webrtc_coro: bool = False) -> None:
         self.is_running = not is_restart_webrtc_coro
         self.webrtcbin_sdp = None
-        if self._app is not None:
+        # the running pipeline is kept for the next session only if the current one is stopped by the peer
+        self.is_pipeline_kept = (
+            is_restart_webrtc_coro and self.is_keep_pipeline and self._app is not None and self._app.is_running
+        )
+        if self._app is not None and not self.is_pipeline_kept:
             if self._app.is_running:
                 self._app.send_termination_message_to_bus()
             else:
@@ -580,6 +939,32 @@ class AhoyConnector:
             self.webrtc_coro_control_task.cancel()
             self.webrtc_coro_control_task = None
 
+    async def _warm_up_pipeline(self) -> None:
+        # builds the pipeline before the first peer comes, it is then kept as after a session
+        try:
+            self._app = await self.loop.run_in_executor(None, AhoyApp, self.app_config)
+        except Exception as e:
+            LOGGER.warning(f"WARNING: feed {self.feed_name} can't warm up the pipeline, reason: {e}")
+            self._app = None
+            return
+        if not self._app.park_webrtcbin():
+            LOGGER.warning(f"WARNING: feed {self.feed_name} can't park the warm pipeline, terminating it...")
+            self._terminate_idle_pipeline()
+            return
+        self._pipeline_task = asyncio.create_task(self._app.handle_pipeline())
+        self.is_pipeline_kept = True
+        LOGGER.info(f"OK: feed {self.feed_name} has a warm pipeline, waiting for the first peer...")
+
+    def _terminate_idle_pipeline(self) -> None:
+        # the pipeline handler is cancelled without terminating the pipeline, so terminate it here
+        if self._pipeline_task is not None:
+            self._pipeline_task.cancel()
+            self._pipeline_task = None
+        if self._app is not None:
+            self._app.terminate_pipeline()
+            self._app = None
+        self._ice_state_handler_id = None
+
     def _prepare_agents(self, agents: List[Agent] | None) -> None:
         if agents is not None:
             self.agents = {agent.id: agent for agent in agents}
@@ -708,6 +1093,16 @@ class AhoyConnector:
                 return True
         return False
 
+    def _set_passthrough(self, passthrough_dict: Dict[str, Any] | bool) -> bool:
+        try:
+            passthrough = MqttPassthrough.from_dict(passthrough_dict) if passthrough_dict else None
+        except (KeyError, TypeError, AttributeError) as e:
+            LOGGER.error(f"ERROR: feed {self.feed_name} got invalid pass-through {passthrough_dict}, reason: {e}")
+            return False
+        for agent in self.agents.values():
+            agent.set_passthrough(passthrough)
+        return True
+
     def _terminate_agents(self) -> None:
         if self.agent_threads:
             for agent in self.agents.values():
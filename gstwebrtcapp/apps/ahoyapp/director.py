@@ -0,0 +1,140 @@
+"""
+director.py
+
+Description: An HTTP client of the ADDIX AhoyMedia Director that registers the feeds without blocking their event loops.
+
+Author:
+    - Nikita Smirnov <nsm@informatik.uni-kiel.de>
+
+License:
+    GPLv3 License
+
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import json
+import threading
+from typing import Any, Dict, Self
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+
+from gstwebrtcapp.utils.base import LOGGER, GSTWEBRTCAPP_EXCEPTION
+
+
+class DirectorClient:
+    """
+    HTTP client of the AhoyMedia Director. The requests are sent from a thread pool, so the event loop of the calling
+    connector is not blocked while a request is in flight. One session with a keep-alive connection pool is shared by
+    all feeds of the process that register at the same Director (see ``get_shared``), so N feeds are registered
+    concurrently over reused connections.
+
+    The requests that have not reached the Director (failed or timed out connects) and the 5xx responses are retried
+    with an exponential backoff. The registration POST is not idempotent, so it is never resent after a read timeout
+    or a connection dropped mid-request: the Director could have registered the feed already.
+
+    :param server: Director URL, the feed name is appended to it
+    :param timeout: Timeout in seconds for connecting to and reading from the Director
+    :param max_retries: Max number of retries of a failed request
+    :param backoff: Backoff in seconds before the first retry, doubled for each next one
+    :param max_connections: Max number of the pooled connections and of the concurrent requests
+    """
+
+    _shared: Dict[str, Self] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        server: str,
+        timeout: float = 10.0,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        max_connections: int = 16,
+    ) -> None:
+        self.server = server
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="director")
+
+    @classmethod
+    def get_shared(cls, server: str, **kwargs) -> Self:
+        """
+        Get the client shared by all feeds of the process that register at the given Director. It is created on the
+        first call, the kwargs of the later calls are ignored.
+
+        :param server: Director URL
+        :return: Shared client
+        """
+        with cls._shared_lock:
+            if server not in cls._shared:
+                cls._shared[server] = cls(server, **kwargs)
+            return cls._shared[server]
+
+    async def register_feed(self, feed_name: str, api_key: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Register the feed with its local offer at the Director.
+
+        :param feed_name: Feed name
+        :param api_key: AhoyMedia API key
+        :param data: Request body with the local offer
+        :return: Director's response with the remote answer
+        :raises GSTWEBRTCAPP_EXCEPTION: If the request has failed after all retries or has been rejected
+        """
+        url = self.server + requests.utils.quote(feed_name)
+        headers = {
+            "accept": "application/json",
+            "x-api-key": api_key,
+            "content-type": "application/json",
+        }
+        post = functools.partial(self.session.post, url, headers=headers, data=json.dumps(data), timeout=self.timeout)
+
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await loop.run_in_executor(self.executor, post)
+                if response.status_code < 500:
+                    break
+                reason = f"status code {response.status_code}"
+            except requests.RequestException as e:
+                if not self._is_connect_error(e):
+                    raise GSTWEBRTCAPP_EXCEPTION(f"can't register feed {feed_name} at the Director, reason: {e}")
+                reason = str(e)
+            if attempt == self.max_retries:
+                raise GSTWEBRTCAPP_EXCEPTION(f"can't register feed {feed_name} at the Director, reason: {reason}")
+            backoff = self.backoff * 2**attempt
+            LOGGER.warning(
+                f"WARNING: registering feed {feed_name} at the Director has failed ({reason}), "
+                f"retry {attempt + 1}/{self.max_retries} in {backoff:.1f} sec"
+            )
+            await asyncio.sleep(backoff)
+
+        LOGGER.info(f"INFO: feed {feed_name} registration request, status code ... {response.status_code}")
+        if not response.ok:
+            raise GSTWEBRTCAPP_EXCEPTION(
+                f"Director rejected feed {feed_name} with status code {response.status_code}: {response.text}"
+            )
+        return response.json()
+
+    @staticmethod
+    def _is_connect_error(e: requests.RequestException) -> bool:
+        # requests wraps the urllib3 connect errors (refused, unresolved, timed out) into MaxRetryError's reason
+        if isinstance(e, requests.ConnectTimeout):
+            return True
+        reason = getattr(e.args[0], "reason", None) if isinstance(e, requests.ConnectionError) and e.args else None
+        return isinstance(reason, ConnectTimeoutError)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+        self.session.close()
+        with self._shared_lock:
+            if self._shared.get(self.server) is self:
+                del self._shared[self.server]
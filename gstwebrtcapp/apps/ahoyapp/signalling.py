@@ -0,0 +1,316 @@
+"""
+signalling.py
+
+Description: The signalling connection to the ADDIX AhoyMedia Director and a multiplexer that carries the signalling
+messages of all feeds of the process over one such connection.
+
+Author:
+    - Nikita Smirnov <nsm@informatik.uni-kiel.de>
+
+License:
+    GPLv3 License
+
+"""
+
+from aiortc import RTCPeerConnection, RTCSessionDescription, RTCConfiguration, RTCIceServer
+import asyncio
+import json
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Self
+import uuid
+
+from gstwebrtcapp.apps.ahoyapp.director import DirectorClient
+from gstwebrtcapp.utils.base import LOGGER, GSTWEBRTCAPP_EXCEPTION
+
+if TYPE_CHECKING:
+    from gstwebrtcapp.apps.ahoyapp.connector import AhoyConnector
+
+DEFAULT_ICE_SERVERS = [RTCIceServer("stun:stun.l.google.com:19302")]
+
+
+async def connect_pc_out(
+    pc_out: RTCPeerConnection,
+    director: DirectorClient,
+    feed_name: str,
+    api_key: str,
+    codec: str,
+    is_multiplexed: bool = False,
+) -> None:
+    """
+    Register the feed at the Director with the local offer of the peer connection and apply the Director's answer.
+    The data channels of the peer connection should be created before.
+
+    :param pc_out: Peer connection to the Director
+    :param director: Director client
+    :param feed_name: Feed name
+    :param api_key: AhoyMedia API key
+    :param codec: Video codec of the feed
+    :param is_multiplexed: If True, the connection is announced to carry the signalling of other feeds as well
+    :raises GSTWEBRTCAPP_EXCEPTION: If the Director has not registered the feed
+    """
+    local_offer = await pc_out.createOffer()
+    await pc_out.setLocalDescription(local_offer)
+
+    # send request to ahoy director
+    data = {
+        "sdp": pc_out.localDescription.sdp,
+        "candidates": "",
+        "capabilities": {"video": {"codecs": [codec.upper()]}},
+        "name": feed_name,
+    }
+    if is_multiplexed:
+        data["multiplexed"] = True
+    response = await director.register_feed(feed_name, api_key, data)
+    LOGGER.info(f"INFO: connect_pc_out, response ... {response}")
+
+    # create sdp with candidates
+    sdp_lines = response["sdp"].split("\r\n")[:-1]
+    sdp_candidates = [f"a={candidate['candidate']}" for candidate in response["candidates"]]
+    remote_sdp = "\r\n".join([*sdp_lines, *sdp_candidates, ""])
+    LOGGER.info(f"INFO: connect_pc_out, remote_sdp ... {remote_sdp}")
+
+    # create remote answer
+    remote_answer = RTCSessionDescription(type="answer", sdp=remote_sdp)
+    await pc_out.setRemoteDescription(remote_answer)
+
+
+class DirectorSignallingMux:
+    """
+    Carries the signalling messages of all feeds of the process over one peer connection with one signalling data
+    channel to the AhoyMedia Director instead of one connection per feed. The connection runs in its own thread with
+    its own event loop, the messages are handed over to the event loops of the feeds' connectors.
+
+    The protocol on top of the per-feed one:
+
+    1. The first attached feed registers the connection with the usual POST of its local offer, the request body has
+       ``"multiplexed": true`` in addition.
+    2. Each next feed is registered over the open signalling channel with
+       ``{"feedRegistrationRequest": {"uuid": <request uuid>, "feedUuid": <feed>, "capabilities": {...}}}``. The
+       Director replies with ``{"feedRegistrationResponse": {"uuid": <request uuid>, "feedUuid": <feed>,
+       "success": <bool>}}``. A rejected or unanswered registration fails the attach, so the feed can fall back to
+       its own connection.
+    3. Every message in both directions carries the ``feedUuid`` of its feed in the payload, the multiplexer adds it
+       to the outgoing messages that do not have it (e.g., ``sdpResponse``). An incoming message without the
+       ``feedUuid`` of an attached feed is dropped, it is never guessed.
+
+    :param server: AhoyMedia Director URL
+    :param api_key: AhoyMedia API key
+    :param signalling_channel_name: Name of the signalling channel
+    :param stats_channel_name: Name of the stats channel
+    :param ice_servers: ICE servers of the peer connection. Nullable (Google STUN server)
+    :param registration_timeout: Max time in seconds to wait for the Director's reply to a feed registration
+    """
+
+    _shared: Dict[str, Self] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        server: str,
+        api_key: str,
+        signalling_channel_name: str = "control",
+        stats_channel_name: str = "telemetry",
+        ice_servers: List[RTCIceServer] | None = None,
+        registration_timeout: float = 10.0,
+    ) -> None:
+        self.server = server
+        self.api_key = api_key
+        self.signalling_channel_name = signalling_channel_name
+        self.stats_channel_name = stats_channel_name
+        self.ice_servers = DEFAULT_ICE_SERVERS if ice_servers is None else ice_servers
+        self.registration_timeout = registration_timeout
+        self.director = DirectorClient.get_shared(self.server)
+
+        self.connectors: Dict[str, "AhoyConnector"] = {}
+        self.registered_feeds = set()
+        # registration request uuid -> future of the Director's reply
+        self.pending_registrations: Dict[str, asyncio.Future] = {}
+        self.lock = threading.Lock()
+
+        self.pc_out = None
+        self.signalling_channel = None
+        self.stats_channel = None
+        self.pc_out_state = "new"
+        self.counters = {"routed": 0, "unrouted": 0, "sent": 0, "dropped": 0}
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="director_mux", daemon=True)
+        self.thread.start()
+        self._connect_task = None
+
+    @classmethod
+    def get_shared(cls, server: str, api_key: str, **kwargs) -> Self:
+        """
+        Get the multiplexer shared by all feeds of the process that signal via the given Director with the given key.
+        It is created on the first call, the kwargs of the later calls are ignored.
+
+        :param server: AhoyMedia Director URL
+        :param api_key: AhoyMedia API key
+        :return: Shared multiplexer
+        """
+        with cls._shared_lock:
+            key = f"{server}|{api_key}"
+            if key not in cls._shared:
+                cls._shared[key] = cls(server, api_key, **kwargs)
+            return cls._shared[key]
+
+    async def attach(self, connector: "AhoyConnector") -> None:
+        """
+        Register the connector's feed and route its messages to it. Awaited in the connector's event loop.
+
+        :param connector: Connector of the feed, its ``loop`` should be set
+        :raises GSTWEBRTCAPP_EXCEPTION: If the shared connection can't be established or the feed can't be registered
+        """
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._attach(connector), self.loop))
+
+    def detach(self, feed_name: str) -> None:
+        with self.lock:
+            _ = self.connectors.pop(feed_name, None)
+
+    def send(self, feed_name: str, payload: Dict[str, Any]) -> None:
+        """
+        Send the feed's message to the Director. Safe to call from any thread.
+
+        :param feed_name: Feed name the message is tagged with
+        :param payload: Message payload, e.g., ``{"sdpResponse": {...}}``
+        """
+        payload = {
+            key: {**value, "feedUuid": value.get("feedUuid", feed_name)} if isinstance(value, dict) else value
+            for key, value in payload.items()
+        }
+        data = {"message": {"to": f"director.api_{self.api_key}", "payload": payload}}
+        self.loop.call_soon_threadsafe(self._send, json.dumps(data))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"feeds": len(self.connectors), "state": self.pc_out_state, **self.counters}
+
+    def close(self) -> None:
+        if self.pc_out is not None:
+            asyncio.run_coroutine_threadsafe(self.pc_out.close(), self.loop).result(timeout=5.0)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5.0)
+        with self._shared_lock:
+            if self._shared.get(f"{self.server}|{self.api_key}") is self:
+                del self._shared[f"{self.server}|{self.api_key}"]
+
+    async def _attach(self, connector: "AhoyConnector") -> None:
+        # in the mux's loop
+        with self.lock:
+            self.connectors[connector.feed_name] = connector
+        if self._connect_task is None:
+            # the first feed registers the shared connection
+            self._connect_task = asyncio.create_task(self._connect(connector))
+        try:
+            await asyncio.shield(self._connect_task)
+            if connector.feed_name not in self.registered_feeds:
+                await self._register_feed(connector)
+        except Exception as e:
+            if self._connect_task.done() and self._connect_task.exception() is not None:
+                # the next attached feed retries to connect
+                self._connect_task = None
+            self.detach(connector.feed_name)
+            raise GSTWEBRTCAPP_EXCEPTION(f"can't attach feed {connector.feed_name} to the shared connection: {e}")
+        self._notify_state(connector)
+
+    async def _connect(self, connector: "AhoyConnector") -> None:
+        # in the mux's loop
+        LOGGER.info(f"OK: connecting the shared signalling connection to AhoyMedia...")
+        self.pc_out = RTCPeerConnection(RTCConfiguration(self.ice_servers))
+        self.signalling_channel = self.pc_out.createDataChannel(self.signalling_channel_name, ordered=True)
+        self.stats_channel = self.pc_out.createDataChannel(self.stats_channel_name, ordered=True)
+        channel_open = asyncio.Event()
+
+        @self.pc_out.on("connectionstatechange")
+        async def on_connectionstatechange() -> None:
+            LOGGER.info(f"INFO: on_connectionstatechange, shared pc_out ... {self.pc_out.connectionState}")
+            with self.lock:
+                self.pc_out_state = self.pc_out.connectionState
+                connectors = list(self.connectors.values())
+            for c in connectors:
+                self._notify_state(c)
+
+        @self.signalling_channel.on("open")
+        def on_open() -> None:
+            channel_open.set()
+
+        @self.signalling_channel.on("message")
+        def on_message(msg) -> None:
+            self._route(json.loads(msg))
+
+        @self.stats_channel.on("message")
+        def on_stats_message(msg) -> None:
+            LOGGER.info(f"INFO: STATS CHANNEL received stats message {msg}")
+
+        await connect_pc_out(
+            self.pc_out,
+            self.director,
+            connector.feed_name,
+            self.api_key,
+            connector.app_config.codec,
+            is_multiplexed=True,
+        )
+        self.registered_feeds.add(connector.feed_name)
+        await channel_open.wait()
+        LOGGER.info(f"OK: shared signalling connection is established, waiting for messages on signalling channel...")
+
+    async def _register_feed(self, connector: "AhoyConnector") -> None:
+        # in the mux's loop
+        request_uuid = str(uuid.uuid4())
+        reply = self.loop.create_future()
+        self.pending_registrations[request_uuid] = reply
+        self.send(
+            connector.feed_name,
+            {
+                "feedRegistrationRequest": {
+                    "uuid": request_uuid,
+                    "capabilities": {"video": {"codecs": [connector.app_config.codec.upper()]}},
+                }
+            },
+        )
+        try:
+            response = await asyncio.wait_for(reply, self.registration_timeout)
+        except asyncio.TimeoutError:
+            raise GSTWEBRTCAPP_EXCEPTION(f"no feedRegistrationResponse in {self.registration_timeout} sec")
+        finally:
+            _ = self.pending_registrations.pop(request_uuid, None)
+        if not response.get("success", False) or response.get("feedUuid", None) != connector.feed_name:
+            raise GSTWEBRTCAPP_EXCEPTION(f"the Director has rejected the registration: {response}")
+        self.registered_feeds.add(connector.feed_name)
+        LOGGER.info(f"OK: feed {connector.feed_name} is registered over the shared signalling connection")
+
+    def _route(self, msg: Dict[str, Any]) -> None:
+        # in the mux's loop
+        if "feedRegistrationResponse" in msg:
+            reply = self.pending_registrations.get(msg["feedRegistrationResponse"].get("uuid", None), None)
+            if reply is not None and not reply.done():
+                reply.set_result(msg["feedRegistrationResponse"])
+            return
+
+        body = next(iter(msg.values()), None) if len(msg) == 1 else None
+        feed_name = body.get("feedUuid", None) if isinstance(body, dict) else None
+        with self.lock:
+            connector = self.connectors.get(feed_name, None)
+            self.counters["routed" if connector is not None else "unrouted"] += 1
+        if connector is None:
+            LOGGER.error(f"ERROR: SHARED SIGNALLING CHANNEL received a message for no attached feed, dropping {msg}")
+            return
+        try:
+            connector.loop.call_soon_threadsafe(connector._handle_signalling_message, msg)
+        except RuntimeError:
+            LOGGER.error(f"ERROR: feed {feed_name} is not running, dropping the message {msg}")
+
+    def _send(self, data: str) -> None:
+        # in the mux's loop
+        if self.signalling_channel is not None and self.signalling_channel.readyState == "open":
+            self.signalling_channel.send(data)
+            self.counters["sent"] += 1
+        else:
+            self.counters["dropped"] += 1
+            LOGGER.error(f"ERROR: shared signalling channel is not open, dropping the message {data}")
+
+    def _notify_state(self, connector: "AhoyConnector") -> None:
+        try:
+            connector.loop.call_soon_threadsafe(connector._on_pc_out_state_change, self.pc_out_state)
+        except RuntimeError:
+            pass
@@ -30,6 +30,8 @@ from gi.repository import GstWebRTC
 from gstwebrtcapp.apps.pipelines import BIN_H264_IN_H264_OUT_PIPELINE
 from gstwebrtcapp.media.preset import VideoPreset
 from gstwebrtcapp.utils.base import LOGGER, GSTWEBRTCAPP_EXCEPTION, async_wait_for_condition, wait_for_condition
+from gstwebrtcapp.utils.bridge import SignalBridge
+from gstwebrtcapp.utils.datachannel import DataChannelSender
 from gstwebrtcapp.utils.gst import DEFAULT_GCC_SETTINGS, DEFAULT_TRANSCEIVER_SETTINGS, get_gst_encoder_name
 
 
@@ -125,6 +127,7 @@ class GstWebRTCApp(metaclass=ABCMeta):
         self.data_channels_cfgs = config.data_channels_cfgs
         self.data_channels = {}
         self.data_channels_data = {}
+        self.data_channels_senders = {}
         self.priority = config.priority
         self.max_timeout = config.max_timeout
         self.is_graph = config.is_graph
@@ -257,6 +260,7 @@ class GstWebRTCApp(metaclass=ABCMeta):
         name: str,
         options: Gst.Structure = None,
         callbacks: Dict[str, Callable[[Dict], Any]] | None = None,
+        sender: Dict[str, Any] | None = None,
     ) -> None:
         wait_for_condition(lambda: self.is_webrtc_ready(), self.max_timeout)
         if options is None:
@@ -271,7 +275,7 @@ class GstWebRTCApp(metaclass=ABCMeta):
         if not data_channel:
             raise GSTWEBRTCAPP_EXCEPTION(f"Can't create data channel {name}")
 
-        self.data_channels_data[name] = asyncio.Queue()
+        self.data_channels_data[name] = SignalBridge(f"data_channel_{name}")
 
         # with false you may override them on your own
         if callbacks is None:
@@ -280,7 +284,7 @@ class GstWebRTCApp(metaclass=ABCMeta):
             data_channel.connect('on-error', lambda _: LOGGER.info(f"ERROR: data channel {name} met an error"))
             data_channel.connect(
                 'on-message-string',
-                lambda _, message: self.data_channels_data[name].put_nowait(json.loads(message)),
+                lambda _, message: self.data_channels_data[name].emit(json.loads(message)),
             )
         else:
             for event in callbacks:
@@ -290,6 +294,9 @@ class GstWebRTCApp(metaclass=ABCMeta):
                     raise GSTWEBRTCAPP_EXCEPTION(f"Can't attach callback for event {event} to data channel {name}: {e}")
 
         self.data_channels[name] = data_channel
+        if sender is not None:
+            # kwargs of DataChannelSender: batch_interval, low_watermark, high_watermark, max_pending, is_binary
+            self.data_channels_senders[name] = DataChannelSender(data_channel, name, **sender)
         LOGGER.info(f"OK: created data channel {name}")
 
     def set_data_channels(self) -> None:
@@ -301,6 +308,7 @@ class GstWebRTCApp(metaclass=ABCMeta):
                         name,
                         dc_cfg.get("options", None),
                         dc_cfg.get("callbacks", None),
+                        dc_cfg.get("sender", None),
                     )
                 else:
                     LOGGER.error("ERROR: can't create data channel, 'name' is not found in the config")
@@ -309,21 +317,38 @@ class GstWebRTCApp(metaclass=ABCMeta):
         dc = self.data_channels[data_channel_name]
         return dc and dc.get_property("ready-state") == GstWebRTC.WebRTCDataChannelState.OPEN
 
-    def send_data_channel_message(self, data_channel_name: str, data: Dict[str, Any]) -> bool:
+    def send_data_channel_message(
+        self,
+        data_channel_name: str,
+        data: Dict[str, Any],
+        is_low_priority: bool = False,
+    ) -> bool:
         if not self.is_data_channel_ready(data_channel_name):
             LOGGER.debug(f"dropping message, data channel {data_channel_name} is not ready")
             return False
-        self.data_channels[data_channel_name].emit("send-string", json.dumps(data))
+        if data_channel_name in self.data_channels_senders:
+            # batched and backpressured, the low-priority messages could be decimated under congestion
+            self.data_channels_senders[data_channel_name].send(data, is_low_priority)
+        else:
+            self.data_channels[data_channel_name].emit("send-string", json.dumps(data))
         return True
 
+    def close_data_channels_senders(self) -> None:
+        for sender in self.data_channels_senders.values():
+            sender.close()
+        self.data_channels_senders = {}
+
     async def handle_pipeline(self) -> None:
-        # run the loop to fetch messages from the bus
+        # wait for the bus messages on the bus's fd in the event loop, pop them only when there are any
         LOGGER.info("OK: PIPELINE HANDLER IS ON -- ready to read pipeline bus messages")
         self.bus = self.pipeline.get_bus()
+        loop = asyncio.get_running_loop()
+        bus_event = asyncio.Event()
+        bus_fd = self._watch_bus_fd(loop, bus_event)
         try:
             while True:
-                message = self.bus.timed_pop_filtered(
-                    0.1 * Gst.SECOND,
+                # pop_filtered discards the messages of other types, so the bus is empty when it returns None
+                message = self.bus.pop_filtered(
                     Gst.MessageType.APPLICATION
                     | Gst.MessageType.EOS
                     | Gst.MessageType.ERROR
@@ -363,16 +388,38 @@ class GstWebRTCApp(metaclass=ABCMeta):
                                 f"{Gst.Element.state_get_name(old)} to "
                                 f"{Gst.Element.state_get_name(new)}"
                             )
-                await asyncio.sleep(0.1)
+                else:
+                    if bus_fd is not None:
+                        bus_event.clear()
+                        await bus_event.wait()
+                    else:
+                        await asyncio.sleep(0.1)
         except KeyboardInterrupt:
             LOGGER.info("ERROR: handle_pipeline, KeyboardInterrupt received, exiting...")
+        finally:
+            if bus_fd is not None:
+                loop.remove_reader(bus_fd)
 
         LOGGER.info("OK: PIPELINE HANDLER IS OFF")
         self.is_running = False
         self.terminate_pipeline()
 
+    def _watch_bus_fd(self, loop: asyncio.AbstractEventLoop, event: asyncio.Event) -> int | None:
+        # the bus's fd is readable while there are pending messages. Returns None if it is not pollable (e.g., on
+        # Windows or with a loop without add_reader), then the handler falls back to polling the bus
+        try:
+            bus_fd = self.bus.get_pollfd().fd
+            if bus_fd < 0:
+                return None
+            loop.add_reader(bus_fd, event.set)
+            return bus_fd
+        except Exception as e:
+            LOGGER.warning(f"WARNING: can't watch the pipeline's bus fd, polling the bus instead, reason: {e}")
+            return None
+
     def terminate_pipeline(self) -> None:
         LOGGER.info("OK: terminating pipeline...")
+        self.close_data_channels_senders()
         for data_channel_name in self.data_channels.keys():
             self.data_channels[data_channel_name].emit('close')
             LOGGER.info(f"OK: data channel {data_channel_name} is closed")
@@ -12,7 +12,6 @@ License:
 
 """
 
-import asyncio
 from collections import OrderedDict
 import re
 import gi
@@ -27,6 +26,7 @@ from gi.repository import GstWebRTC
 from gstwebrtcapp.apps.app import GstWebRTCApp, GstWebRTCAppConfig
 from gstwebrtcapp.apps.pipelines import SINK_H264_IN_H264_OUT_PIPELINE
 from gstwebrtcapp.utils.base import GSTWEBRTCAPP_EXCEPTION, LOGGER, wait_for_condition
+from gstwebrtcapp.utils.bridge import SignalBridge
 from gstwebrtcapp.utils.gst import DEFAULT_GCC_SETTINGS, dump_to_dot
 from gstwebrtcapp.utils.webrtc import TWCC_URI
 
@@ -48,7 +48,8 @@ class SinkApp(GstWebRTCApp):
         self.source = None
         self.signaller = None
         self.gcc = None
-        self.gcc_estimated_bitrates = asyncio.Queue()
+        # notify::estimated-bitrate fires in a streaming thread on every change, only the latest one per 100 ms matters
+        self.gcc_estimated_bitrates = SignalBridge("gcc_estimated_bitrates", conflate_interval=0.1)
         self.encoder = None
         self.encoder_caps = None
         self.encoder_capsfilter = None
@@ -262,7 +263,7 @@ class SinkApp(GstWebRTCApp):
     def on_estimated_bitrate_changed(self, bwe, pspec) -> None:
         if bwe and pspec.name == "estimated-bitrate":
             estimated_bitrate = self.gcc.get_property(pspec.name)
-            self.gcc_estimated_bitrates.put_nowait(estimated_bitrate)
+            self.gcc_estimated_bitrates.emit(estimated_bitrate)
         else:
             raise GSTWEBRTCAPP_EXCEPTION("Can't get estimated bitrate by gcc")
 
@@ -15,7 +15,7 @@ import asyncio
 import json
 import re
 import threading
-from typing import List
+from typing import Any, Dict, List
 import gi
 
 
@@ -29,7 +29,7 @@ from gstwebrtcapp.apps.sinkapp.app import SinkApp
 from gstwebrtcapp.control.agent import Agent, AgentType
 from gstwebrtcapp.control.safety.switcher import SwitchingPair
 from gstwebrtcapp.media.preset import get_video_preset, get_video_preset_by_bitrate
-from gstwebrtcapp.message.client import MqttConfig, MqttPair, MqttPublisher, MqttSubscriber
+from gstwebrtcapp.message.client import MqttConfig, MqttPair, MqttPassthrough, MqttPublisher, MqttSubscriber
 from gstwebrtcapp.network.controller import NetworkController
 from gstwebrtcapp.utils.app import get_agent_type_by_switch_code, get_switch_code_by_agent_type
 from gstwebrtcapp.utils.base import LOGGER, async_wait_for_condition
@@ -321,12 +321,21 @@ class SinkConnector:
                             case "reload_agent":
                                 if self._reload_agent(msg[action]):
                                     LOGGER.info(f"ACTION: feed {self.feed_name} reloaded its {msg[action]} agent")
+                            case "passthrough":
+                                # comes from the controller: a dict to let the agents bypass it or False to stop it
+                                if self._set_passthrough(msg[action]):
+                                    s_str = "on" if msg[action] else "off"
+                                    LOGGER.info(f"ACTION: feed {self.feed_name} turned {s_str} actions pass-through")
                             case "send_dc":
                                 action = msg[action]
                                 if isinstance(action, dict) and "name" in action and "msg" in action:
+                                    # the relayed stats are telemetry, they could be decimated under congestion.
+                                    # The alerts carry the stats too but must reach the UI
+                                    is_telemetry = isinstance(action["msg"], dict) and "stats" in action["msg"]
                                     if self._app.send_data_channel_message(
                                         action["name"],
                                         {"feed_name": self.feed_name, "msg": action["msg"]},
+                                        is_low_priority=is_telemetry and "alert" not in action["msg"],
                                     ):
                                         LOGGER.debug(
                                             f"ACTION: feed {self.feed_name} sent message to {action['name']} dc"
@@ -343,9 +352,16 @@ class SinkConnector:
 
     async def handle_bandwidth_estimations(self) -> None:
         LOGGER.info(f"OK: BANDWIDTH ESTIMATIONS HANDLER IS ON -- ready to publish bandwidth estimations")
+        loop = asyncio.get_running_loop()
+        next_report_time = loop.time() + 60.0
         while self.is_running:
             gcc_bw = await self._app.gcc_estimated_bitrates.get()
             self.mqtts.publisher.publish(self.mqtt_config.topics.gcc, str(gcc_bw))
+            if loop.time() >= next_report_time:
+                # the counters of the signals handed over from the GStreamer threads, e.g., to spot the drops
+                bridges = [self._app.gcc_estimated_bitrates, *self._app.data_channels_data.values()]
+                LOGGER.info(f"INFO: feed {self.feed_name} signal bridges: {[b.get_stats() for b in bridges]}")
+                next_report_time = loop.time() + 60.0
         LOGGER.info(f"OK: BANDWIDTH ESTIMATIONS HANDLER IS OFF!")
 
     async def handle_external_data_channel(self) -> None:
@@ -510,6 +526,16 @@ class SinkConnector:
                 return True
         return False
 
+    def _set_passthrough(self, passthrough_dict: Dict[str, Any] | bool) -> bool:
+        try:
+            passthrough = MqttPassthrough.from_dict(passthrough_dict) if passthrough_dict else None
+        except (KeyError, TypeError, AttributeError) as e:
+            LOGGER.error(f"ERROR: feed {self.feed_name} got invalid pass-through {passthrough_dict}, reason: {e}")
+            return False
+        for agent in self.agents.values():
+            agent.set_passthrough(passthrough)
+        return True
+
     def _terminate_agents(self) -> None:
         if self.agent_threads:
             for agent in self.agents.values():
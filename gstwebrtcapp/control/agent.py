@@ -16,7 +16,7 @@ from abc import ABCMeta, abstractmethod
 from enum import Enum
 import secrets
 
-from gstwebrtcapp.message.client import MqttConfig, MqttPair, MqttPublisher, MqttSubscriber
+from gstwebrtcapp.message.client import MqttConfig, MqttPair, MqttPassthrough, MqttPublisher, MqttSubscriber
 
 
 class AgentType(Enum):
@@ -56,6 +56,10 @@ class Agent(metaclass=ABCMeta):
         self.mqtts.publisher.stop()
         self.mqtts.subscriber.stop()
 
+    def set_passthrough(self, passthrough: MqttPassthrough | None) -> None:
+        # redirect the actions straight to the feed's connector (if set) or back to the configured topic (if None)
+        self.mqtts.publisher.set_passthrough(self.mqtt_config.topics.actions, passthrough)
+
     @abstractmethod
     def init_subscriptions(self) -> None:
         pass
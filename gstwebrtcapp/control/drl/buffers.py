@@ -0,0 +1,248 @@
+from collections import OrderedDict
+import os
+from typing import Any, Dict, List, Tuple
+
+from gymnasium import spaces
+import numpy as np
+from stable_baselines3.common.buffers import DictReplayBuffer, ReplayBuffer
+from stable_baselines3.common.type_aliases import DictReplayBufferSamples
+from stable_baselines3.common.vec_env import VecNormalize
+import torch
+
+from gstwebrtcapp.utils.base import LOGGER
+
+
+class MmapDictReplayBuffer(DictReplayBuffer):
+    """
+    A dict replay buffer that keeps all observations in one flat memory-mapped file instead of per-key arrays in RAM.
+    The file has a (buffer_size, n_envs, 2, obs_dim) layout where obs_dim is the sum of all flattened keys,
+    so an observation and its next observation lie together and a sampled batch is gathered with a single read.
+    Only actions, rewards, dones and timeouts stay in RAM.
+
+    When pickled (e.g., in a "last_full" model), only the file path and the small arrays are stored. The file
+    is reopened lazily on the first access after loading, so the OS pages in only what is sampled and the
+    buffer could be larger than RAM.
+
+    NOTE: all checkpoints of a run refer to the same file, so only the buffer of the last pickled one is valid.
+    Each added transition bumps the revision kept in the ``<mmap_path>.rev`` file, and reopening the buffer of
+    a checkpoint fails if the file has moved on since it was pickled.
+
+    :param buffer_size: Max number of elements in the buffer
+    :param observation_space: Observation space (Dict)
+    :param action_space: Action space
+    :param device: PyTorch device
+    :param n_envs: Number of parallel environments
+    :param optimize_memory_usage: Not supported, kept for the SB3 signature
+    :param handle_timeout_termination: Handle timeout termination separately
+    :param mmap_path: Path to the memory-mapped file. Defaults to ./replay_buffer.mmap
+    :param is_half_precision: Store observations as float16. Allowed only if all features are scaled to [0,1]
+    :param is_overwrite: Overwrite the existing file. Otherwise, an existing file is never truncated
+    """
+
+    def __init__(
+        self,
+        buffer_size: int,
+        observation_space: spaces.Dict,
+        action_space: spaces.Space,
+        device: torch.device | str = "auto",
+        n_envs: int = 1,
+        optimize_memory_usage: bool = False,
+        handle_timeout_termination: bool = True,
+        mmap_path: str | None = None,
+        is_half_precision: bool = False,
+        is_overwrite: bool = False,
+    ):
+        # skip DictReplayBuffer.__init__ as it allocates the per-key observation arrays in RAM
+        super(ReplayBuffer, self).__init__(buffer_size, observation_space, action_space, device, n_envs=n_envs)
+        if optimize_memory_usage:
+            raise ValueError("ERROR: MmapDictReplayBuffer does not support optimize_memory_usage")
+        self.optimize_memory_usage = False
+        self.buffer_size = max(buffer_size // n_envs, 1)
+
+        self.mmap_path = os.path.abspath(mmap_path or "replay_buffer.mmap")
+        if os.path.exists(self.mmap_path) and not is_overwrite:
+            raise FileExistsError(
+                f"ERROR: MmapDictReplayBuffer -- file {self.mmap_path} already exists, remove it or pass is_overwrite"
+            )
+        self.obs_slices = self._make_obs_slices(self.obs_shape)
+        self.obs_dim = sum(s.stop - s.start for s, _ in self.obs_slices.values())
+        self.dtype = np.float32
+        if is_half_precision:
+            if self._is_unit_scaled(observation_space):
+                self.dtype = np.float16
+            else:
+                LOGGER.warning(
+                    "WARNING: MmapDictReplayBuffer -- not all observation features are scaled to [0,1], "
+                    "float16 storage is disabled"
+                )
+
+        self.actions = np.zeros(
+            (self.buffer_size, self.n_envs, self.action_dim), dtype=self._maybe_cast_dtype(action_space.dtype)
+        )
+        self.rewards = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.dones = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.handle_timeout_termination = handle_timeout_termination
+        self.timeouts = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+
+        # number of added transitions, the file's one should match it to reopen the buffer
+        self.revision = 0
+        self._storage = None
+        self._revision_storage = None
+        self._open(mode="w+")
+        LOGGER.info(
+            f"OK: MmapDictReplayBuffer -- {self.mmap_path} is mapped, observations take "
+            f"{self.storage_nbytes() / 1e6:.2f}MB on disk vs {self.default_nbytes() / 1e6:.2f}MB in RAM "
+            "for the default DictReplayBuffer"
+        )
+
+    @property
+    def storage(self) -> np.memmap:
+        if self._storage is None:
+            self._open(mode="r+")
+        return self._storage
+
+    @property
+    def observations(self) -> Dict[str, np.ndarray]:
+        return self._views(0)
+
+    @observations.setter
+    def observations(self, _) -> None:
+        # DictReplayBuffer-based code might try to reassign the arrays, the storage is fixed though
+        raise AttributeError("ERROR: MmapDictReplayBuffer -- observations are views of the file and can't be reassigned")
+
+    @property
+    def next_observations(self) -> Dict[str, np.ndarray]:
+        return self._views(1)
+
+    @next_observations.setter
+    def next_observations(self, _) -> None:
+        raise AttributeError(
+            "ERROR: MmapDictReplayBuffer -- next_observations are views of the file and can't be reassigned"
+        )
+
+    def add(
+        self,
+        obs: Dict[str, np.ndarray],
+        next_obs: Dict[str, np.ndarray],
+        action: np.ndarray,
+        reward: np.ndarray,
+        done: np.ndarray,
+        infos: List[Dict[str, Any]],
+    ) -> None:
+        # write the whole (n_envs, 2, obs_dim) row at once
+        self.storage[self.pos] = np.stack(
+            [
+                np.concatenate([np.asarray(obs[key]).reshape(self.n_envs, -1) for key in self.obs_slices], axis=1),
+                np.concatenate([np.asarray(next_obs[key]).reshape(self.n_envs, -1) for key in self.obs_slices], axis=1),
+            ],
+            axis=1,
+        )
+
+        self.actions[self.pos] = np.array(action).reshape((self.n_envs, self.action_dim))
+        self.rewards[self.pos] = np.array(reward)
+        self.dones[self.pos] = np.array(done)
+        if self.handle_timeout_termination:
+            self.timeouts[self.pos] = np.array([info.get("TimeLimit.truncated", False) for info in infos])
+        self.revision += 1
+        self._revision_storage[0] = self.revision
+
+        self.pos += 1
+        if self.pos == self.buffer_size:
+            self.full = True
+            self.pos = 0
+
+    def flush(self) -> None:
+        if self._storage is not None:
+            self._storage.flush()
+            self._revision_storage.flush()
+
+    def storage_nbytes(self) -> int:
+        return self.buffer_size * self.n_envs * 2 * self.obs_dim * np.dtype(self.dtype).itemsize
+
+    def default_nbytes(self) -> int:
+        return self.buffer_size * self.n_envs * 2 * self.obs_dim * np.dtype(np.float32).itemsize
+
+    def _get_samples(
+        self,
+        batch_inds: np.ndarray,
+        env: VecNormalize | None = None,
+    ) -> DictReplayBufferSamples:
+        env_indices = np.random.randint(0, high=self.n_envs, size=(len(batch_inds),))
+
+        # one gather for both obs and next obs, then cheap per-key views
+        batch = np.asarray(self.storage[batch_inds, env_indices], dtype=np.float32)
+        obs_ = self._normalize_obs(self._split(batch[:, 0]), env)
+        next_obs_ = self._normalize_obs(self._split(batch[:, 1]), env)
+
+        return DictReplayBufferSamples(
+            observations={key: self.to_torch(obs) for key, obs in obs_.items()},
+            actions=self.to_torch(self.actions[batch_inds, env_indices]),
+            next_observations={key: self.to_torch(obs) for key, obs in next_obs_.items()},
+            dones=self.to_torch(self.dones[batch_inds, env_indices] * (1 - self.timeouts[batch_inds, env_indices])).reshape(
+                -1, 1
+            ),
+            rewards=self.to_torch(self._normalize_reward(self.rewards[batch_inds, env_indices].reshape(-1, 1), env)),
+        )
+
+    def _open(self, mode: str) -> None:
+        if mode == "w+":
+            os.makedirs(os.path.dirname(self.mmap_path), exist_ok=True)
+        elif not os.path.isfile(self.mmap_path):
+            raise FileNotFoundError(f"ERROR: MmapDictReplayBuffer -- file {self.mmap_path} does not exist")
+        revision_storage = np.memmap(f"{self.mmap_path}.rev", dtype=np.int64, mode=mode, shape=(1,))
+        if mode != "w+" and int(revision_storage[0]) != self.revision:
+            raise RuntimeError(
+                f"ERROR: MmapDictReplayBuffer -- file {self.mmap_path} is at revision {int(revision_storage[0])} "
+                f"but the buffer expects {self.revision}, it was overwritten after this checkpoint was saved. "
+                "Only the buffer of the last checkpoint is valid"
+            )
+        self._revision_storage = revision_storage
+        self._storage = np.memmap(
+            self.mmap_path,
+            dtype=self.dtype,
+            mode=mode,
+            shape=(self.buffer_size, self.n_envs, 2, self.obs_dim),
+        )
+
+    def _views(self, idx: int) -> Dict[str, np.ndarray]:
+        storage = self.storage
+        return OrderedDict(
+            (key, storage[:, :, idx, flat_slice].reshape(self.buffer_size, self.n_envs, *shape))
+            for key, (flat_slice, shape) in self.obs_slices.items()
+        )
+
+    def _split(self, flat: np.ndarray) -> Dict[str, np.ndarray]:
+        return OrderedDict(
+            (key, flat[:, flat_slice].reshape(len(flat), *shape)) for key, (flat_slice, shape) in self.obs_slices.items()
+        )
+
+    def _make_obs_slices(self, obs_shape: Dict[str, Tuple[int, ...]]) -> Dict[str, Tuple[slice, Tuple[int, ...]]]:
+        obs_slices = OrderedDict()
+        start = 0
+        for key, shape in obs_shape.items():
+            size = int(np.prod(shape))
+            obs_slices[key] = (slice(start, start + size), tuple(shape))
+            start += size
+        return obs_slices
+
+    def _is_unit_scaled(self, observation_space: spaces.Dict) -> bool:
+        for space in observation_space.spaces.values():
+            if not isinstance(space, spaces.Box) or np.any(space.low < 0) or np.any(space.high > 1):
+                return False
+        return True
+
+    def __getstate__(self) -> Dict[str, Any]:
+        self.flush()
+        state = self.__dict__.copy()
+        state["_storage"] = None
+        state["_revision_storage"] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        # the file is reopened on the first access
+        self.__dict__.update(state)
+
+
+REPLAY_BUFFER_CLASSES = {
+    'mmap': MmapDictReplayBuffer,
+}
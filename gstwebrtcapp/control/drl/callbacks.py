@@ -1,12 +1,24 @@
 import csv
 import datetime
-import glob
 import gymnasium
+import json
 import os
+import time
+from typing import List
 
 from stable_baselines3.common.callbacks import BaseCallback, CheckpointCallback
 from stable_baselines3.common.vec_env import VecEnv
 
+from gstwebrtcapp.control.drl.checkpoint import (
+    DrlCheckpointWriter,
+    copy_file_atomic,
+    get_replay_buffer_path,
+    save_model_snapshot,
+    save_replay_buffer_snapshot,
+    take_model_snapshot,
+)
+from gstwebrtcapp.control.drl.timing import StepTimer
+from gstwebrtcapp.message.client import MqttPublisher
 from gstwebrtcapp.utils.base import LOGGER
 
 
@@ -14,11 +26,19 @@ class DrlCheckpointCallback(CheckpointCallback):
     """
     Save model with the given frequency and always at the end of training
 
+    In the async mode, the model (and its replay buffer) is only copied in memory on the training thread,
+    and the serialization is done by a background writer. In the sync mode, the same files are written on the training
+    thread without copying. Each file is written to a temporary file first and then atomically replaces the target, so
+    an interrupted write never leaves a truncated checkpoint. In both modes, the replay buffer is stored next to the
+    model as a separate ``<model>_replay_buffer.npz`` file instead of SB3's pickle (see load_replay_buffer_snapshot).
+
     :param save_freq: Save checkpoints every ``save_freq`` call of the callback.
     :param save_path: Path to the folder where the model will be saved.
     :param name_prefix: Common prefix to the saved models
     :param save_replay_buffer: Save the model replay buffer
     :param save_vecnormalize: Save the ``VecNormalize`` statistics
+    :param is_async: Serialize checkpoints in a background thread
+    :param is_compress_replay_buffer: Compress the replay buffer file
     :param verbose: Verbosity level (0 -- 2)
     """
 
@@ -29,6 +49,8 @@ class DrlCheckpointCallback(CheckpointCallback):
         name_prefix: str = "drl_model",
         save_replay_buffer: bool = True,
         save_vecnormalize: bool = True,
+        is_async: bool = False,
+        is_compress_replay_buffer: bool = True,
         verbose: int = 0,
     ):
         super().__init__(save_freq, save_path, name_prefix, save_replay_buffer, save_vecnormalize, verbose)
@@ -37,9 +59,9 @@ class DrlCheckpointCallback(CheckpointCallback):
         self.name_prefix = name_prefix
         self.save_replay_buffer = save_replay_buffer
         self.save_vecnormalize = save_vecnormalize
-
-    def _on_training_end(self):
-        include = [
+        self.is_async = is_async
+        self.is_compress_replay_buffer = is_compress_replay_buffer
+        self.include = [
             "policy",
             "replay_buffer",
             "rollout_buffer",
@@ -47,28 +69,105 @@ class DrlCheckpointCallback(CheckpointCallback):
             "_episode_storage_logger",
             "_custom_logger",
         ]
+        self.writer = DrlCheckpointWriter() if is_async else None
+
+    def _init_callback(self) -> None:
+        super()._init_callback()
+        if self.is_async and self.writer is None:
+            # the training is continued after the writer has been shut down
+            self.writer = DrlCheckpointWriter()
+
+    def _on_step(self) -> bool:
+        if self.n_calls % self.save_freq == 0:
+            if self.is_async and self.writer is None:
+                # the writer has been shut down by the manager's stop, the final models are written on training end
+                return True
+            if self.is_async and self.writer.is_busy():
+                # never queue snapshots: the memory would grow if the disk is slower than the training
+                LOGGER.warning("WARNING: DrlCheckpointCallback -- previous checkpoint is still being written, skipping...")
+                return True
+
+            model_path = self._checkpoint_path(extension="zip")
+            self._save_model(
+                [model_path],
+                is_with_replay_buffer=self.save_replay_buffer and getattr(self.model, "replay_buffer", None) is not None,
+            )
+
+            if self.save_vecnormalize and self.model.get_vec_normalize_env() is not None:
+                # tiny file, keep it synchronous
+                vec_normalize_path = self._checkpoint_path("vecnormalize_", extension="pkl")
+                self.model.get_vec_normalize_env().save(vec_normalize_path)
+
+            if self.verbose >= 2:
+                LOGGER.info(f"INFO: DrlCheckpointCallback -- checkpoint is taken, writing to {model_path}")
+        return True
 
+    def _on_training_end(self):
         dt = datetime.datetime.now().strftime("%Y_%m_%d-%I_%M_%S_%p")
         model_path_full = os.path.join(self.save_path, f"{self.name_prefix}_{dt}_FULL.zip")
         model_path_default = os.path.join(self.save_path, f"{self.name_prefix}_{dt}_DEFAULT.zip")
 
-        LOGGER.info("OK: Saving final models...")
-        self.model.save(model_path_full, exclude=["env"], include=include)
-        self.model.save(model_path_default)
+        LOGGER.info(f"OK: Saving final models{' in background' if self.is_async else ''}...")
+        if self.is_async and self.writer is None:
+            # the manager has stopped the writer, the final models are written anyway
+            self.writer = DrlCheckpointWriter()
+        # 1. the full model with the replay buffer, also as last_full.zip replaced always with the newest trained version
+        self._save_model(
+            [model_path_full, os.path.join(self.save_path, "last_full.zip")],
+            exclude=["env"],
+            include=self.include,
+            is_with_replay_buffer=getattr(self.model, "replay_buffer", None) is not None,
+        )
+        # 2. the default model wo replay and experience buffers as saved by model.save(), also as last_default.zip
+        self._save_model([model_path_default, os.path.join(self.save_path, "last_default.zip")])
+        # the training is over, so the final models should be on disk before anyone tries to load them
+        self.shutdown(wait=True)
+        LOGGER.info("OK: All models are successfully saved on training end, training is finished!")
 
-        # 1. save the last model additionally as last_full.zip and replace always with the newest trained version
-        last_full_path = os.path.join(self.save_path, "last_full.zip")
-        for filename in glob.glob(last_full_path):
-            os.remove(filename)
-        self.model.save(last_full_path, exclude=["env"], include=include)
+    def wait(self, timeout: float | None = None) -> None:
+        """
+        Block until all pending checkpoints are written. Does nothing in the sync mode.
+        """
+        if self.writer is not None:
+            self.writer.wait(timeout)
 
-        # 2. save also the last default model as last_default.zip wo replay and experience buffers as default saving by model.save()
-        last_def_path = os.path.join(self.save_path, "last_default.zip")
-        for filename in glob.glob(last_def_path):
-            os.remove(filename)
-        self.model.save(last_def_path)
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the background writer, a new one is started if the training continues. Does nothing in the sync mode.
 
-        LOGGER.info("OK: All models are successfully saved on training end, training is finished!")
+        :param wait: If True, block until the pending checkpoints are written
+        """
+        if self.writer is not None:
+            self.writer.shutdown(wait)
+            self.writer = None
+
+    def _save_model(
+        self,
+        paths: List[str],
+        exclude: List[str] | None = None,
+        include: List[str] | None = None,
+        is_with_replay_buffer: bool = False,
+    ) -> None:
+        # the same files in both modes, only the thread that writes them differs
+        if self.is_async:
+            try:
+                snapshot = take_model_snapshot(self.model, exclude, include, is_with_replay_buffer)
+                self.writer.submit(self._write_snapshot, snapshot, paths)
+                return
+            except RuntimeError as e:
+                LOGGER.warning(f"WARNING: DrlCheckpointCallback -- {e}, writing the checkpoint synchronously...")
+        snapshot = take_model_snapshot(self.model, exclude, include, is_with_replay_buffer, is_detached=False)
+        self._write_snapshot(snapshot, paths)
+
+    def _write_snapshot(self, snapshot, paths):
+        # write once and copy for the aliases (e.g., last_full.zip)
+        save_model_snapshot(snapshot, paths[0])
+        if snapshot.replay_buffer is not None:
+            save_replay_buffer_snapshot(snapshot, get_replay_buffer_path(paths[0]), self.is_compress_replay_buffer)
+        for path in paths[1:]:
+            copy_file_atomic(paths[0], path)
+            if snapshot.replay_buffer is not None:
+                copy_file_atomic(get_replay_buffer_path(paths[0]), get_replay_buffer_path(path))
 
 
 class DrlPrintStepCallback(BaseCallback):
@@ -230,6 +329,129 @@ class DrlBreakCallback(BaseCallback):
             self.training_env.close()
 
 
+class DrlTimingCallback(BaseCallback):
+    """
+    Reports where the training time goes. It takes the env step phase histograms (look into DrlEnv.timer) and adds
+    the model overhead per step (predict, buffer insert and callbacks) and the training (gradient update) time.
+    Mean and p95 values in ms are recorded to the SB3 logger and optionally the full summary is published over MQTT.
+    For the clear and concise output, it works only with a single environment or with a 1-dim vectorized one.
+
+    :param publisher: MQTT publisher to publish the summary. Nullable
+    :param topic: MQTT topic for the summary. Nullable
+    :param publish_freq: Publish the summary every ``publish_freq`` steps
+    :param verbose: Verbosity level (0 -- 2)
+    """
+
+    def __init__(
+        self,
+        publisher: MqttPublisher | None = None,
+        topic: str | None = None,
+        publish_freq: int = 10,
+        verbose: int = 0,
+    ):
+        super().__init__(verbose)
+        self.publisher = publisher
+        self.topic = topic
+        self.publish_freq = publish_freq
+        self.timer = StepTimer(["iteration", "model", "train"])
+        self.last_step_time = None
+        self.rollout_end_time = None
+
+    def _on_rollout_start(self):
+        now = time.perf_counter()
+        if self.rollout_end_time is not None:
+            self.timer.record("train", now - self.rollout_end_time)
+        # measure the next iteration from here to exclude the training time
+        self.last_step_time = now
+
+    def _on_rollout_end(self):
+        self.rollout_end_time = time.perf_counter()
+
+    def _on_step(self):
+        env_timer = self._get_env_timer()
+        now = time.perf_counter()
+        if self.last_step_time is not None:
+            iteration = now - self.last_step_time
+            self.timer.record("iteration", iteration)
+            self.timer.record("model", max(0.0, iteration - env_timer.histograms["step"].last_ms / 1000))
+        self.last_step_time = now
+
+        summary = env_timer.summary() | self.timer.summary()
+        for name, values in summary.items():
+            if values["count"] > 0:
+                self.logger.record(f"timing/{name}_mean_ms", values["mean"])
+                self.logger.record(f"timing/{name}_p95_ms", values["p95"])
+
+        if self.publisher is not None and self.topic and self.n_calls % self.publish_freq == 0:
+            try:
+                self.publisher.publish(self.topic, json.dumps(summary))
+            except Exception as e:
+                LOGGER.warning(f"WARNING: DrlTimingCallback -- failed to publish the timings, reason: {e}")
+        return True
+
+    def _get_env_timer(self) -> StepTimer:
+        if isinstance(self.training_env, VecEnv):
+            return self.training_env.get_attr("timer")[0]
+        else:
+            return self.training_env.timer
+
+
+class DrlEarlyStoppingCallback(BaseCallback):
+    """
+    Stops the training when the mean episode reward over the last ``window`` episodes has not improved
+    by more than ``min_delta`` for ``patience`` episodes. Works with a single environment.
+
+    :param patience: Number of episodes without improvement before stopping
+    :param min_episodes: Minimum number of episodes before stopping is allowed
+    :param window: Number of the last episodes to average the reward over
+    :param min_delta: Minimum improvement of the mean reward
+    :param verbose: Verbosity level (0 -- 2)
+    """
+
+    def __init__(
+        self,
+        patience: int = 5,
+        min_episodes: int = 5,
+        window: int = 3,
+        min_delta: float = 0.0,
+        verbose: int = 0,
+    ):
+        super().__init__(verbose)
+        self.patience = patience
+        self.min_episodes = min_episodes
+        self.window = window
+        self.min_delta = min_delta
+        self.episode_rewards = []
+        self.current_reward = 0.0
+        self.best_mean_reward = -float("inf")
+        self.episodes_without_improvement = 0
+        self.is_stopped = False
+
+    def _on_step(self):
+        self.current_reward += float(self.locals["rewards"][0])
+        if not self.locals["dones"][0]:
+            return True
+
+        self.episode_rewards.append(self.current_reward)
+        self.current_reward = 0.0
+        mean_reward = sum(self.episode_rewards[-self.window :]) / len(self.episode_rewards[-self.window :])
+        if mean_reward > self.best_mean_reward + self.min_delta:
+            self.best_mean_reward = mean_reward
+            self.episodes_without_improvement = 0
+        else:
+            self.episodes_without_improvement += 1
+
+        if len(self.episode_rewards) >= self.min_episodes and self.episodes_without_improvement >= self.patience:
+            if self.verbose >= 1:
+                LOGGER.info(
+                    f"OK: DrlEarlyStoppingCallback -- no improvement for {self.patience} episodes, "
+                    f"best mean reward {self.best_mean_reward:.3f}, stopping the training..."
+                )
+            self.is_stopped = True
+            return False
+        return True
+
+
 class DrlEvaluatingCallback:
     """
     auxilary class for self-producing a default callback for an old way of calling in evaluate_policy() function.
@@ -0,0 +1,265 @@
+import copy
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+import os
+import shutil
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from stable_baselines3.common.base_class import BaseAlgorithm
+from stable_baselines3.common.buffers import ReplayBuffer
+from stable_baselines3.common.save_util import recursive_getattr, save_to_zip_file
+
+from gstwebrtcapp.control.drl.buffers import MmapDictReplayBuffer
+from gstwebrtcapp.utils.base import LOGGER
+
+
+@dataclass
+class DrlModelSnapshot:
+    """
+    An in-memory copy of everything SB3 writes on model.save() plus an optional flat copy of the replay buffer.
+    It is detached from the live model, so it could be serialized in another thread while the training goes on.
+
+    :param data: Class parameters of the model (non-PyTorch variables)
+    :param params: State dicts of the model's torch modules and optimizers
+    :param pytorch_variables: Other PyTorch variables (e.g., SAC entropy coefficient)
+    :param replay_buffer: Flat arrays of the filled part of the replay buffer. Nullable
+    """
+
+    data: Dict[str, Any]
+    params: Dict[str, Any]
+    pytorch_variables: Dict[str, Any] | None = None
+    replay_buffer: Dict[str, np.ndarray] | None = field(default=None, repr=False)
+
+
+def take_model_snapshot(
+    model: BaseAlgorithm,
+    exclude: List[str] | None = None,
+    include: List[str] | None = None,
+    is_with_replay_buffer: bool = False,
+    is_detached: bool = True,
+) -> DrlModelSnapshot:
+    """
+    Copy the model the same way as BaseAlgorithm.save() collects it. The replay buffer is never pickled into
+    the model data, it is copied as flat arrays instead if requested. The only exception is MmapDictReplayBuffer:
+    its file is already on disk, so it is flushed and pickled as a lightweight reference to that file.
+
+    :param model: SB3 model
+    :param exclude: Names of parameters that should be excluded in addition to the default ones
+    :param include: Names of parameters that might be excluded but should be included anyway
+    :param is_with_replay_buffer: Whether to copy the replay buffer as well
+    :param is_detached: If True, the model data is deep-copied to be written in another thread. Otherwise, it refers
+        to the live model and the snapshot should be written before the training goes on
+    :return: A model snapshot
+    :raises RuntimeError: If the snapshot should be detached but an attribute of the model can't be copied
+    """
+    data = model.__dict__.copy()
+    excluded = set(exclude or []).union(model._excluded_save_params())
+    if include is not None:
+        excluded = excluded.difference(include)
+    state_dicts_names, torch_variable_names = model._get_torch_save_params()
+    for torch_var in state_dicts_names + torch_variable_names:
+        excluded.add(torch_var.split(".")[0])
+    is_memory_mapped = isinstance(getattr(model, "replay_buffer", None), MmapDictReplayBuffer)
+    if not is_memory_mapped:
+        # the replay buffer goes to a separate file, see save_replay_buffer_snapshot
+        excluded.add("replay_buffer")
+    for param_name in excluded:
+        data.pop(param_name, None)
+
+    if is_detached:
+        # deque-like fields (e.g., ep_info_buffer) are mutated on every step, so they should not be shared. A live
+        # object left in the snapshot would be serialized while the training mutates it
+        for key, value in data.items():
+            try:
+                data[key] = copy.deepcopy(value)
+            except Exception as e:
+                raise RuntimeError(f"ERROR: take_model_snapshot -- can't copy model attribute {key}, reason: {e}") from e
+
+    pytorch_variables = None
+    if torch_variable_names is not None:
+        pytorch_variables = {name: recursive_getattr(model, name) for name in torch_variable_names}
+    params = model.get_parameters()
+    if is_detached:
+        pytorch_variables = copy.deepcopy(pytorch_variables)
+        params = copy.deepcopy(params)
+
+    replay_buffer = None
+    if is_with_replay_buffer and not is_memory_mapped:
+        if isinstance(getattr(model, "replay_buffer", None), ReplayBuffer):
+            replay_buffer = take_replay_buffer_snapshot(model.replay_buffer)
+
+    return DrlModelSnapshot(
+        data=data,
+        params=params,
+        pytorch_variables=pytorch_variables,
+        replay_buffer=replay_buffer,
+    )
+
+
+def take_replay_buffer_snapshot(replay_buffer: ReplayBuffer) -> Dict[str, np.ndarray]:
+    """
+    Copy the filled part of the replay buffer into flat arrays. Dict observations are stored as 'observations/<key>'.
+
+    :param replay_buffer: SB3 replay buffer (plain or dict one)
+    :return: Dict of arrays with the buffer meta info stored under '_pos', '_full' and '_buffer_size' keys
+    """
+    upper_bound = replay_buffer.buffer_size if replay_buffer.full else replay_buffer.pos
+    arrays = {
+        "_pos": np.array(replay_buffer.pos),
+        "_full": np.array(replay_buffer.full),
+        "_buffer_size": np.array(replay_buffer.buffer_size),
+    }
+    for name, value in vars(replay_buffer).items():
+        if isinstance(value, np.ndarray) and value.ndim > 0 and value.shape[0] == replay_buffer.buffer_size:
+            arrays[name] = value[:upper_bound].copy()
+        elif isinstance(value, dict):
+            for key, sub_value in value.items():
+                if isinstance(sub_value, np.ndarray) and sub_value.shape[0] == replay_buffer.buffer_size:
+                    arrays[f"{name}/{key}"] = sub_value[:upper_bound].copy()
+    return arrays
+
+
+def save_model_snapshot(snapshot: DrlModelSnapshot, path: str) -> None:
+    """
+    Write the model part of the snapshot as a SB3 zip file. The file is replaced atomically.
+
+    :param snapshot: Model snapshot
+    :param path: Path to the zip file
+    """
+    _atomic_write(
+        path,
+        lambda f: save_to_zip_file(
+            f,
+            data=snapshot.data,
+            params=snapshot.params,
+            pytorch_variables=snapshot.pytorch_variables,
+        ),
+    )
+
+
+def save_replay_buffer_snapshot(snapshot: DrlModelSnapshot, path: str, is_compress: bool = True) -> None:
+    """
+    Write the replay buffer part of the snapshot as a npz file. The file is replaced atomically.
+
+    :param snapshot: Model snapshot
+    :param path: Path to the npz file
+    :param is_compress: Whether to compress the arrays (zlib)
+    """
+    if snapshot.replay_buffer is None:
+        return
+    savez = np.savez_compressed if is_compress else np.savez
+    _atomic_write(path, lambda f: savez(f, **snapshot.replay_buffer))
+
+
+def copy_file_atomic(src_path: str, dst_path: str) -> None:
+    """
+    Copy a file and replace the destination atomically.
+
+    :param src_path: Source path
+    :param dst_path: Destination path
+    """
+    with open(src_path, "rb") as src:
+        _atomic_write(dst_path, lambda f: shutil.copyfileobj(src, f))
+
+
+def get_replay_buffer_path(model_path: str) -> str:
+    """
+    Get the npz path of the replay buffer that belongs to the given model file.
+
+    :param model_path: Path to the model file with or without .zip extension
+    :return: Path to the replay buffer file
+    """
+    return f"{os.path.splitext(model_path)[0] if model_path.endswith('.zip') else model_path}_replay_buffer.npz"
+
+
+def load_replay_buffer_snapshot(model: BaseAlgorithm, path: str) -> bool:
+    """
+    Load the replay buffer arrays stored by save_replay_buffer_snapshot into the model's replay buffer.
+
+    :param model: SB3 model with an allocated replay buffer
+    :param path: Path to the npz file
+    :return: True if the buffer was loaded, False otherwise
+    """
+    replay_buffer = getattr(model, "replay_buffer", None)
+    if not isinstance(replay_buffer, ReplayBuffer) or not os.path.isfile(path):
+        return False
+
+    with np.load(path) as arrays:
+        size = min(int(arrays["_buffer_size"]), replay_buffer.buffer_size)
+        stored_pos, stored_full = int(arrays["_pos"]), bool(arrays["_full"])
+        if int(arrays["_buffer_size"]) > replay_buffer.buffer_size:
+            LOGGER.warning(
+                f"WARNING: replay buffer in {path} is larger than the model's one, "
+                f"only the first {replay_buffer.buffer_size} transitions are loaded"
+            )
+        filled = 0
+        for name in arrays.files:
+            if name.startswith("_"):
+                continue
+            values = arrays[name][:size]
+            filled = len(values)
+            if "/" in name:
+                attr, key = name.split("/", 1)
+                getattr(replay_buffer, attr)[key][:filled] = values
+            else:
+                getattr(replay_buffer, name)[:filled] = values
+
+    if stored_full and filled == replay_buffer.buffer_size:
+        # same size: continue overwriting from the stored position
+        replay_buffer.full = True
+        replay_buffer.pos = stored_pos % replay_buffer.buffer_size
+    else:
+        replay_buffer.full = filled == replay_buffer.buffer_size
+        replay_buffer.pos = filled % replay_buffer.buffer_size
+    LOGGER.info(f"OK: loaded {filled} replay buffer transitions from {path}")
+    return True
+
+
+class DrlCheckpointWriter:
+    """
+    Serializes snapshots on a single background thread so that the env step loop is never blocked by the disk I/O.
+    """
+
+    def __init__(self) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="drl_checkpoint")
+        self.futures: List[Future] = []
+
+    def submit(self, func: Callable[..., None], *args: Any) -> Future:
+        future = self.executor.submit(self._run, func, *args)
+        self.futures.append(future)
+        return future
+
+    def is_busy(self) -> bool:
+        self.futures = [f for f in self.futures if not f.done()]
+        return len(self.futures) > 0
+
+    def wait(self, timeout: float | None = None) -> None:
+        for future in self.futures:
+            future.result(timeout)
+        self.futures = []
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the background thread. No snapshots could be submitted afterwards.
+
+        :param wait: If True, block until the submitted snapshots are written
+        """
+        self.executor.shutdown(wait=wait)
+        if wait:
+            self.futures = []
+
+    def _run(self, func: Callable[..., None], *args: Any) -> None:
+        try:
+            func(*args)
+        except Exception as e:
+            LOGGER.error(f"ERROR: DrlCheckpointWriter failed to write a checkpoint, reason: {e}")
+
+
+def _atomic_write(path: str, write_func: Callable[[Any], None]) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write_func(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
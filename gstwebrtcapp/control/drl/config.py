@@ -16,11 +16,12 @@ class DrlConfig:
     :param state_max_inactivity_time: The maximum time in seconds to wait for the state update. If exceeded, the episode is terminated
     :param hyperparams_cfg: Hyperparameters configuration: either a path to a json gile or a dictionary. Nullable
     :param deterministic: Whether the DRL model should be deterministic
-    :param callbacks: Optional list of callbacks for SB3 model given as string aliases. One of 'save_model', 'save_step', 'print_step'. Nullable
+    :param callbacks: Optional list of callbacks for SB3 model given as string aliases. One of 'save_model', 'save_model_async', 'save_step', 'print_step', 'log_timing'. Nullable
     :param save_model_path: The path to save the DRL model
     :param save_log_path: The path to save the DRL logs
     :param device: The device to run the DRL model on. Nullable
     :param verbose: The verbosity level. One of 0, 1, 2
+    :param metrics_topic: MQTT topic to publish the step latency histograms on. Nullable
     """
 
     mode: str = 'train'
@@ -37,3 +38,4 @@ class DrlConfig:
     save_log_path: str = './logs'
     device: str | None = None
     verbose: int = 1
+    metrics_topic: str | None = None
@@ -4,9 +4,10 @@ from gymnasium.core import Env
 from gymnasium.spaces import Box, MultiDiscrete
 import numpy as np
 import time
-from typing import Any, Dict, List, OrderedDict
+from typing import Any, Dict, List, OrderedDict, Tuple
 
 from gstwebrtcapp.control.drl.mdp import MDP
+from gstwebrtcapp.control.drl.timing import StepTimer
 from gstwebrtcapp.message.client import MqttPair
 from gstwebrtcapp.utils.base import (
     LOGGER,
@@ -43,14 +44,41 @@ class DrlEnv(Env):
         self.observation_space = self.mdp.create_observation_space()
         self.action_space = self.mdp.create_action_space()
 
+        # two flat float32 buffers with per-key views that are written in turns (None if the space is not all-Box)
+        self.flat_buffers = [self._make_flat_state() for _ in range(2)]
+        self.flat_buffer_idx = 0
+        self.flat_state, self.state_views = self.flat_buffers[self.flat_buffer_idx]
+
+        # latency histograms of the step/reset phases in ms
+        self.timer = StepTimer(
+            [
+                "step",
+                "publish_action",
+                "wait_interval",
+                "collect_stats",
+                "select_observations",
+                "merge_observations",
+                "make_state",
+                "publish_state",
+                "reward",
+                "terminal_check",
+                "reset",
+            ]
+        )
+
     def step(self, action):
+        with self.timer.span("step"):
+            return self._step(action)
+
+    def _step(self, action):
         self.steps += 1
         self.last_action = action
         if not self.is_finished:
-            self.mqtts.publisher.publish(
-                self.mqtts.subscriber.topics.actions,
-                json.dumps(self.mdp.pack_action_for_controller(action)),
-            )
+            with self.timer.span("publish_action"):
+                self.mqtts.publisher.publish(
+                    self.mqtts.subscriber.topics.actions,
+                    json.dumps(self.mdp.pack_action_for_controller(action)),
+                )
 
         # get observation (webrtc stats) from the controller
         stats = self._get_observation()
@@ -59,17 +87,21 @@ class DrlEnv(Env):
             return self.state, self.reward, False, True, {}
 
         # make state from the observation
-        state_dict = self.mdp.make_state(stats, action)
-        self.state = self._dict_to_gym_space_sample(state_dict)
+        with self.timer.span("make_state"):
+            state_dict = self.mdp.make_state(stats, action)
+            self.state = self._dict_to_gym_space_sample(state_dict)
         if not self.is_finished:
-            self.mqtts.publisher.publish(
-                self.mqtts.subscriber.topics.state,
-                json.dumps(self.mdp.convert_to_unscaled_state(state_dict)),
-            )
+            with self.timer.span("publish_state"):
+                self.mqtts.publisher.publish(
+                    self.mqtts.subscriber.topics.state,
+                    json.dumps(self.mdp.convert_to_unscaled_state(state_dict)),
+                )
 
-        self.reward, self.reward_parts = self.mdp.calculate_reward()
+        with self.timer.span("reward"):
+            self.reward, self.reward_parts = self.mdp.calculate_reward()
 
-        terminated = self._is_terminal()
+        with self.timer.span("terminal_check"):
+            terminated = self._is_terminal()
         truncated = self.mdp.is_truncated(self.steps)
         if terminated or truncated:
             self.episodes += 1
@@ -84,6 +116,10 @@ class DrlEnv(Env):
         return self.state, self.reward, terminated, truncated, {}
 
     def reset(self, seed=None, options={}):
+        with self.timer.span("reset"):
+            return self._reset(seed=seed, options=options)
+
+    def _reset(self, seed=None, options={}):
         super().reset(seed=seed, options=options)
         self.steps = 0
 
@@ -105,13 +141,17 @@ class DrlEnv(Env):
     def _get_observation(self) -> Dict[str, Any] | None:
         # wait for the state update and check meanwhile if the env is finished
         self.mqtts.subscriber.clean_message_queue(self.mqtts.subscriber.topics.stats)
-        is_finished = sleep_until_condition_with_intervals(10, self.state_update_interval, lambda: self.is_finished)
+        with self.timer.span("wait_interval"):
+            is_finished = sleep_until_condition_with_intervals(
+                10, self.state_update_interval, lambda: self.is_finished
+            )
         if is_finished:
             # this could be triggered e.g., by agent.stop() call or by DrlBreakCallback
             self._on_finish()
             return None
 
         time_inactivity_starts = time.time()
+        time_collecting_starts = time.perf_counter()
         is_collected = False
         obs_list = []
         while not is_collected and not self.is_finished:
@@ -134,15 +174,19 @@ class DrlEnv(Env):
                     and self.mqtts.subscriber.message_queues[self.mqtts.subscriber.topics.stats].empty()
                 )
 
+        self.timer.record("collect_stats", time.perf_counter() - time_collecting_starts)
+
         # 25% of the observations are selected to be cut to prevent the influence of the last action
-        if not self.mdp.is_deliver_all_observations:
-            obs_list = select_n_equidistant_elements_from_list(obs_list, self.mdp.num_observations_for_state, 25)
-        else:
-            obs_list = cut_first_elements_in_list(obs_list, 25, self.mdp.num_observations_for_state)
+        with self.timer.span("select_observations"):
+            if not self.mdp.is_deliver_all_observations:
+                obs_list = select_n_equidistant_elements_from_list(obs_list, self.mdp.num_observations_for_state, 25)
+            else:
+                obs_list = cut_first_elements_in_list(obs_list, 25, self.mdp.num_observations_for_state)
 
         if len(obs_list) > 1:
             # merge observations from list[dict[str, dict]] to dict[str, dict[list]]
-            return merge_observations(obs_list)
+            with self.timer.span("merge_observations"):
+                return merge_observations(obs_list)
         elif len(obs_list) == 1:
             # old MDP versions consume unpacked observation of type dict[str, Any]
             return obs_list[0]
@@ -153,7 +197,28 @@ class DrlEnv(Env):
             else:
                 raise Exception("ERROR: Env: no observations were collected but the env is not finished")
 
+    def _make_flat_state(self) -> Tuple[np.ndarray | None, OrderedDict[str, np.ndarray] | None]:
+        spaces = list(self.observation_space.items())
+        if not all(isinstance(space, Box) and space.dtype == np.float32 for _, space in spaces):
+            return None, None
+        flat_state = np.zeros(sum(int(np.prod(space.shape)) for _, space in spaces), dtype=np.float32)
+        state_views = collections.OrderedDict()
+        start = 0
+        for key, space in spaces:
+            size = int(np.prod(space.shape))
+            state_views[key] = flat_state[start : start + size].reshape(space.shape)
+            start += size
+        return flat_state, state_views
+
     def _dict_to_gym_space_sample(self, state_dict: Dict[str, Any]) -> OrderedDict[str, Any]:
+        if self.state_views is not None:
+            # the mdp writes the values into the preallocated views of the other buffer, so the previous observation
+            # stays valid for one more step: the VecEnvs keep the terminal observation by reference over reset()
+            self.flat_buffer_idx = 1 - self.flat_buffer_idx
+            self.flat_state, self.state_views = self.flat_buffers[self.flat_buffer_idx]
+            self.mdp.write_state(state_dict, self.state_views, self.flat_state)
+            return self.state_views
+
         tuples = []
         for key, space in self.observation_space.items():
             if isinstance(space, Box):
@@ -232,4 +297,6 @@ class DrlEnv(Env):
             for k, v in state_unscaled.items()
         }
         rewards_dict = {f"reward/{k}": v for k, v in self.reward_parts.items()}
-        return general_dict | state_dict | rewards_dict
+        # the step is still running while the callbacks call this, so its total span is from the previous one
+        time_dict = {f"time_ms/{k}": round(v, 3) for k, v in self.timer.last().items()}
+        return general_dict | state_dict | rewards_dict | time_dict
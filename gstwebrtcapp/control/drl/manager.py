@@ -1,4 +1,5 @@
 import csv
+import json
 import os
 import time
 import numpy as np
@@ -10,16 +11,20 @@ from stable_baselines3.common.logger import configure
 from stable_baselines3.common.vec_env import DummyVecEnv, VecEnv
 
 from gstwebrtcapp.control.drl.config import DrlConfig
+from gstwebrtcapp.control.drl.buffers import MmapDictReplayBuffer
+from gstwebrtcapp.control.drl.checkpoint import get_replay_buffer_path, load_replay_buffer_snapshot
 from gstwebrtcapp.control.drl.callbacks import (
     DrlCheckpointCallback,
     DrlEvaluatingCallback,
     DrlPrintStepCallback,
     DrlSaveStepCallback,
     DrlBreakCallback,
+    DrlTimingCallback,
 )
 from gstwebrtcapp.control.drl.env import DrlEnv
 from gstwebrtcapp.control.drl.mconfigurator import DrlModelConfigurator
 from gstwebrtcapp.control.drl.mdp import MDP
+from gstwebrtcapp.control.drl.timing import StepTimer
 from gstwebrtcapp.message.client import MqttPair
 from gstwebrtcapp.utils.base import LOGGER
 
@@ -113,6 +118,12 @@ class DrlManager:
                 verbose=self.config.verbose,
             )
 
+        # memory-mapped replay buffer is stored in the model folder by default
+        if self.model_cfg.model_params.get("replay_buffer_class") is MmapDictReplayBuffer:
+            replay_buffer_kwargs = self.model_cfg.model_params.setdefault("replay_buffer_kwargs", {})
+            if replay_buffer_kwargs.get("mmap_path") is None:
+                replay_buffer_kwargs["mmap_path"] = os.path.join(self.model_path, "replay_buffer.mmap")
+
         # a path to a saved model file with extension if exists
         try:
             self.model_file = (
@@ -131,7 +142,15 @@ class DrlManager:
             )
         else:
             # load the model from the given file
-            self.model = self.model_cfg.get_model_class().load(self.model_file, env=self.env, device=self.device)
+            load_kwargs = {}
+            if self.model_cfg.model_params.get("replay_buffer_class") is MmapDictReplayBuffer:
+                # a model without the pickled buffer would map a new one over the file of the run it was saved in
+                load_kwargs["replay_buffer_kwargs"] = self.model_cfg.model_params["replay_buffer_kwargs"]
+            self.model = self.model_cfg.get_model_class().load(
+                self.model_file, env=self.env, device=self.device, **load_kwargs
+            )
+            # async checkpoints store the replay buffer in a separate file next to the model
+            load_replay_buffer_snapshot(self.model, get_replay_buffer_path(self.model_file))
             self.is_reset_timesteps = False
             LOGGER.info(
                 f"OK: Successfully loaded {self.config.model_name} model from the given file {self.model_file}!\n"
@@ -152,6 +171,9 @@ class DrlManager:
         # set deterministic flag for evaluation
         self.deterministic = self.config.deterministic if self.config.mode == 'eval' else True
 
+        # latency histograms of the evaluation loop, the training loop is covered by DrlTimingCallback
+        self.timer = StepTimer(["predict", "env_step"])
+
         # finish all setup steps...
 
     def reset(self, is_load_last_model: bool = False) -> None:
@@ -169,13 +191,18 @@ class DrlManager:
             and self.config.mode == "train"
         ):
             # we trained model from scratch and want to continue training after saving it on DrlBreakCallback event
-            if not any(isinstance(cb, DrlCheckpointCallback) for cb in self.callbacks):
+            checkpoint_cbs = [cb for cb in self.callbacks if isinstance(cb, DrlCheckpointCallback)]
+            if not checkpoint_cbs:
                 LOGGER.warning("WARNING: No DrlCheckpointCallback is set, cannot load the last trained model!")
                 return
+            # async checkpoints could still be written in background
+            for cb in checkpoint_cbs:
+                cb.wait()
             LOGGER.info(f"OK: Loading the last trained model on the DRL manager reset...")
             # NOTE: this is a fixed filename. "last_full" contains replay buffer and optimizer state, "last_default" does not
             model_file = os.path.join(self.model_path, "last_full")
             self.model = self.model_cfg.get_model_class().load(model_file, env=self.env, device=self.device)
+            load_replay_buffer_snapshot(self.model, get_replay_buffer_path(model_file))
             self.is_reset_timesteps = False
             LOGGER.info(f"OK: Successfully loaded {self.config.model_name} model from the given file {model_file}!")
 
@@ -185,6 +212,10 @@ class DrlManager:
             self.env.set_attr("is_finished", True)
         else:
             self.env.is_finished = True
+        # the pending async checkpoints are written and the writers' threads are released
+        for cb in self.callbacks:
+            if isinstance(cb, DrlCheckpointCallback):
+                cb.shutdown(wait=True)
 
     def train(self) -> None:
         """train the model"""
@@ -243,14 +274,17 @@ class DrlManager:
         hidden_states = None
         episode_starts = np.ones((self.env.num_envs,), dtype=bool)
         while episodes_passed < episodes:
-            actions, hidden_states = self.model.predict(
-                observations,  # type: ignore[arg-type]
-                state=hidden_states,
-                episode_start=episode_starts,
-                deterministic=self.deterministic,
-            )
+            with self.timer.span("predict"):
+                actions, hidden_states = self.model.predict(
+                    observations,  # type: ignore[arg-type]
+                    state=hidden_states,
+                    episode_start=episode_starts,
+                    deterministic=self.deterministic,
+                )
 
-            new_observations, rewards, dones, _ = self.env.step(actions)
+            with self.timer.span("env_step"):
+                new_observations, rewards, dones, _ = self.env.step(actions)
+            self._publish_timings()
 
             if self.env.get_attr("is_finished")[0]:
                 break
@@ -281,6 +315,12 @@ class DrlManager:
                 f"mean_reward: {np.mean(episode_rewards)}, std_reward: {np.std(episode_rewards)}"
             )
 
+        timings = self.get_timings()
+        LOGGER.info(
+            "OK: Evaluation timings (mean/p95 ms): "
+            + ", ".join(f"{k}: {v['mean']:.2f}/{v['p95']:.2f}" for k, v in timings.items() if v["count"] > 0)
+        )
+
         if self.config.verbose == 2:
             eval_path = os.path.join(
                 self.log_path, f'{self.config.model_name}_eval_output_{time.strftime("%Y%m%d-%H%M%S")}.csv'
@@ -292,6 +332,19 @@ class DrlManager:
                     [{"episode_rewards": i, "episode_lengths": j} for i, j in zip(episode_rewards, episode_lengths)]
                 )
 
+    def get_timings(self) -> Dict[str, Dict[str, float]]:
+        """get the latency histogram summaries (in ms) of the env step phases and the evaluation loop"""
+        env_timer = self.env.get_attr("timer")[0] if isinstance(self.env, VecEnv) else self.env.timer
+        return env_timer.summary() | self.timer.summary()
+
+    def _publish_timings(self, publish_freq: int = 10) -> None:
+        if not self.config.metrics_topic or self.timer.histograms["env_step"].count % publish_freq != 0:
+            return
+        try:
+            self.mqtts.publisher.publish(self.config.metrics_topic, json.dumps(self.get_timings()))
+        except Exception as e:
+            LOGGER.warning(f"WARNING: DrlManager: failed to publish the timings, reason: {e}")
+
     def _set_save_paths(self, save_log_path: str, save_model_path: str) -> None:
         assert save_log_path is not None and save_model_path is not None, "ERROR: save paths are not set!"
         timestamp = time.strftime("%Y%m%d-%H%M%S-%f")[:-3]
@@ -308,6 +361,15 @@ class DrlManager:
                         case "save_model":
                             os.makedirs(self.model_path, exist_ok=True)
                             cbs.append(DrlCheckpointCallback(save_path=self.model_path, verbose=self.config.verbose))
+                        case "save_model_async":
+                            os.makedirs(self.model_path, exist_ok=True)
+                            cbs.append(
+                                DrlCheckpointCallback(
+                                    save_path=self.model_path,
+                                    is_async=True,
+                                    verbose=self.config.verbose,
+                                )
+                            )
                         case "save_step":
                             os.makedirs(self.log_path, exist_ok=True)
                             cbs.append(
@@ -319,6 +381,14 @@ class DrlManager:
                             )
                         case "print_step":
                             cbs.append(DrlPrintStepCallback(verbose=self.config.verbose))
+                        case "log_timing":
+                            cbs.append(
+                                DrlTimingCallback(
+                                    publisher=self.mqtts.publisher,
+                                    topic=self.config.metrics_topic,
+                                    verbose=self.config.verbose,
+                                )
+                            )
                         case _:
                             raise Exception(f"GymirDrlManager: unknown callback {callback_name}")
             else:
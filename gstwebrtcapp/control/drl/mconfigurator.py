@@ -7,6 +7,8 @@ from sb3_contrib import QRDQN, RecurrentPPO
 import torch
 from typing import Any, Optional, Dict, Type
 
+from gstwebrtcapp.control.drl.buffers import REPLAY_BUFFER_CLASSES
+
 
 SB3_MODEL_CLASSES = {
     'ppo': PPO,
@@ -82,5 +84,12 @@ class DrlModelConfigurator:
                 dict_params["policy_kwargs"]["activation_fn"] = ACTIVATION_FUNCTIONS[activation_fn_name]
             else:
                 raise ValueError(f"Activation function {activation_fn_name} is not found!")
+        # typecast str-like replay buffer class (e.g., "mmap") to the buffer class
+        if isinstance(dict_params.get("replay_buffer_class"), str):
+            replay_buffer_name = dict_params["replay_buffer_class"].lower()
+            if replay_buffer_name in REPLAY_BUFFER_CLASSES:
+                dict_params["replay_buffer_class"] = REPLAY_BUFFER_CLASSES[replay_buffer_name]
+            else:
+                raise ValueError(f"Replay buffer {replay_buffer_name} is not found!")
         # other typecasting/parsing...
         return dict_params
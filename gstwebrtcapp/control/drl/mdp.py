@@ -2,7 +2,7 @@ from abc import ABCMeta, abstractmethod
 import collections
 from gymnasium import spaces
 import numpy as np
-from typing import Any, Dict, OrderedDict, Tuple
+from typing import Any, Dict, Iterable, OrderedDict, Tuple
 
 from gstwebrtcapp.control.drl.reward import RewardFunctionFactory
 from gstwebrtcapp.media.preset import VideoPresets
@@ -11,6 +11,19 @@ from gstwebrtcapp.utils.gst import GstWebRTCStatsType, find_stat, get_stat_diff,
 from gstwebrtcapp.utils.webrtc import clock_units_to_seconds, ntp_short_format_to_seconds
 
 
+def write_flat_state(state: OrderedDict[str, Any], keys: Iterable[str], flat_out: np.ndarray) -> None:
+    # the sequential MDPs make states of floats and float lists only, so they are concatenated in the order of the
+    # observation space and written into the flat buffer at once instead of one small array per key
+    values = []
+    for key in keys:
+        value = state[key]
+        if isinstance(value, (list, tuple)):
+            values.extend(value)
+        else:
+            values.append(value)
+    flat_out[:] = values
+
+
 class MDP(metaclass=ABCMeta):
     '''
     MDP is an abstract class for Markov Decision Process. It defines the interface for the environment.
@@ -91,6 +104,17 @@ class MDP(metaclass=ABCMeta):
         self.last_actions.append(action)
         pass
 
+    def write_state(
+        self,
+        state: OrderedDict[str, Any],
+        out: OrderedDict[str, np.ndarray],
+        flat_out: np.ndarray | None = None,
+    ) -> None:
+        # copies the state made by make_state into the env's preallocated per-key views. flat_out is the contiguous
+        # buffer behind the views (in the same key order). Override to write the values directly
+        for key, view in out.items():
+            view[...] = state[key]
+
     @abstractmethod
     def convert_to_unscaled_state(self, state: OrderedDict[str, Any]) -> OrderedDict[str, Any]:
         pass
@@ -721,6 +745,16 @@ class ViewerSeqMDP(MDP):
         LOGGER.warning("WARNING: Drl Agent: ViewerMDP: make_state: no ssrc stats found")
         return self.make_default_state()
 
+    def write_state(
+        self,
+        state: OrderedDict[str, Any],
+        out: OrderedDict[str, np.ndarray],
+        flat_out: np.ndarray | None = None,
+    ) -> None:
+        if flat_out is None:
+            return super().write_state(state, out)
+        write_flat_state(state, out.keys(), flat_out)
+
     def convert_to_unscaled_state(self, state: OrderedDict[str, Any]) -> OrderedDict[str, Any]:
         return (
             collections.OrderedDict(
@@ -1300,6 +1334,16 @@ class ViewerSeqOfflineMDP(MDP):
         LOGGER.warning("WARNING: Drl Agent.make_state: no ssrc stats found")
         return self.make_default_state()
 
+    def write_state(
+        self,
+        state: OrderedDict[str, Any],
+        out: OrderedDict[str, np.ndarray],
+        flat_out: np.ndarray | None = None,
+    ) -> None:
+        if flat_out is None:
+            return super().write_state(state, out)
+        write_flat_state(state, out.keys(), flat_out)
+
     def convert_to_unscaled_state(self, state: OrderedDict[str, Any]) -> OrderedDict[str, Any]:
         return state
 
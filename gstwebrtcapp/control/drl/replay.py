@@ -0,0 +1,269 @@
+import json
+import math
+import os
+import queue
+from datetime import datetime
+from typing import Any, Dict, List
+
+import numpy as np
+
+from gstwebrtcapp.control.drl.env import DrlEnv
+from gstwebrtcapp.control.drl.mdp import MDP
+from gstwebrtcapp.media.preset import get_video_preset
+from gstwebrtcapp.message.client import MqttGstWebrtcAppTopics, MqttMessage, MqttPair
+from gstwebrtcapp.utils.base import LOGGER, extract_network_traces_from_csv
+
+DEFAULT_TRACE_FILE = os.path.join(os.path.dirname(__file__), "samples", "trace.csv")
+
+
+class TraceReplayLink:
+    """
+    A minimal bottleneck link driven by a bandwidth trace. It turns the sender bitrate into synthetic WebRTC stats
+    in the same format as GStreamer delivers them (cumulative RTP counters, RTCP RR fields, candidate pair bitrates),
+    so that the existing MDPs could consume them as they are. The time is logical, nothing sleeps.
+
+    The model is a drop-tail FIFO: the queue grows when the sending rate exceeds the trace capacity, the queueing
+    delay is added to the base RTT and the packets that do not fit into the max queue delay are lost.
+
+    :param traces: Bandwidth values in Mbps, one per second
+    :param step_interval: Logical seconds between two actions
+    :param samples_per_step: Number of stats samples emitted per action
+    :param initial_bitrate: Initial sender bitrate in kbps
+    :param base_rtt: Base round trip time in seconds
+    :param base_loss_rate: Random loss rate independent of the congestion
+    :param max_queue_delay: Max queueing delay in seconds before drop-tail
+    :param seed: Random seed. Nullable
+    """
+
+    PACKET_SIZE_BYTES = 1200
+    CLOCK_RATE = 90000
+    SSRC = 1
+
+    def __init__(
+        self,
+        traces: List[float],
+        step_interval: float = 1.0,
+        samples_per_step: int = 10,
+        initial_bitrate: float = 1000.0,
+        base_rtt: float = 0.04,
+        base_loss_rate: float = 0.002,
+        max_queue_delay: float = 0.5,
+        seed: int | None = None,
+    ) -> None:
+        if not traces:
+            raise ValueError("ERROR: TraceReplayLink: traces are empty")
+        self.traces = traces
+        self.step_interval = step_interval
+        self.samples_per_step = samples_per_step
+        self.base_rtt = base_rtt
+        self.base_loss_rate = base_loss_rate
+        self.max_queue_delay = max_queue_delay
+        self.rng = np.random.default_rng(seed)
+
+        self.time = float(self.rng.integers(0, len(traces)))
+        self.bitrate = initial_bitrate
+        self.queue_mbit = 0.0
+        self.last_queue_delay = 0.0
+        self.jitter = 0.0
+        self.counters = {
+            "packets-sent": 0,
+            "packets-received": 0,
+            "bytes-sent": 0,
+            "bytes-received": 0,
+            "packets-lost": 0,
+            "nack-count": 0,
+            "pli-count": 0,
+        }
+
+    def capacity(self, time: float) -> float:
+        return max(1e-3, self.traces[int(time) % len(self.traces)])
+
+    def on_action(self, action: Dict[str, Any]) -> None:
+        if "bitrate" in action:
+            self.bitrate = float(action["bitrate"])
+        elif "preset" in action:
+            self.bitrate = float(get_video_preset(int(action["preset"])).bitrate)
+
+    def make_step_stats(self) -> List[Dict[str, Any]]:
+        dt = self.step_interval / self.samples_per_step
+        return [self._make_sample(dt) for _ in range(self.samples_per_step)]
+
+    def make_gcc_estimate(self) -> float:
+        # a delay-based estimator tracks the capacity with some lag and backs off on queueing, in bps
+        capacity = self.capacity(self.time)
+        backoff = 0.85 if self.last_queue_delay > 0.1 else 1.0
+        return max(0.0, capacity * backoff * self.rng.normal(0.95, 0.05)) * 1e6
+
+    def _make_sample(self, dt: float) -> Dict[str, Any]:
+        capacity = self.capacity(self.time)
+        send_mbps = max(0.0, self.bitrate / 1000 * self.rng.normal(1.0, 0.05))
+
+        self.queue_mbit += send_mbps * dt
+        served_mbit = min(self.queue_mbit, capacity * dt)
+        self.queue_mbit -= served_mbit
+        dropped_mbit = max(0.0, self.queue_mbit - capacity * self.max_queue_delay)
+        self.queue_mbit -= dropped_mbit
+        random_lost_mbit = served_mbit * self.base_loss_rate
+        recv_mbit = served_mbit - random_lost_mbit
+
+        queue_delay = self.queue_mbit / capacity
+        # RFC 3550 interarrival jitter estimate
+        self.jitter += (abs(queue_delay - self.last_queue_delay) - self.jitter) / 16
+        self.last_queue_delay = queue_delay
+        rtt = self.base_rtt + queue_delay + abs(self.rng.normal(0.0, 0.002))
+
+        mbit_per_packet = self.PACKET_SIZE_BYTES * 8 / 1e6
+        lost_packets = int(round((dropped_mbit + random_lost_mbit) / mbit_per_packet))
+        recv_packets = int(round(recv_mbit / mbit_per_packet))
+        sent_packets = int(round(send_mbps * dt / mbit_per_packet))
+        self.counters["packets-sent"] += sent_packets
+        self.counters["packets-received"] += recv_packets
+        self.counters["bytes-sent"] += sent_packets * self.PACKET_SIZE_BYTES
+        self.counters["bytes-received"] += recv_packets * self.PACKET_SIZE_BYTES
+        self.counters["packets-lost"] += lost_packets
+        # not every lost packet is nacked, and a receiver does not nack more than it receives
+        nacks = int(self.rng.binomial(lost_packets, 0.8)) if lost_packets > 0 else 0
+        self.counters["nack-count"] += min(nacks, recv_packets)
+        if lost_packets > 0.05 * max(1, sent_packets) and self.rng.random() < 0.2:
+            self.counters["pli-count"] += 1
+        self.time += dt
+
+        return {
+            f"rtp-outbound-stream-stats_{self.SSRC}": {
+                "type": "outbound-rtp",
+                "timestamp": self.time * 1000,
+                "ssrc": self.SSRC,
+                "clock-rate": self.CLOCK_RATE,
+                "packets-sent": self.counters["packets-sent"],
+                "packets-received": self.counters["packets-received"],
+                "bytes-sent": self.counters["bytes-sent"],
+                "bytes-received": self.counters["bytes-received"],
+                "nack-count": self.counters["nack-count"],
+                "pli-count": self.counters["pli-count"],
+            },
+            f"rtp-remote-inbound-stream-stats_{self.SSRC}": {
+                "type": "remote-inbound-rtp",
+                "timestamp": self.time * 1000,
+                "ssrc": self.SSRC,
+                "clock-rate": self.CLOCK_RATE,
+                "rb-packetslost": self.counters["packets-lost"],
+                "rb-fractionlost": int(255 * lost_packets / max(1, sent_packets)),
+                "rb-round-trip": int(rtt * 2**16),
+                "rb-jitter": int(self.jitter * self.CLOCK_RATE),
+            },
+            "ice-candidate-pair_replay": {
+                "type": "candidate-pair",
+                "timestamp": self.time * 1000,
+                "bitrate-sent": send_mbps * 1e6,
+                "bitrate-recv": recv_mbit / dt * 1e6,
+            },
+        }
+
+
+class ReplayMqttSubscriber:
+    """
+    A drop-in replacement of MqttSubscriber for the replay env. The stats of the last action are delivered
+    lazily on the first read, so cleaning the queue before waiting (as DrlEnv does) does not lose them.
+    """
+
+    def __init__(self, link: TraceReplayLink, topics: MqttGstWebrtcAppTopics, id: str = "replay") -> None:
+        self.link = link
+        self.topics = topics
+        self.id = id
+        self.message_queues: Dict[str, queue.Queue] = {
+            topic: queue.Queue() for topic in (topics.gcc, topics.stats, topics.actions)
+        }
+        self.pending_stats = []
+
+    def on_action(self, action: Dict[str, Any]) -> None:
+        self.link.on_action(action)
+        self.pending_stats = self.link.make_step_stats()
+        self.message_queues[self.topics.gcc].put_nowait(self._make_message(self.topics.gcc, self.link.make_gcc_estimate()))
+
+    def get_message(self, topic: str) -> MqttMessage | None:
+        if topic == self.topics.stats and self.pending_stats:
+            for stats in self.pending_stats:
+                self.message_queues[topic].put_nowait(self._make_message(topic, json.dumps(stats)))
+            self.pending_stats = []
+        try:
+            return self.message_queues[topic].get_nowait()
+        except queue.Empty:
+            return None
+
+    def clean_message_queue(self, topic: str) -> None:
+        q = self.message_queues.get(topic, None)
+        while q is not None and not q.empty():
+            q.get_nowait()
+
+    def _make_message(self, topic: str, msg: Any) -> MqttMessage:
+        return MqttMessage(
+            timestamp=datetime.now().strftime("%Y-%m-%d-%H_%M_%S_%f")[:-3],
+            id=self.id,
+            msg=msg,
+            source="",
+            topic=topic,
+        )
+
+
+class ReplayMqttPublisher:
+    """
+    A drop-in replacement of MqttPublisher for the replay env: actions go to the link, the rest is discarded.
+    """
+
+    def __init__(self, subscriber: ReplayMqttSubscriber, id: str = "replay") -> None:
+        self.subscriber = subscriber
+        self.topics = subscriber.topics
+        self.id = id
+        self.id_init = id
+
+    def publish(self, topic: str, msg: str, id: str = "", source: str = "") -> None:
+        if topic == self.topics.actions:
+            self.subscriber.on_action(json.loads(msg))
+
+
+class TraceReplayEnv(DrlEnv):
+    """
+    DrlEnv that runs against TraceReplayLink instead of a live GStreamer pipeline over MQTT.
+    It runs as fast as the model allows, so many trainings could be run in parallel for hyperparameter tuning.
+
+    :param mdp: The MDP instance, look into ``control/drl/mdp.py``
+    :param traces: Bandwidth values in Mbps or a path to a trace csv (look into extract_network_traces_from_csv)
+    :param max_episodes: Max number of episodes
+    :param step_interval: Logical seconds between two actions (the state update interval of the live env)
+    :param samples_per_step: Number of stats samples per action
+    :param seed: Random seed. Nullable
+    :param link_kwargs: Additional TraceReplayLink parameters
+    """
+
+    def __init__(
+        self,
+        mdp: MDP,
+        traces: List[float] | str = DEFAULT_TRACE_FILE,
+        max_episodes: int = -1,
+        step_interval: float = 1.0,
+        samples_per_step: int = 10,
+        seed: int | None = None,
+        **link_kwargs,
+    ):
+        if isinstance(traces, str):
+            traces, _ = extract_network_traces_from_csv(traces)
+        if samples_per_step < math.ceil(mdp.num_observations_for_state / 0.75):
+            LOGGER.warning(
+                f"WARNING: TraceReplayEnv: {samples_per_step} samples per step could be too few for"
+                f" {mdp.num_observations_for_state} observations per state after the 25% cut"
+            )
+        self.link = TraceReplayLink(traces, step_interval, samples_per_step, seed=seed, **link_kwargs)
+        subscriber = ReplayMqttSubscriber(self.link, MqttGstWebrtcAppTopics())
+        mqtts = MqttPair(publisher=ReplayMqttPublisher(subscriber), subscriber=subscriber)
+        mdp.mqtts = mqtts
+        super().__init__(
+            mdp=mdp,
+            mqtts=mqtts,
+            max_episodes=max_episodes,
+            state_update_interval=0.0,
+            max_inactivity_time=1.0,
+        )
+
+    def _is_terminal(self, max_waiting_time: float = 0.0) -> bool:
+        # there is no safety detector to switch the agent
+        return False
@@ -0,0 +1,220 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+import traceback
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from gstwebrtcapp.control.drl.mdp import ViewerSeqDiscreteMDP, ViewerSeqMDP, ViewerSeqNoBaselineMDP
+from gstwebrtcapp.utils.base import LOGGER
+
+# the MDPs that consume the stats produced by TraceReplayLink
+SWEEP_MDP_CLASSES = {
+    'viewer_seq': ViewerSeqMDP,
+    'viewer_seq_discrete': ViewerSeqDiscreteMDP,
+    'viewer_seq_no_baseline': ViewerSeqNoBaselineMDP,
+}
+
+
+@dataclass
+class DrlSweepConfig:
+    """
+    A data class to hold the hyperparameter sweep config.
+
+    :param search_space: Hyperparameter names mapped to the lists of values to try, e.g. {"learning_rate": [1e-3, 3e-4]}
+    :param model_name: The name of the DRL model, look into ``control/drl/mconfigurator.py``
+    :param hyperparams_cfg: Base hyperparameters: either a path to a json file or a dictionary. Nullable
+    :param mdps: Names of the MDP variants to try, look into SWEEP_MDP_CLASSES
+    :param reward_functions: Names of the reward functions to try, look into ``control/drl/reward.py``
+    :param strategy: Either 'grid' (all combinations) or 'random' (``num_trials`` random combinations)
+    :param num_trials: The number of trials for the random strategy
+    :param traces: Paths to the trace csv files to replay. Each trial runs on all of them in turn. Nullable (bundled sample)
+    :param episodes: The maximum number of episodes per trial
+    :param episode_length: The number of steps per episode
+    :param num_observations_for_state: The number of stats observations stacked in a state
+    :param mdp_constants: MDP constants (e.g., MAX_BITRATE_STREAM_MBPS). Nullable
+    :param early_stopping_patience: Stop a trial after this many episodes without improvement. Non-positive disables it
+    :param early_stopping_min_episodes: The minimum number of episodes before a trial could be stopped
+    :param num_workers: The number of parallel trials. Non-positive means the number of CPUs
+    :param seed: The random seed for the trial sampling and the envs
+    :param results_path: The path to the csv file with the results table. Nullable
+    """
+
+    search_space: Dict[str, List[Any]] = field(default_factory=dict)
+    model_name: str = 'sac'
+    hyperparams_cfg: str | Dict[str, Any] | None = None
+    mdps: List[str] = field(default_factory=lambda: ['viewer_seq'])
+    reward_functions: List[str] = field(default_factory=lambda: ['qoe_ahoy_seq_sensible'])
+    strategy: str = 'grid'
+    num_trials: int = 20
+    traces: List[str] | None = None
+    episodes: int = 30
+    episode_length: int = 256
+    num_observations_for_state: int = 5
+    mdp_constants: Dict[str, Any] | None = None
+    early_stopping_patience: int = 5
+    early_stopping_min_episodes: int = 5
+    num_workers: int = 0
+    seed: int = 0
+    results_path: str | None = './logs/sweep_results.csv'
+
+
+class DrlSweepRunner:
+    """
+    Runs many DRL trainings in parallel processes against TraceReplayEnv to tune hyperparameters, MDP variants and
+    reward functions without a live pipeline. Each trial trains a fresh model and reports its episode rewards,
+    the results are collected into a table sorted by the best mean episode reward.
+
+    :param config: Sweep config
+    """
+
+    def __init__(self, config: DrlSweepConfig) -> None:
+        self.config = config
+        self.trials = self._make_trials()
+
+    def run(self) -> pd.DataFrame:
+        num_workers = self.config.num_workers if self.config.num_workers > 0 else os.cpu_count() or 1
+        LOGGER.info(f"OK: DrlSweepRunner: running {len(self.trials)} trials in {num_workers} processes...")
+
+        results = []
+        # spawn to avoid inheriting torch threads and locks from the parent process
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(run_sweep_trial, trial): trial for trial in self.trials}
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                LOGGER.info(
+                    f"INFO: DrlSweepRunner: trial {result['trial']} finished ({len(results)}/{len(self.trials)}),"
+                    f" best mean reward {result['best_mean_reward']}, error: {result['error']}"
+                )
+
+        table = pd.DataFrame(results).sort_values("best_mean_reward", ascending=False, na_position="last")
+        if self.config.results_path:
+            os.makedirs(os.path.dirname(self.config.results_path) or ".", exist_ok=True)
+            table.to_csv(self.config.results_path, index=False)
+        LOGGER.info(f"OK: DrlSweepRunner: sweep is finished, results:\n{table.to_string(index=False)}")
+        return table
+
+    def _make_trials(self) -> List[Dict[str, Any]]:
+        space = dict(self.config.search_space)
+        space["mdp"] = self.config.mdps
+        space["reward_function"] = self.config.reward_functions
+        keys = list(space.keys())
+
+        match self.config.strategy:
+            case "grid":
+                combinations = list(itertools.product(*[space[k] for k in keys]))
+            case "random":
+                rng = random.Random(self.config.seed)
+                combinations = [tuple(rng.choice(space[k]) for k in keys) for _ in range(self.config.num_trials)]
+            case _:
+                raise ValueError(f"ERROR: DrlSweepRunner: unknown strategy {self.config.strategy}")
+
+        base_hyperparams = self.config.hyperparams_cfg
+        if isinstance(base_hyperparams, str):
+            with open(base_hyperparams, "r") as f:
+                base_hyperparams = json.load(f)
+
+        trials = []
+        for i, combination in enumerate(combinations):
+            params = dict(zip(keys, combination))
+            trials.append(
+                {
+                    "trial": i,
+                    "mdp": params.pop("mdp"),
+                    "reward_function": params.pop("reward_function"),
+                    "hyperparams": (base_hyperparams or {}) | params,
+                    "searched": params,
+                    "model_name": self.config.model_name,
+                    "traces": self.config.traces,
+                    "episodes": self.config.episodes,
+                    "episode_length": self.config.episode_length,
+                    "num_observations_for_state": self.config.num_observations_for_state,
+                    "mdp_constants": self.config.mdp_constants,
+                    "early_stopping_patience": self.config.early_stopping_patience,
+                    "early_stopping_min_episodes": self.config.early_stopping_min_episodes,
+                    "seed": self.config.seed + i,
+                }
+            )
+        return trials
+
+
+def run_sweep_trial(trial: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run one sweep trial. It is a module-level function to be picklable for the process pool.
+
+    :param trial: Trial description made by DrlSweepRunner
+    :return: A row of the results table
+    """
+    import torch
+
+    from gstwebrtcapp.control.drl.callbacks import DrlBreakCallback, DrlEarlyStoppingCallback
+    from gstwebrtcapp.control.drl.mconfigurator import DrlModelConfigurator
+    from gstwebrtcapp.control.drl.replay import DEFAULT_TRACE_FILE, TraceReplayEnv
+
+    # parallelism comes from the processes
+    torch.set_num_threads(1)
+
+    result = {"trial": trial["trial"], "mdp": trial["mdp"], "reward_function": trial["reward_function"]}
+    result |= {f"hp/{k}": v for k, v in trial["searched"].items()}
+    result |= {
+        "best_mean_reward": None,
+        "last_mean_reward": None,
+        "episodes": 0,
+        "steps": 0,
+        "is_stopped_early": False,
+        "time_sec": 0.0,
+        "error": None,
+    }
+    start = time.time()
+    try:
+        if trial["mdp"] not in SWEEP_MDP_CLASSES:
+            raise ValueError(f"ERROR: DrlSweepRunner: unknown MDP {trial['mdp']}, available: {list(SWEEP_MDP_CLASSES)}")
+        mdp = SWEEP_MDP_CLASSES[trial["mdp"]](
+            reward_function_name=trial["reward_function"],
+            episode_length=trial["episode_length"],
+            num_observations_for_state=trial["num_observations_for_state"],
+            constants=trial["mdp_constants"],
+        )
+        traces = trial["traces"] or [DEFAULT_TRACE_FILE]
+        env = TraceReplayEnv(
+            mdp=mdp,
+            traces=traces[trial["trial"] % len(traces)],
+            max_episodes=trial["episodes"],
+            seed=trial["seed"],
+        )
+        model = DrlModelConfigurator(
+            model_name=trial["model_name"],
+            seed=trial["seed"],
+            device="cpu",
+            verbose=0,
+            **trial["hyperparams"],
+        ).make_model(env)
+
+        # with a non-positive patience the callback only collects the episode rewards
+        is_early_stopping = trial["early_stopping_patience"] > 0
+        early_stopping = DrlEarlyStoppingCallback(
+            patience=trial["early_stopping_patience"] if is_early_stopping else trial["episodes"] + 1,
+            min_episodes=trial["early_stopping_min_episodes"],
+        )
+        model.learn(
+            total_timesteps=trial["episodes"] * trial["episode_length"],
+            callback=[DrlBreakCallback(), early_stopping],
+        )
+
+        rewards = early_stopping.episode_rewards
+        result["best_mean_reward"] = early_stopping.best_mean_reward if rewards else None
+        result["last_mean_reward"] = sum(rewards[-3:]) / len(rewards[-3:]) if rewards else None
+        result["episodes"] = len(rewards)
+        result["steps"] = model.num_timesteps
+        result["is_stopped_early"] = early_stopping.is_stopped and is_early_stopping
+    except Exception:
+        result["error"] = traceback.format_exc(limit=3)
+    result["time_sec"] = round(time.time() - start, 2)
+    return result
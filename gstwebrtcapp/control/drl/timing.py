@@ -0,0 +1,99 @@
+import bisect
+from contextlib import contextmanager
+import time
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+# log-spaced bucket upper bounds in ms: 10us .. 100s, 16 buckets per decade (~15% resolution)
+LATENCY_BUCKETS_MS = np.geomspace(0.01, 1e5, 113).tolist()
+
+
+class LatencyHistogram:
+    """
+    A fixed-bucket latency histogram. Adding a value is O(log n) over the buckets and does not grow memory,
+    so it could stay enabled for the whole training.
+
+    :param buckets_ms: Sorted bucket upper bounds in milliseconds
+    """
+
+    def __init__(self, buckets_ms: List[float] = LATENCY_BUCKETS_MS) -> None:
+        self.buckets_ms = buckets_ms
+        self.reset()
+
+    def reset(self) -> None:
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = float("inf")
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+
+    def add(self, value_ms: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets_ms, value_ms)] += 1
+        self.count += 1
+        self.total_ms += value_ms
+        self.min_ms = min(self.min_ms, value_ms)
+        self.max_ms = max(self.max_ms, value_ms)
+        self.last_ms = value_ms
+
+    def mean(self) -> float:
+        return self.total_ms / self.count if self.count > 0 else 0.0
+
+    def quantile(self, q: float) -> float:
+        # upper bound of the bucket containing the q-th value, clamped by the observed max
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, c in enumerate(self.counts):
+            cumulative += c
+            if cumulative >= rank and c > 0:
+                return min(self.buckets_ms[i], self.max_ms) if i < len(self.buckets_ms) else self.max_ms
+        return self.max_ms
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "last": self.last_ms,
+            "mean": self.mean(),
+            "min": self.min_ms if self.count > 0 else 0.0,
+            "max": self.max_ms,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class StepTimer:
+    """
+    Collects named timing spans into latency histograms, e.g., the phases of one DRL env step.
+
+    :param names: Span names to register in advance so that the set of reported keys is stable from the start
+    """
+
+    def __init__(self, names: List[str] | None = None) -> None:
+        self.histograms: Dict[str, LatencyHistogram] = {name: LatencyHistogram() for name in names or []}
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, duration_sec: float) -> None:
+        if name not in self.histograms:
+            self.histograms[name] = LatencyHistogram()
+        self.histograms[name].add(duration_sec * 1000)
+
+    def last(self) -> Dict[str, float]:
+        return {name: h.last_ms for name, h in self.histograms.items()}
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {name: h.summary() for name, h in self.histograms.items()}
+
+    def reset(self) -> None:
+        for h in self.histograms.values():
+            h.reset()
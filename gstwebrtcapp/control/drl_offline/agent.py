@@ -32,6 +32,9 @@ class DrlOfflineAgent(Agent):
         self.model = None
         self.env = None
         self.is_episode_done = False
+        # preallocated d3rlpy states, see _to_d3rlpy_state
+        self.d3rlpy_states = None
+        self.d3rlpy_state_idx = 0
 
     def run(self, _) -> None:
         super().run()
@@ -75,6 +78,8 @@ class DrlOfflineAgent(Agent):
                 ),
             )
             self.model = m.as_stateful_wrapper(target_return=0)
+            # the stateful wrapper keeps the last context_size observations by reference
+            context_size = getattr(m.config, "context_size", 1)
 
         self.env = DrlEnv(
             mdp=self.mdp,
@@ -83,9 +88,18 @@ class DrlOfflineAgent(Agent):
             state_update_interval=self.drl_offline_config.state_update_interval,
             max_inactivity_time=self.drl_offline_config.state_max_inactivity_time,
         )
+        if self.env.flat_state is not None:
+            # one more slot than the wrapper's context so that no referenced state is overwritten
+            self.d3rlpy_states = np.zeros((context_size + 1, self.env.flat_state.size), dtype=np.float32)
 
         self.is_running = True
 
     def _to_d3rlpy_state(self, state: OrderedDict[str, Any]) -> np.ndarray:
+        if self.d3rlpy_states is not None:
+            # the env state is already flat and float32, just copy it into the next free slot of the ring
+            d3rlpy_state = self.d3rlpy_states[self.d3rlpy_state_idx]
+            np.copyto(d3rlpy_state, self.env.flat_state)
+            self.d3rlpy_state_idx = (self.d3rlpy_state_idx + 1) % len(self.d3rlpy_states)
+            return d3rlpy_state
         concatenated_values = np.array([v for values_list in state.values() for v in values_list])
         return concatenated_values.astype(np.float32)
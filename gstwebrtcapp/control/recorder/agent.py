@@ -4,9 +4,10 @@ import enum
 import json
 import os
 import time
-from typing import List
+from typing import Any, Dict, List
 
 from gstwebrtcapp.control.agent import Agent, AgentType
+from gstwebrtcapp.control.recorder.decimator import StatsDecimator
 from gstwebrtcapp.message.client import MqttConfig, MqttMessage
 from gstwebrtcapp.utils.base import LOGGER
 from gstwebrtcapp.utils.gst import GstWebRTCStatsType, find_stat, get_stat_diff, is_same_rtcp
@@ -29,6 +30,7 @@ class RecorderAgent(Agent):
         log_path: str | None = "./logs",
         stats_publish_topic: str | None = None,
         external_data_channel: str | None = None,
+        relay_decimator: StatsDecimator | None = None,
         verbose: bool = False,
         warmup: float = 3.0,
     ) -> None:
@@ -37,6 +39,8 @@ class RecorderAgent(Agent):
         self.log_path = log_path
         self.stats_publish_topic = stats_publish_topic
         self.external_data_channel = external_data_channel
+        # None relays every row to the external data channel
+        self.relay_decimator = relay_decimator
         self.verbose = verbose
         self.type = AgentType.RECORDER
 
@@ -74,6 +78,10 @@ class RecorderAgent(Agent):
                     if self.verbose:
                         LOGGER.info(f"INFO: Recorder agent {self.id} stats:\n {self.ready_stats[-1]}")
                 self.ready_stats = []
+            if self.external_data_channel and self.relay_decimator is not None:
+                # the window is closed even if no stats have come in it
+                for msg in self.relay_decimator.pop():
+                    self._send_to_external_data_channel(msg)
 
     def _fetch_stats(self) -> List[MqttMessage] | None:
         time_inactivity_starts = time.time()
@@ -216,26 +224,35 @@ class RecorderAgent(Agent):
             )
 
     def _relay_to_external_data_channel(self) -> None:
+        for stat in self.ready_stats:
+            if self.relay_decimator is None:
+                self._send_to_external_data_channel({"stats": stat})
+            else:
+                # the alerts are not held back till the end of the window
+                alert_msg = self.relay_decimator.push(stat)
+                if alert_msg is not None:
+                    self._send_to_external_data_channel(alert_msg)
+
+    def _send_to_external_data_channel(self, msg: Dict[str, Any]) -> None:
         if self.mqtt_config.topics.controller:
             topic = self.mqtt_config.topics.controller
         else:
             topic = self.mqtt_config.topics.actions
 
-        for stat in self.ready_stats:
-            self.mqtts.publisher.publish(
-                topic=topic,
-                msg=json.dumps(
-                    {
-                        self.mqtts.publisher.id_init: {
-                            "send_dc": {
-                                "name": self.external_data_channel,
-                                "msg": {"stats": stat},
-                            },
+        self.mqtts.publisher.publish(
+            topic=topic,
+            msg=json.dumps(
+                {
+                    self.mqtts.publisher.id_init: {
+                        "send_dc": {
+                            "name": self.external_data_channel,
+                            "msg": msg,
                         },
                     },
-                ),
-                id="recorder",
-            )
+                },
+            ),
+            id="recorder",
+        )
 
     def init_subscriptions(self) -> None:
         self.mqtts.subscriber.subscribe([self.mqtt_config.topics.stats])
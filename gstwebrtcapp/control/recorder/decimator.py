@@ -0,0 +1,129 @@
+import time
+from typing import Any, Dict, List
+
+# recorder stats whose values above the thresholds are relayed to the UI immediately
+DEFAULT_ALERT_THRESHOLDS = {
+    "fraction_loss_rate": 0.1,
+    "rtt_ms": 500.0,
+}
+
+# recorder stats that are identifiers or counters, not summarized
+NOT_SUMMARIZED_STATS = ("timestamp", "ssrc", "ext_highest_seq")
+
+
+class StatsDecimator:
+    """
+    Reduces the recorder's stats rows relayed to the UI, which draws its charts at about 1 Hz, to a few messages per
+    window. The rows are windowed per ssrc (viewer). At the end of a window, it is reduced either to one summary with
+    the mean of each stat as the usual ``stats`` row and the min, mean and max of each stat as ``summary`` ("summary"
+    mode), or to the rows picked by Largest-Triangle-Three-Buckets to keep the shape of one stat's curve ("lttb" mode).
+
+    The rows with a stat above its alert threshold are not held back: ``push`` returns them to be relayed immediately.
+
+    :param window: Window in seconds
+    :param mode: "summary" or "lttb"
+    :param lttb_points: Max number of rows kept per window in "lttb" mode
+    :param lttb_stat: Name of the stat whose curve is kept in "lttb" mode
+    :param alert_thresholds: Stat name -> threshold to relay the rows above immediately. None for the defaults
+    """
+
+    def __init__(
+        self,
+        window: float = 1.0,
+        mode: str = "summary",
+        lttb_points: int = 5,
+        lttb_stat: str = "tx_rate_mbits",
+        alert_thresholds: Dict[str, float] | None = None,
+    ) -> None:
+        if mode not in ("summary", "lttb"):
+            raise ValueError(f"Invalid decimation mode: {mode}")
+        self.window = window
+        self.mode = mode
+        self.lttb_points = max(3, lttb_points)
+        self.lttb_stat = lttb_stat
+        self.alert_thresholds = alert_thresholds if alert_thresholds is not None else DEFAULT_ALERT_THRESHOLDS
+
+        # ssrc -> rows of the current window
+        self.windows: Dict[Any, List[Dict[str, Any]]] = {}
+        self.window_start_time = time.monotonic()
+        self.counters = {"pushed": 0, "relayed": 0, "alerts": 0}
+
+    def push(self, stat: Dict[str, Any]) -> Dict[str, Any] | None:
+        """
+        Add the row to its window.
+
+        :param stat: Recorder's stats row
+        :return: The message to relay immediately if the row is an alert, None otherwise
+        """
+        self.counters["pushed"] += 1
+        self.windows.setdefault(stat.get("ssrc", None), []).append(stat)
+        alerts = [
+            name
+            for name, threshold in self.alert_thresholds.items()
+            if isinstance(stat.get(name, None), (int, float)) and stat[name] > threshold
+        ]
+        if not alerts:
+            return None
+        self.counters["alerts"] += 1
+        self.counters["relayed"] += 1
+        return {"stats": stat, "alert": alerts}
+
+    def pop(self) -> List[Dict[str, Any]]:
+        """
+        Reduce the windows if the current one has ended.
+
+        :return: The messages to relay, empty if the window has not ended yet
+        """
+        if time.monotonic() - self.window_start_time < self.window:
+            return []
+        self.window_start_time = time.monotonic()
+        messages = []
+        for rows in self.windows.values():
+            if self.mode == "summary":
+                messages.append(self._summarize(rows))
+            else:
+                messages.extend({"stats": row} for row in self._lttb(rows))
+        self.windows = {}
+        self.counters["relayed"] += len(messages)
+        return messages
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.counters)
+
+    def _summarize(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        last = rows[-1]
+        mean_row = {}
+        summary = {}
+        for name, value in last.items():
+            if name in NOT_SUMMARIZED_STATS or isinstance(value, bool) or not isinstance(value, (int, float)):
+                mean_row[name] = value
+                continue
+            values = [row[name] for row in rows if isinstance(row.get(name, None), (int, float))]
+            mean = sum(values) / len(values)
+            mean_row[name] = mean
+            summary[name] = {"min": min(values), "mean": mean, "max": max(values)}
+        return {"stats": mean_row, "summary": summary, "rows": len(rows)}
+
+    def _lttb(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Largest-Triangle-Three-Buckets: the first and the last rows are kept, from each bucket in-between the row
+        # that forms the largest triangle with the previous pick and the mean of the next bucket
+        if len(rows) <= self.lttb_points:
+            return rows
+        ys = [float(row.get(self.lttb_stat, 0.0) or 0.0) for row in rows]
+        bucket_size = (len(rows) - 2) / (self.lttb_points - 2)
+        picked = [0]
+        for b in range(self.lttb_points - 2):
+            start = int(b * bucket_size) + 1
+            end = int((b + 1) * bucket_size) + 1
+            next_start = end
+            next_end = min(int((b + 2) * bucket_size) + 1, len(rows))
+            next_x = (next_start + next_end - 1) / 2
+            next_y = sum(ys[next_start:next_end]) / max(1, next_end - next_start)
+            a = picked[-1]
+            best = max(
+                range(start, end),
+                key=lambda i: abs((a - next_x) * (ys[i] - ys[a]) - (a - i) * (next_y - ys[a])),
+            )
+            picked.append(best)
+        picked.append(len(rows) - 1)
+        return [rows[i] for i in picked]
@@ -6,9 +6,9 @@ import json
 import paho.mqtt.client as mqtt
 from paho.mqtt.client import CallbackAPIVersion, MQTTErrorCode
 import secrets
-from typing import Any, Dict, List, Self
+from typing import Any, Dict, List, Self, Tuple
 
-from gstwebrtcapp.utils.base import LOGGER, int_to_mqtt_protocol, sleep_until_condition_with_intervals
+from gstwebrtcapp.utils.base import LOGGER, int_to_mqtt_protocol, map_value, sleep_until_condition_with_intervals
 
 
 @dataclass
@@ -70,6 +70,48 @@ class MqttMessage:
             )
 
 
+@dataclass
+class MqttPassthrough:
+    """
+    Redirects the action messages of an agent straight to the feed's actions topic bypassing the controller.
+    The numeric actions are mapped on the way the same way the controller would do it.
+
+    :param topic: The feed's actions topic
+    :param limits: Action limits, e.g. {"bitrate": (400, 10000)}
+    :param source_limits: If set, the actions are linearly mapped from these limits to the limits,
+        otherwise they are clipped to the limits. Nullable
+    """
+
+    topic: str
+    limits: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+    source_limits: Dict[str, Tuple[float, float]] | None = None
+
+    @classmethod
+    def from_dict(cls, passthrough_dict: Dict[str, Any]) -> Self:
+        source_limits = passthrough_dict.get("source_limits", None)
+        return cls(
+            topic=passthrough_dict["topic"],
+            limits={k: tuple(v) for k, v in passthrough_dict.get("limits", {}).items()},
+            source_limits={k: tuple(v) for k, v in source_limits.items()} if source_limits else None,
+        )
+
+    def apply(self, msg: str) -> str:
+        try:
+            actions = json.loads(msg)
+        except json.JSONDecodeError:
+            return msg
+        if not isinstance(actions, dict):
+            return msg
+        for key, value in actions.items():
+            if key not in self.limits or not isinstance(value, (int, float)):
+                continue
+            if self.source_limits is not None and key in self.source_limits:
+                actions[key] = map_value(value, *self.source_limits[key], *self.limits[key])
+            else:
+                actions[key] = min(max(value, self.limits[key][0]), self.limits[key][1])
+        return json.dumps(actions)
+
+
 class MqttClient(ABC):
     @abstractmethod
     def __init__(self, config: MqttConfig = MqttConfig("")) -> None:
@@ -130,10 +172,22 @@ class MqttPublisher(MqttClient):
         config: MqttConfig = MqttConfig(""),
     ) -> None:
         super().__init__(config)
+        # topics whose messages are redirected elsewhere, e.g., the aggregation topic of a feed in pass-through mode
+        self.passthroughs: Dict[str, MqttPassthrough] = {}
+
+    def set_passthrough(self, topic: str, passthrough: MqttPassthrough | None) -> None:
+        if passthrough is None:
+            _ = self.passthroughs.pop(topic, None)
+        else:
+            self.passthroughs[topic] = passthrough
 
     def publish(self, topic: str, msg: str, id: str = "", source: str = "") -> None:
         if not self.client.is_connected():
             raise Exception(f"ERROR: MQTT publisher {self.id} is not connected to the broker")
+        passthrough = self.passthroughs.get(topic, None)
+        if passthrough is not None:
+            topic = passthrough.topic
+            msg = passthrough.apply(msg)
         self.client.publish(
             topic,
             json.dumps(
@@ -141,7 +195,8 @@ class MqttPublisher(MqttClient):
                     'timestamp': datetime.now().strftime("%Y-%m-%d-%H_%M_%S_%f")[:-3],
                     'id': id or self.id,
                     'msg': msg,
-                    'source': source,
+                    # the name the client was configured with (e.g., the feed name) identifies the sender
+                    'source': source or self.id_init,
                 }
             ),
         )
@@ -167,6 +222,9 @@ class MqttSubscriber(MqttClient):
                     self.message_queues[ext_topic] = asyncio.Queue()
 
         self.subscriptions = []
+        # event loops awaiting the topics: paho delivers messages from its own thread, so the queues awaited
+        # by a coroutine are fed through the loop to wake the awaiting coroutine immediately
+        self.topic_loops: Dict[str, asyncio.AbstractEventLoop] = {}
 
     def on_message(self, _, __, msg) -> None:
         try:
@@ -177,7 +235,12 @@ class MqttSubscriber(MqttClient):
         mqtt_message = MqttMessage.from_payload(payload, topic)
         if topic not in self.message_queues:
             self.message_queues[topic] = asyncio.Queue()
-        self.message_queues[topic].put_nowait(mqtt_message)
+        queue = self.message_queues[topic]
+        loop = self.topic_loops.get(topic, None)
+        if loop is not None and loop.is_running():
+            loop.call_soon_threadsafe(queue.put_nowait, mqtt_message)
+        else:
+            queue.put_nowait(mqtt_message)
         LOGGER.debug(f"INFO: MQTT subscriber {self.id} has received message: {payload} from topic {topic}")
 
     def subscribe(self, topics: List[str], qos: int = 1) -> None:
@@ -200,6 +263,7 @@ class MqttSubscriber(MqttClient):
             if topic in self.subscriptions:
                 self.client.unsubscribe(topic)
                 _ = self.message_queues.pop(topic, None)
+                _ = self.topic_loops.pop(topic, None)
                 self.subscriptions.remove(topic)
 
     def get_message(self, topic: str) -> MqttMessage | None:
@@ -216,11 +280,12 @@ class MqttSubscriber(MqttClient):
         if queue is None:
             LOGGER.error(f"ERROR: No message queue for topic {topic}")
             return None
+        self.topic_loops[topic] = asyncio.get_running_loop()
         try:
             if timeout is not None:
-                return await asyncio.wait_for(self.message_queues[topic].get(), timeout)
+                return await asyncio.wait_for(queue.get(), timeout)
             else:
-                return await self.message_queues[topic].get()
+                return await queue.get()
         except asyncio.TimeoutError:
             return None
 
@@ -236,6 +301,7 @@ class MqttSubscriber(MqttClient):
         for topic in self.subscriptions:
             self.clean_message_queue(topic)
         self.message_queues.clear()
+        self.topic_loops.clear()
         self.subscriptions.clear()
         super().stop()
 
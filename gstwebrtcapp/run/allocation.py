@@ -0,0 +1,560 @@
+from dataclasses import dataclass
+import enum
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+
+class AllocationStrategy(enum.Enum):
+    WEIGHTS = "weights"
+    UTILITY = "utility"
+
+
+def water_fill(
+    total: float,
+    weights: np.ndarray,
+    min_limits: np.ndarray | float,
+    max_limits: np.ndarray | float,
+) -> np.ndarray:
+    """
+    Weighted water-filling: split the total between the feeds proportionally to their weights so that every share
+    stays within its [min, max] limits. The solution is x_i = clip(level * w_i, min_i, max_i) where the level is
+    chosen to make the shares sum up to the total. The shares are piecewise linear in the level with breakpoints
+    at min_i / w_i and max_i / w_i, so the level is found by sorting the breakpoints: O(n log n).
+
+    If the total does not fit into the limits, all shares are set to the min (or max) limits.
+    Feeds with zero weights get their min limits unless the total does not fit into the others' max limits. Then the
+    others get their max limits and the feeds with zero weights split the remainder evenly up to their max limits.
+
+    :param total: The total value to split (e.g., the summed bitrate)
+    :param weights: Non-negative allocation weights, one per feed. They do not need to sum up to 1
+    :param min_limits: Min share, either one for all feeds or one per feed
+    :param max_limits: Max share, either one for all feeds or one per feed
+    :return: Allocated shares, one per feed
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    n = len(weights)
+    lo = np.broadcast_to(np.asarray(min_limits, dtype=np.float64), (n,))
+    hi = np.broadcast_to(np.asarray(max_limits, dtype=np.float64), (n,))
+    if n == 0:
+        return np.zeros(0)
+
+    lo_sum = lo.sum()
+    hi_sum = hi.sum()
+    if total <= lo_sum:
+        return lo.copy()
+    if total >= hi_sum:
+        return hi.copy()
+
+    weights = np.clip(weights, 0.0, None)
+    if not np.any(weights > 0.0):
+        weights = np.ones(n)
+    positive = weights > 0.0
+    positive_hi_sum = hi[positive].sum()
+    if total >= positive_hi_sum + lo[~positive].sum():
+        shares = hi.copy()
+        zero = ~positive
+        shares[zero] = water_fill(total - positive_hi_sum, np.ones(zero.sum()), lo[zero], hi[zero])
+        return shares
+
+    # the level where each feed leaves its min limit (a) and reaches its max limit (b), inf for zero weights
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a = np.where(positive, lo / weights, np.inf)
+        b = np.where(positive, hi / weights, np.inf)
+
+    # S(level) = sum(lo | a >= level) + sum(hi | b <= level) + level * sum(w | a < level < b)
+    levels = np.unique(np.concatenate([a[positive], b[positive]]))
+    a_order = np.argsort(a, kind="stable")
+    b_order = np.argsort(b, kind="stable")
+    a_sorted = a[a_order]
+    b_sorted = b[b_order]
+    # suffix sums over a (feeds still at min) and prefix sums over b (feeds already at max)
+    lo_suffix = np.concatenate([np.cumsum(lo[a_order][::-1])[::-1], [0.0]])
+    w_a_suffix = np.concatenate([np.cumsum(weights[a_order][::-1])[::-1], [0.0]])
+    hi_prefix = np.concatenate([[0.0], np.cumsum(hi[b_order])])
+    w_b_prefix = np.concatenate([[0.0], np.cumsum(weights[b_order])])
+
+    at_min_from = np.searchsorted(a_sorted, levels, side="left")
+    at_max_to = np.searchsorted(b_sorted, levels, side="right")
+    w_mid = weights.sum() - w_a_suffix[at_min_from] - w_b_prefix[at_max_to]
+    sums = lo_suffix[at_min_from] + hi_prefix[at_max_to] + levels * np.clip(w_mid, 0.0, None)
+
+    # S is continuous and non-decreasing, interpolate linearly within the crossing segment
+    k = int(np.searchsorted(sums, total, side="left"))
+    if k == 0:
+        level = levels[0]
+    elif k >= len(levels):
+        level = levels[-1]
+    else:
+        level = levels[k - 1] + (total - sums[k - 1]) * (levels[k] - levels[k - 1]) / (sums[k] - sums[k - 1])
+
+    return np.clip(level * weights, lo, hi)
+
+
+@dataclass
+class FeedRateStats:
+    """
+    Smoothed encoder output and delivery quality of one feed.
+
+    :param tx_kbps: EWMA of the sent bitrate in kbps. Nullable if no stats have arrived yet
+    :param loss: EWMA of the fraction of lost packets reported by the worst viewer
+    :param target_kbps: The last allocated bitrate in kbps. Nullable
+    :param last_counters: The last (ssrc, timestamp in ms, bytes sent) to calculate the bitrate from. Nullable
+    """
+
+    tx_kbps: float | None = None
+    loss: float = 0.0
+    target_kbps: float | None = None
+    last_counters: Tuple[Any, float, float] | None = None
+
+
+class UtilityAllocator:
+    """
+    Utility-based bitrate allocation. Each feed gets a concave rate-utility curve
+
+        U_i(r) = w_i * q_i * log(min(r, d_i))
+
+    where w_i is its allocation weight, q_i = 1 - smoothed loss is its delivery quality and d_i is its demand: the
+    bitrate above which the encoder does not produce more. A static scene undershoots its target bitrate, so its
+    demand is the recent encoder output plus a headroom. A heavy motion scene saturates the target, so its demand
+    is unbounded. Maximizing the sum of utilities under the shared budget and the limits gives
+
+        r_i = clip(level * w_i * q_i, min, min(max, d_i)),
+
+    i.e., the water-filling with the utility coefficients as weights and the demands as the upper limits.
+    If the budget exceeds the sum of the demands, it is split by the weights with the demands as the lower limits.
+    Without stats the allocation is the same as the weighted one.
+
+    :param alpha: EWMA smoothing factor of the stats
+    :param saturation_ratio: A feed is saturated if its output is above this fraction of its target bitrate
+    :param headroom: Demand multiplier over the output of a non-saturated feed to let it grow back
+    :param min_quality: Lower bound of the delivery quality to keep lossy feeds in the allocation
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.3,
+        saturation_ratio: float = 0.9,
+        headroom: float = 1.25,
+        min_quality: float = 0.1,
+    ) -> None:
+        self.alpha = alpha
+        self.saturation_ratio = saturation_ratio
+        self.headroom = headroom
+        self.min_quality = min_quality
+        self.feeds: Dict[str, FeedRateStats] = {}
+
+    def update_stats(
+        self,
+        feed_name: str,
+        ssrc: Any,
+        timestamp_ms: float,
+        bytes_sent: float,
+        loss: float | None = None,
+        bitrate_sent_kbps: float | None = None,
+    ) -> None:
+        """
+        Update the smoothed output and delivery quality of the feed with its latest sender stats.
+
+        :param feed_name: Feed name
+        :param ssrc: SSRC of the sent RTP stream, the counters restart when it changes
+        :param timestamp_ms: Timestamp of the counters in ms
+        :param bytes_sent: Bytes sent in the RTP stream
+        :param loss: Fraction of lost packets reported by the worst viewer. Nullable if no receiver report arrived
+        :param bitrate_sent_kbps: Sent bitrate measured by the transport. Nullable, then it is calculated from the
+            counters
+        """
+        feed = self.feeds.setdefault(feed_name, FeedRateStats())
+        tx_kbps = bitrate_sent_kbps
+        if tx_kbps is None and feed.last_counters is not None and feed.last_counters[0] == ssrc:
+            # the counters restart if another viewer's webrtcbin stands in for the left first one
+            ts_diff_sec = (timestamp_ms - feed.last_counters[1]) / 1000
+            if ts_diff_sec > 0:
+                tx_kbps = (bytes_sent - feed.last_counters[2]) * 8 / 1000 / ts_diff_sec
+        feed.last_counters = (ssrc, timestamp_ms, bytes_sent)
+        if tx_kbps is not None:
+            feed.tx_kbps = tx_kbps if feed.tx_kbps is None else feed.tx_kbps + self.alpha * (tx_kbps - feed.tx_kbps)
+        if loss is not None:
+            feed.loss += self.alpha * (loss - feed.loss)
+
+    def set_target(self, feed_name: str, target_kbps: float) -> None:
+        self.feeds.setdefault(feed_name, FeedRateStats()).target_kbps = target_kbps
+
+    def remove_feed(self, feed_name: str) -> None:
+        _ = self.feeds.pop(feed_name, None)
+
+    def get_curve(self, feed_name: str, weight: float) -> Tuple[float, float]:
+        """
+        Get the utility curve parameters of the feed.
+
+        :param feed_name: Feed name
+        :param weight: Allocation weight of the feed
+        :return: The utility coefficient w_i * q_i and the demand d_i in kbps (inf if unbounded)
+        """
+        feed = self.feeds.get(feed_name, None)
+        if feed is None:
+            return weight, float("inf")
+        coefficient = weight * max(self.min_quality, 1.0 - feed.loss)
+        demand = float("inf")
+        if feed.tx_kbps is not None and feed.target_kbps is not None and feed.target_kbps > 0:
+            if feed.tx_kbps < self.saturation_ratio * feed.target_kbps:
+                demand = feed.tx_kbps * self.headroom
+        return coefficient, demand
+
+    def allocate(
+        self,
+        total: float,
+        feed_names: List[str],
+        weights: np.ndarray,
+        min_limit: float,
+        max_limit: float,
+    ) -> np.ndarray:
+        """
+        Split the total bitrate between the feeds maximizing the sum of their utilities.
+
+        :param total: The total bitrate in kbps
+        :param feed_names: Feed names
+        :param weights: Allocation weights, one per feed
+        :param min_limit: Min bitrate in kbps
+        :param max_limit: Max bitrate in kbps
+        :return: Allocated bitrates in kbps, one per feed
+        """
+        curves = [self.get_curve(feed_name, weight) for feed_name, weight in zip(feed_names, weights.tolist())]
+        coefficients = np.array([curve[0] for curve in curves], dtype=np.float64)
+        demands = np.clip(np.array([curve[1] for curve in curves], dtype=np.float64), min_limit, max_limit)
+        if total <= demands.sum():
+            return water_fill(total, coefficients, min_limit, demands)
+        # every feed gets its demand, the rest is split by the weights
+        return water_fill(total, weights, demands, max_limit)
+
+
+class SharedUplinkEstimator:
+    """
+    Estimates the capacity of an uplink shared by several feeds from their GCC estimates. Each GCC loop estimates
+    the bandwidth available to its own feed, so the competing loops oscillate around their fair shares while their
+    sum tracks the shared bottleneck. The pooled capacity is the sum of the latest fresh estimates (scaled up if some
+    feeds have not reported yet) smoothed asymmetrically: it follows drops fast and grows slowly, which damps the
+    oscillations and backs off the whole fleet at once on congestion.
+
+    :param alpha_down: EWMA smoothing factor when the pooled sum drops
+    :param alpha_up: EWMA smoothing factor when the pooled sum grows
+    :param utilization: Fraction of the capacity to allocate, the rest is the headroom to drain the queues
+    :param max_age: A feed's estimate is stale after this time in seconds
+    """
+
+    def __init__(
+        self,
+        alpha_down: float = 0.5,
+        alpha_up: float = 0.1,
+        utilization: float = 0.95,
+        max_age: float = 10.0,
+    ) -> None:
+        self.alpha_down = alpha_down
+        self.alpha_up = alpha_up
+        self.utilization = utilization
+        self.max_age = max_age
+        # feed name -> (estimate in kbps, update time)
+        self.estimates: Dict[str, Tuple[float, float]] = {}
+        self.capacity = None
+
+    def update(self, feed_name: str, estimate_kbps: float) -> None:
+        self.estimates[feed_name] = (estimate_kbps, time.monotonic())
+
+    def remove_feed(self, feed_name: str) -> None:
+        _ = self.estimates.pop(feed_name, None)
+
+    def reset(self) -> None:
+        self.estimates.clear()
+        self.capacity = None
+
+    def get_capacity(self, feed_names: List[str]) -> float | None:
+        """
+        Update and get the pooled capacity. It is meant to be called once per allocation round.
+
+        :param feed_names: Names of the feeds sharing the uplink
+        :return: The capacity to allocate in kbps or None if there are no fresh estimates
+        """
+        now = time.monotonic()
+        fresh = [
+            self.estimates[feed_name][0]
+            for feed_name in feed_names
+            if feed_name in self.estimates and now - self.estimates[feed_name][1] <= self.max_age
+        ]
+        if not fresh:
+            return None if self.capacity is None else self.capacity * self.utilization
+        pooled = sum(fresh) * len(feed_names) / len(fresh)
+        if self.capacity is None:
+            self.capacity = pooled
+        else:
+            alpha = self.alpha_down if pooled < self.capacity else self.alpha_up
+            self.capacity += alpha * (pooled - self.capacity)
+        return self.capacity * self.utilization
+
+
+class AllocationNode:
+    """
+    A node of the allocation tree: either a group (site, uplink, feed group) or a feed (leaf).
+    Each node keeps the aggregated min and max bitrates of its active subtree, so any change of a feed
+    is propagated only to its ancestors.
+
+    :param name: Node name, unique in the tree
+    :param weight: Allocation weight relative to the siblings
+    :param budget: Max bitrate of the whole subtree in kbps (e.g., an uplink capacity). Nullable (unlimited)
+    :param min_budget: Guaranteed bitrate of the whole subtree in kbps if it has active feeds
+    :param parent: Parent node. Nullable for the root
+    :param is_feed: Whether the node is a feed
+    """
+
+    def __init__(
+        self,
+        name: str,
+        weight: float = 1.0,
+        budget: float | None = None,
+        min_budget: float = 0.0,
+        parent: "AllocationNode | None" = None,
+        is_feed: bool = False,
+    ) -> None:
+        self.name = name
+        self.weight = weight
+        self.budget = budget if budget is not None else float("inf")
+        self.min_budget = min_budget
+        self.parent = parent
+        self.is_feed = is_feed
+        self.children: Dict[str, AllocationNode] = {}
+
+        # feed: own limits and state, group: sums over the active children
+        self.is_active = False
+        self.feed_min = 0.0
+        self.feed_max = float("inf")
+        self.num_active = 0
+        self.min_sum = 0.0
+        self.max_sum = 0.0
+
+        # the last allocation of the subtree, reused while nothing has changed in it and its budget is the same. Any
+        # change of a weight, a limit or an active feed marks the node and its ancestors dirty
+        self.is_dirty = True
+        self.last_budget = None
+        self.last_shares: Dict[str, float] = {}
+
+    @property
+    def min_total(self) -> float:
+        if self.is_feed:
+            return self.feed_min if self.is_active else 0.0
+        return min(self.budget, max(self.min_budget, self.min_sum)) if self.num_active > 0 else 0.0
+
+    @property
+    def max_total(self) -> float:
+        if self.is_feed:
+            return self.feed_max if self.is_active else 0.0
+        return min(self.budget, self.max_sum) if self.num_active > 0 else 0.0
+
+    def get_path(self) -> List[str]:
+        path = []
+        node = self
+        while node is not None:
+            path.append(node.name)
+            node = node.parent
+        return path[::-1]
+
+    def allocate(self, budget: float, shares: Dict[str, float]) -> None:
+        """
+        Split the budget between the active children by their weights within their aggregated limits and recurse.
+
+        :param budget: The budget of this subtree in kbps
+        :param shares: Output: feed names mapped to their allocated bitrates
+        """
+        if not self.is_dirty and self.last_budget == budget:
+            shares.update(self.last_shares)
+            return
+
+        children = [child for child in self.children.values() if child.is_active or child.num_active > 0]
+        subtree_shares = {}
+        if children:
+            child_shares = water_fill(
+                budget,
+                np.array([child.weight for child in children]),
+                np.array([child.min_total for child in children]),
+                np.array([child.max_total for child in children]),
+            )
+            for child, child_share in zip(children, child_shares.tolist()):
+                if child.is_feed:
+                    subtree_shares[child.name] = child_share
+                else:
+                    child.allocate(child_share, subtree_shares)
+
+        self.last_budget = budget
+        self.last_shares = subtree_shares
+        self.is_dirty = False
+        shares.update(subtree_shares)
+
+
+class AllocationTree:
+    """
+    A tree of allocation groups, e.g., site -> uplink -> feed group -> feed. Each group has its own weight,
+    budget (max bitrate of the subtree) and min budget. Weights are relative to the siblings, so they are never
+    re-normalized. Turning a feed on/off or changing a weight updates only the aggregates of its ancestors and marks
+    them dirty: O(depth). An allocation round water-fills top-down only the groups that are dirty or get a different
+    budget. The others reuse their last shares, e.g., the subtrees of the groups clamped to their budget or min budget
+    keep their shares while the total changes.
+
+    :param min_limit: Min bitrate of a feed in kbps
+    :param max_limit: Max bitrate of a feed in kbps. Should be finite as the sums are updated with deltas
+    """
+
+    ROOT = "root"
+
+    def __init__(self, min_limit: float = 0.0, max_limit: float = 1e9) -> None:
+        self.root = AllocationNode(self.ROOT)
+        self.nodes: Dict[str, AllocationNode] = {self.ROOT: self.root}
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+
+    @classmethod
+    def from_dict(
+        cls,
+        groups: Dict[str, Any],
+        min_limit: float = 0.0,
+        max_limit: float = 1e9,
+    ) -> "AllocationTree":
+        """
+        Build the tree from a nested dict of groups. Each group could have "weight", "budget", "min_budget" and
+        "children" keys. Nodes without children are feeds (only "weight" is used), they are added inactive. E.g.:
+            {"site_a": {"budget": 20000, "children": {"uplink_1": {"budget": 8000, "children": {"feed1": {}}}}}}
+
+        :param groups: Nested dict of the groups
+        :param min_limit: Min bitrate of a feed in kbps
+        :param max_limit: Max bitrate of a feed in kbps
+        :return: Allocation tree
+        """
+        tree = cls(min_limit, max_limit)
+
+        def _add(parent_name: str, children: Dict[str, Any]) -> None:
+            for name, params in children.items():
+                params = params or {}
+                if params.get("children"):
+                    tree.add_group(
+                        name,
+                        parent_name,
+                        weight=params.get("weight", 1.0),
+                        budget=params.get("budget", None),
+                        min_budget=params.get("min_budget", 0.0),
+                    )
+                    _add(name, params["children"])
+                else:
+                    tree.add_feed(name, parent_name, weight=params.get("weight", 1.0), is_active=False)
+
+        _add(cls.ROOT, groups or {})
+        return tree
+
+    def add_group(
+        self,
+        name: str,
+        parent: str = ROOT,
+        weight: float = 1.0,
+        budget: float | None = None,
+        min_budget: float = 0.0,
+    ) -> AllocationNode:
+        if name in self.nodes:
+            raise ValueError(f"ERROR: AllocationTree: node {name} already exists")
+        parent_node = self.nodes[parent]
+        node = AllocationNode(name, weight, budget, min_budget, parent=parent_node)
+        parent_node.children[name] = node
+        self.nodes[name] = node
+        return node
+
+    def add_feed(self, name: str, parent: str = ROOT, weight: float = 1.0, is_active: bool = True) -> AllocationNode:
+        if name in self.nodes:
+            node = self.nodes[name]
+            if is_active:
+                self.activate(name)
+            return node
+        parent_node = self.nodes[parent]
+        node = AllocationNode(name, weight, parent=parent_node, is_feed=True)
+        node.feed_min = self.min_limit
+        node.feed_max = self.max_limit
+        parent_node.children[name] = node
+        self.nodes[name] = node
+        if is_active:
+            self.activate(name)
+        return node
+
+    def remove_feed(self, name: str) -> None:
+        node = self.nodes.get(name, None)
+        if node is None or not node.is_feed:
+            return
+        self.deactivate(name)
+        _ = node.parent.children.pop(name, None)
+        _ = self.nodes.pop(name, None)
+
+    def activate(self, name: str) -> None:
+        self._set_active(name, True)
+
+    def deactivate(self, name: str) -> None:
+        self._set_active(name, False)
+
+    def set_weight(self, name: str, weight: float) -> None:
+        node = self.nodes.get(name, None)
+        if node is None or node.parent is None:
+            return
+        node.weight = weight
+        self._mark_dirty(node.parent)
+
+    def set_feed_limits(self, min_limit: float, max_limit: float) -> None:
+        # the limits are shared by all feeds, so it touches the whole tree
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        for node in self.nodes.values():
+            if node.is_feed:
+                node.feed_min = min_limit
+                node.feed_max = max_limit
+        self._recalculate(self.root)
+
+    def allocate(self, total: float) -> Dict[str, float]:
+        """
+        Allocate the total bitrate to the active feeds.
+
+        :param total: The total bitrate in kbps
+        :return: Feed names mapped to their allocated bitrates in kbps
+        """
+        shares = {}
+        self.root.allocate(total, shares)
+        return shares
+
+    def _set_active(self, name: str, is_active: bool) -> None:
+        node = self.nodes.get(name, None)
+        if node is None or not node.is_feed or node.is_active == is_active:
+            return
+        old_min, old_max = node.min_total, node.max_total
+        node.is_active = is_active
+        self._propagate(node.parent, node.min_total - old_min, node.max_total - old_max, 1 if is_active else -1)
+
+    def _propagate(self, node: AllocationNode | None, delta_min: float, delta_max: float, delta_active: int) -> None:
+        # walk up the ancestors updating their sums with the deltas of the changed child
+        while node is not None:
+            old_min, old_max = node.min_total, node.max_total
+            node.min_sum += delta_min
+            node.max_sum += delta_max
+            node.num_active += delta_active
+            node.is_dirty = True
+            delta_min = node.min_total - old_min
+            delta_max = node.max_total - old_max
+            node = node.parent
+
+    def _mark_dirty(self, node: AllocationNode | None) -> None:
+        while node is not None:
+            node.is_dirty = True
+            node = node.parent
+
+    def _recalculate(self, node: AllocationNode) -> None:
+        node.is_dirty = True
+        if node.is_feed:
+            return
+        node.num_active = 0
+        node.min_sum = 0.0
+        node.max_sum = 0.0
+        for child in node.children.values():
+            self._recalculate(child)
+            node.num_active += int(child.is_active) if child.is_feed else child.num_active
+            node.min_sum += child.min_total
+            node.max_sum += child.max_total
@@ -7,6 +7,7 @@ from typing import Any, Dict, List, Tuple
 import yaml
 
 from gstwebrtcapp.apps.ahoyapp.connector import AhoyConnector
+from gstwebrtcapp.apps.ahoyapp.signalling import DirectorSignallingMux
 from gstwebrtcapp.apps.app import GstWebRTCAppConfig
 from gstwebrtcapp.apps.sinkapp.connector import SinkConnector
 from gstwebrtcapp.apps.pipelines import get_pipeline_by_specs
@@ -15,12 +16,14 @@ from gstwebrtcapp.control.drl.agent import DrlAgent
 from gstwebrtcapp.control.drl.config import DrlConfig
 from gstwebrtcapp.control.drl.mdp import MDP, ViewerSeqMDP
 from gstwebrtcapp.control.recorder.agent import RecorderAgent, RecorderAgentMode
+from gstwebrtcapp.control.recorder.decimator import StatsDecimator
 from gstwebrtcapp.control.safety.agent import SafetyDetectorAgent
 from gstwebrtcapp.control.safety.monitor import MonitorConfig
 from gstwebrtcapp.control.safety.switcher import SwitchingPair
 from gstwebrtcapp.message.broker import MqttBrokerConfig
 from gstwebrtcapp.message.client import MqttConfig, MqttExternalEstimationTopics, MqttGstWebrtcAppTopics
 from gstwebrtcapp.run.feed_controller import FeedController
+from gstwebrtcapp.run.sharding import ShardedFeedController
 from gstwebrtcapp.utils.base import LOGGER
 
 
@@ -117,6 +120,21 @@ def parse_monitor_configs(yaml_config: str) -> Dict[str, MonitorConfig]:
     return cfgs
 
 
+def parse_allocation_groups(yaml_config: str) -> Dict[str, Any]:
+    try:
+        with open(yaml_config, "r") as f:
+            config_dict = yaml.safe_load(f)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"parse_allocation_groups: config file not found: {yaml_config}")
+    except yaml.YAMLError as e:
+        raise yaml.YAMLError(f"parse_allocation_groups: error parsing config file: {e}")
+
+    groups_dict = config_dict.get("groups", {})
+    if not groups_dict:
+        raise Exception("parse_allocation_groups: no groups found")
+    return groups_dict
+
+
 def make_feed_mqtt_config(
     broker_config: MqttBrokerConfig,
     feed_name: str,
@@ -287,6 +305,8 @@ def make_recorder_agent(
     log_path: str | None = "./logs",
     stats_publish_topic: str | None = None,
     external_data_channel: str | None = None,
+    relay_window: float = 0.0,
+    relay_mode: str = "summary",
     warmup: float = 10.0,
     verbose: bool = False,
 ) -> RecorderAgent:
@@ -297,6 +317,7 @@ def make_recorder_agent(
         log_path=log_path,
         stats_publish_topic=stats_publish_topic,
         external_data_channel=external_data_channel,
+        relay_decimator=StatsDecimator(relay_window, relay_mode) if relay_window > 0.0 else None,
         warmup=warmup,
         verbose=verbose,
     )
@@ -319,6 +340,15 @@ def make_connector(
     recorder_modes: str = "",
     is_bidirectional_data_channel: bool = False,
     warmup: float = 10.0,
+    is_keep_pipeline: bool = True,
+    is_warm_pipeline: bool = False,
+    is_trickle_ice: bool = False,
+    max_viewers: int = 1,
+    dc_batch_interval: float = 0.0,
+    is_dc_binary: bool = False,
+    recorder_relay_window: float = 0.0,
+    recorder_relay_mode: str = "summary",
+    is_shared_signalling: bool = False,
 ) -> AhoyConnector | SinkConnector:
     # TODO: add support for network controller and share_ice_topic
     type = connector_type.lower()
@@ -405,6 +435,8 @@ def make_connector(
             log_path=f"./logs/{feed_name}" if RecorderAgentMode.CSV in recorder_agent_modes else None,
             stats_publish_topic=state_publish_topic if RecorderAgentMode.MQTT in recorder_agent_modes else None,
             external_data_channel=external_data_channel if RecorderAgentMode.DC in recorder_agent_modes else None,
+            relay_window=recorder_relay_window,
+            relay_mode=recorder_relay_mode,
             warmup=warmup,
         )
         agents.append(recorder_agent)
@@ -418,6 +450,7 @@ def make_connector(
                 "name": external_data_channel,
                 "options": None,
                 "callbacks": None,
+                "sender": {"batch_interval": dc_batch_interval, "is_binary": is_dc_binary},
             }
         )
 
@@ -444,6 +477,11 @@ def make_connector(
             feed_name=feed_name,
             mqtt_config=connector_mqtt_cfg,
             switching_pair=switching_pair,
+            is_keep_pipeline=is_keep_pipeline,
+            is_warm_pipeline=is_warm_pipeline,
+            is_trickle_ice=is_trickle_ice,
+            max_viewers=max_viewers,
+            signalling_mux=DirectorSignallingMux.get_shared(server, api_key) if is_shared_signalling else None,
         )
 
 
@@ -456,6 +494,10 @@ def make_feed_controller(
     action_limits: Dict[str, Tuple[float, float]] | None = {"bitrate": (400, 10000)},
     max_aggregation_time: float = 5.0,
     warmup: float = 10.0,
+    allocation_strategy: str = "weights",
+    allocation_groups: Dict[str, Any] | None = None,
+    is_pool_uplink: bool = False,
+    is_passthrough: bool = True,
 ) -> FeedController:
     feed_topic_prefix = f"{mqtt_prefix}/" if mqtt_prefix else ""
     return FeedController(
@@ -467,6 +509,46 @@ def make_feed_controller(
         action_limits=action_limits,
         max_aggregation_time=max_aggregation_time,
         warmup=warmup,
+        allocation_strategy=allocation_strategy,
+        stats_topics={feed: f"{feed_topic_prefix}{feed}/stats" for feed in feeds},
+        allocation_groups=allocation_groups,
+        gcc_topics={feed: f"{feed_topic_prefix}{feed}/gcc" for feed in feeds},
+        is_pool_uplink=is_pool_uplink,
+        is_passthrough=is_passthrough,
+    )
+
+
+def make_sharded_feed_controller(
+    num_shards: int,
+    feeds: Dict[str, GstWebRTCAppConfig],
+    broker_config: MqttBrokerConfig,
+    mqtt_prefix: str = "",
+    controller_topic: str | None = None,
+    aggregation_topic: str | None = None,
+    action_limits: Dict[str, Tuple[float, float]] | None = {"bitrate": (400, 10000)},
+    max_aggregation_time: float = 5.0,
+    warmup: float = 10.0,
+    allocation_strategy: str = "weights",
+    is_pool_uplink: bool = False,
+    is_passthrough: bool = True,
+    max_total_bitrate: float | None = None,
+) -> ShardedFeedController:
+    feed_topic_prefix = f"{mqtt_prefix}/" if mqtt_prefix else ""
+    return ShardedFeedController(
+        num_shards=num_shards,
+        mqtt_config=make_inactive_mqtt_config(broker_config, "controller", controller_topic=controller_topic),
+        feed_topics={feed: f"{feed_topic_prefix}{feed}/actions" for feed in feeds},
+        controller_topic=controller_topic,
+        aggregation_topic=aggregation_topic,
+        action_limits=action_limits,
+        max_aggregation_time=max_aggregation_time,
+        warmup=warmup,
+        allocation_strategy=allocation_strategy,
+        stats_topics={feed: f"{feed_topic_prefix}{feed}/stats" for feed in feeds},
+        gcc_topics={feed: f"{feed_topic_prefix}{feed}/gcc" for feed in feeds},
+        is_pool_uplink=is_pool_uplink,
+        is_passthrough=is_passthrough,
+        max_total_bitrate=max_total_bitrate,
     )
 
 
@@ -490,6 +572,10 @@ async def make_allocation_coro(controller: FeedController) -> None:
     await controller.allocation_coro()
 
 
+async def make_coordinator_coro(controller: ShardedFeedController) -> None:
+    await controller.coordinator_coro()
+
+
 def serialize_connector_kwargs(args: Dict[str, Any]) -> str:
     for k, v in args.items():
         if isinstance(v, GstWebRTCAppConfig):
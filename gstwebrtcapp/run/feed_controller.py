@@ -2,17 +2,20 @@ import asyncio
 import copy
 import enum
 import json
-import time
 from typing import Any, Dict, Tuple
 
+import numpy as np
+
 from gstwebrtcapp.message.client import MqttConfig, MqttMessage, MqttPair, MqttPublisher, MqttSubscriber
-from gstwebrtcapp.utils.base import (
-    LOGGER,
-    async_sleep_until_condition_with_intervals,
-    async_wait_for_condition,
-    map_value,
-    wait_for_condition,
+from gstwebrtcapp.run.allocation import (
+    AllocationStrategy,
+    AllocationTree,
+    SharedUplinkEstimator,
+    UtilityAllocator,
+    water_fill,
 )
+from gstwebrtcapp.run.feed_index import FeedIndex
+from gstwebrtcapp.utils.base import LOGGER, async_wait_for_condition, map_value
 
 
 class FeedState(enum.Enum):
@@ -33,6 +36,12 @@ class FeedController:
         action_limits: Dict[str, Tuple[float, float]] = {},
         max_aggregation_time: float = 5.0,
         warmup: float = 0.0,
+        allocation_strategy: AllocationStrategy | str = AllocationStrategy.WEIGHTS,
+        stats_topics: Dict[str, str] | None = None,
+        allocation_groups: Dict[str, Any] | None = None,
+        gcc_topics: Dict[str, str] | None = None,
+        is_pool_uplink: bool = False,
+        is_passthrough: bool = True,
     ) -> None:
         self.mqtt_config = mqtt_config
         self.mqtts = MqttPair(
@@ -41,8 +50,14 @@ class FeedController:
         )
         self.mqtts.publisher.start()
         self.mqtts.subscriber.start()
+        self.is_running = False
+
+        # the agents of the feeds whose actions need no allocation publish straight to their connectors
+        self.is_passthrough = is_passthrough
+        self.passthroughs: Dict[str, Dict[str, Any]] = {}
 
         self.feeds = {feed_name: FeedState.ALLOCATED for feed_name in feed_topics}
+        self.feed_index = FeedIndex(self.feeds)
         self.feed_topics = feed_topics
         self.allocated_feed_topics = copy.deepcopy(self.feed_topics)
         self.controller_topic = controller_topic or self.mqtt_config.topics.controller
@@ -58,7 +73,28 @@ class FeedController:
         self.max_aggregation_time = max_aggregation_time
         self.warmup = warmup
 
-        self.is_running = False
+        # raw GStreamer stats of the feeds are consumed only by the utility-based allocation
+        self.stats_topics = stats_topics or {}
+        self.utility_allocator = UtilityAllocator()
+        self.allocation_strategy = AllocationStrategy.WEIGHTS
+        self.set_allocation_strategy(allocation_strategy)
+
+        # GCC estimates of the feeds are consumed only by the shared uplink pooling
+        self.gcc_topics = gcc_topics or {}
+        self.uplink_estimator = SharedUplinkEstimator(max_age=2 * self.max_aggregation_time)
+        self.is_pool_uplink = False
+        self.set_uplink_pooling(is_pool_uplink)
+
+        # hierarchical bitrate allocation (site -> uplink -> group -> feed), feeds missing in the groups go to the root
+        self.allocation_tree = None
+        self.last_tree_shares = {}
+        if allocation_groups:
+            self.allocation_tree = AllocationTree.from_dict(
+                allocation_groups,
+                *self.action_limits.get("bitrate", (0.0, 1e9)),
+            )
+            for feed_name in self.allocated_feed_topics:
+                self.allocation_tree.add_feed(feed_name)
 
     async def controller_coro(self) -> None:
         if not self.controller_topic:
@@ -86,7 +122,7 @@ class FeedController:
                                 match action_name:
                                     case "weights":
                                         # pass it in a form of {"all": {"weights": {feed_name: weight, ...}}}
-                                        self.update_allocation_weights(action_value)
+                                        self._on_weights_action(action_value)
                                         LOGGER.info(f"ACTION: updated weights for all feeds: {self.allocation_weights}")
                                     case "limits":
                                         # pass it in a form of {"all": {"limits": {action_name: (min, max), ...}}}
@@ -94,11 +130,20 @@ class FeedController:
                                         LOGGER.info(
                                             f"ACTION: updated action limits for all feeds: {self.action_limits}"
                                         )
+                                    case "strategy":
+                                        # pass it in a form of {"all": {"strategy": "weights" | "utility"}}
+                                        self.set_allocation_strategy(action_value)
+                                    case "pool":
+                                        # pass it in a form of {"all": {"pool": True/False}}
+                                        self.set_uplink_pooling(action_value)
                                     case _:
                                         LOGGER.error(
                                             f"ERROR: FeedController : Unknown general action with the name: {action_name}"
                                         )
                             continue
+                        if not self._is_own_feed(feed_name):
+                            # the feed is handled by another controller (e.g., another shard)
+                            continue
                         # INDIVIDUAL ACTIONS
                         for action_name, action_value in action_dict.items():
                             action_name = action_name.lower()
@@ -188,6 +233,7 @@ class FeedController:
         self.mqtts.subscriber.clean_message_queue(self.aggregation_topic)
         self.is_running = True
         LOGGER.info(f"INFO: FeedController's allocation coroutine is starting...")
+        self._update_passthroughs()
 
         while self.is_running:
             try:
@@ -195,38 +241,30 @@ class FeedController:
                     await async_wait_for_condition(lambda: self.allocated_feed_topics, -1, 0.1)
                 aggregated_actions = await self._aggregation_coro()
                 if aggregated_actions:
-                    self._allocate_actions(aggregated_actions)
+                    await self._allocate_actions(aggregated_actions)
             except Exception as e:
                 raise Exception(f"ERROR: FeedController's allocation coro has thrown an exception: reason {e}")
 
     async def _aggregation_coro(self) -> Dict[str, Any]:
-        # it should aggregate N actions where N is the number of feeds
+        # it should aggregate N actions where N is the number of feeds within one shared deadline
         if self.mqtts.subscriber.message_queues.get(self.aggregation_topic, None) is None:
-            # if first message has not appeared, wait for it for 10 seconds
-            wait_for_condition(
-                lambda: self.mqtts.subscriber.message_queues.get(self.aggregation_topic, None) is not None, 10.0
-            )
-        else:
-            queue = self.mqtts.subscriber.message_queues[self.aggregation_topic]
+            LOGGER.warning("WARNING: FeedController: no message queue for the aggregation topic, waiting...")
+            await asyncio.sleep(self.max_aggregation_time)
+            return {}
 
-        time_starts = time.time()
-        time_wait = self.max_aggregation_time
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_aggregation_time
         aggregated_msgs = {}
         while len(aggregated_msgs) < len(self.allocated_feed_topics):
-            is_msg = await async_sleep_until_condition_with_intervals(
-                int(time_wait / 0.1),
-                time_wait,
-                lambda: not queue.empty(),
-            )
-            if is_msg:
-                mqtt_msg: MqttMessage = queue.get_nowait()
-            else:
-                mqtt_msg = None
+            # the round is over as soon as the last expected feed reports or the deadline is reached
+            time_wait = deadline - loop.time()
+            if time_wait <= 0.0:
+                break
+            mqtt_msg = await self.mqtts.subscriber.await_message(self.aggregation_topic, time_wait)
+            if mqtt_msg is None:
                 break
-            time_wait = max(0.0, self.max_aggregation_time - (time.time() - time_starts))
-            feed_name = next((k for k in self.allocated_feed_topics if mqtt_msg.id.startswith(k)), None)
-            if feed_name is None:
-                feed_name = next((k for k in self.feed_topics if mqtt_msg.id.startswith(k)), None)
+            feed_name = self.feed_index.resolve(mqtt_msg.source, mqtt_msg.id)
+            if feed_name not in self.allocated_feed_topics:
                 if feed_name is not None:
                     if self.feeds[feed_name] == FeedState.INDEPENDENT:
                         # if it is independent propagate the action to the feed mapping its value to the limits
@@ -252,71 +290,227 @@ class FeedController:
 
         return aggregated_msgs
 
-    def _allocate_actions(self, actions: Dict[str, Any] | Dict[str, Dict[str, Any]]) -> None:
+    async def _allocate_actions(self, actions: Dict[str, Any] | Dict[str, Dict[str, Any]]) -> None:
         # sum all actions for each feed that are allocated (a mismatch could be due to a concurrency)
         actions_ = {feed_name: actions[feed_name] for feed_name in actions if feed_name in self.allocated_feed_topics}
-        summed_actions = {
-            action_key: sum([actions_[feed_name][action_key] for feed_name in actions_])
-            for action_key in actions_[list(actions_.keys())[0]]
-        }
-
-        # initial allocation based on weights
-        feeds_arrived = actions_.keys()
-        allocated_actions = {
-            feed_name: {
-                action_key: summed_actions[action_key] * self.allocation_weights[feed_name]
-                for action_key in summed_actions
-            }
-            for feed_name in feeds_arrived
-        }
-
-        # adjust allocations to respect min and max limits if provided
-        for action_key in summed_actions:
-            if action_key in self.action_limits:
-                min_limit, max_limit = self.action_limits[action_key]
-                while True:
-                    adjustment_value = 0.0
-                    max_feeds = []
-                    min_feeds = []
-                    for feed_name in feeds_arrived:
-                        allocated = allocated_actions[feed_name][action_key]
-                        if allocated > max_limit:
-                            adjustment_value += allocated - max_limit
-                            allocated_actions[feed_name][action_key] = max_limit
-                            max_feeds.append(feed_name)
-                        elif allocated < min_limit:
-                            adjustment_value -= min_limit - allocated
-                            allocated_actions[feed_name][action_key] = min_limit
-                            min_feeds.append(feed_name)
-
-                    if adjustment_value != 0.0:
-                        no_more_feeds = min_feeds if adjustment_value < 0.0 else max_feeds
-                        remaining_feeds = [feed for feed in feeds_arrived if feed not in no_more_feeds]
-                        if remaining_feeds:
-                            remaining_weight_denom = sum([self.allocation_weights[feed] for feed in remaining_feeds])
-                            for feed_name in remaining_feeds:
-                                weight = self.allocation_weights[feed_name] / remaining_weight_denom
-                                allocated_actions[feed_name][action_key] += adjustment_value * weight
-                        else:
-                            # should not be reachable as the AI agent should also follow the same limits
-                            break
-                    else:
-                        break
+        if not actions_:
+            return
+        feeds_arrived = list(actions_.keys())
+        action_keys = list(actions_[feeds_arrived[0]].keys())
+        summed_actions = np.array(
+            [[actions_[feed_name][action_key] for action_key in action_keys] for feed_name in feeds_arrived],
+            dtype=np.float64,
+        ).sum(axis=0)
+
+        # weighted water-filling per action: shares follow the weights and respect the min and max limits if provided.
+        # If not all feeds have arrived, only their part of the weights is allocated
+        if self.allocation_tree is None:
+            weights = np.array([self.allocation_weights[feed_name] for feed_name in feeds_arrived], dtype=np.float64)
+        else:
+            # the flat weights are not maintained with the groups, other actions than bitrate are split equally
+            weights = np.full(len(feeds_arrived), 1.0 / max(len(feeds_arrived), len(self.allocated_feed_topics)))
+        allocated_actions = {feed_name: {} for feed_name in feeds_arrived}
+        pooled_capacity = self._get_pooled_capacity() if "bitrate" in action_keys else None
+        for action_key, summed_action in zip(action_keys, summed_actions.tolist()):
+            if action_key == "bitrate" and pooled_capacity is not None:
+                # the pooled estimate of the shared uplink replaces the sum of the competing agents' actions
+                summed_action = pooled_capacity
+            summed_action = await self._get_allocation_total(action_key, summed_action, float(weights.sum()))
+            if action_key == "bitrate" and self.allocation_tree is not None:
+                if pooled_capacity is None:
+                    # the feeds that have not reported keep their last shares
+                    summed_action += sum(
+                        self.last_tree_shares.get(feed_name, 0.0)
+                        for feed_name in self.allocated_feed_topics
+                        if feed_name not in actions_
+                    )
+                tree_shares = self.allocation_tree.allocate(summed_action)
+                self.last_tree_shares.update(tree_shares)
+                shares = np.array([tree_shares.get(feed_name, 0.0) for feed_name in feeds_arrived])
+            elif action_key == "bitrate" and self.allocation_strategy == AllocationStrategy.UTILITY:
+                self._update_feed_stats()
+                min_limit, max_limit = self.action_limits.get(action_key, (0.0, float("inf")))
+                shares = self.utility_allocator.allocate(
+                    summed_action * weights.sum(), feeds_arrived, weights, min_limit, max_limit
+                )
+                for feed_name, share in zip(feeds_arrived, shares.tolist()):
+                    self.utility_allocator.set_target(feed_name, share)
+            elif action_key in self.action_limits:
+                shares = water_fill(summed_action * weights.sum(), weights, *self.action_limits[action_key])
+            else:
+                shares = summed_action * weights
+            for feed_name, share in zip(feeds_arrived, shares.tolist()):
+                allocated_actions[feed_name][action_key] = share
 
         # publish allocated actions to the feeds' connectors listening for them
         for feed_name, feed_topic in self.allocated_feed_topics.items():
             if feed_name in allocated_actions:
                 self.mqtts.publisher.publish(feed_topic, json.dumps(allocated_actions[feed_name]))
 
+    def _get_passthrough(self, feed_name: str) -> Dict[str, Any] | None:
+        # the same mapping the aggregation applies to the feed's actions or None if they have to be aggregated
+        if not self.is_passthrough or not self.aggregation_topic:
+            return None
+        state = self.feeds.get(feed_name, None)
+        limits = {key: tuple(limit) for key, limit in self.action_limits.items()}
+        if state == FeedState.INDEPENDENT and feed_name not in self.allocated_feed_topics:
+            return {
+                "topic": self.feed_topics[feed_name],
+                "limits": limits,
+                "source_limits": {
+                    key: tuple(self.init_action_limits[key]) for key in limits if key in self.init_action_limits
+                },
+            }
+        if (
+            state == FeedState.ALLOCATED
+            and list(self.allocated_feed_topics) == [feed_name]
+            and self._is_single_feed_passthrough()
+        ):
+            # the only allocated feed gets its own action clipped to the limits
+            return {"topic": self.feed_topics[feed_name], "limits": limits}
+        return None
+
+    def _is_single_feed_passthrough(self) -> bool:
+        # only the plain weighted allocation of a single feed is equal to clipping its action to the limits
+        return (
+            self.allocation_tree is None
+            and not self.is_pool_uplink
+            and self.allocation_strategy == AllocationStrategy.WEIGHTS
+        )
+
+    def _update_passthroughs(self) -> None:
+        # notify the connectors whose feeds have entered or left the pass-through mode, they reconfigure the agents
+        if not self.is_running:
+            return
+        for feed_name in self.feeds:
+            passthrough = self._get_passthrough(feed_name)
+            if passthrough == self.passthroughs.get(feed_name, None):
+                continue
+            self.mqtts.publisher.publish(
+                self.feed_topics[feed_name],
+                json.dumps({"passthrough": passthrough or False}),
+            )
+            if passthrough is None:
+                _ = self.passthroughs.pop(feed_name, None)
+            else:
+                self.passthroughs[feed_name] = passthrough
+            LOGGER.info(f"ACTION: feed {feed_name} pass-through is {'on' if passthrough else 'off'}")
+
+    def _is_own_feed(self, feed_name: str) -> bool:
+        # all feeds are handled by a single controller, override it to partition the feeds
+        return True
+
+    async def _get_allocation_total(self, action_key: str, summed_action: float, weights_sum: float) -> float:
+        # the total to allocate is the sum of the agents' actions, override it to impose an external budget
+        return summed_action
+
+    def _update_feed_stats(self) -> None:
+        # drain the stats accumulated since the last allocation
+        for feed_name, stats_topic in self.stats_topics.items():
+            queue = self.mqtts.subscriber.message_queues.get(stats_topic, None)
+            while queue is not None and not queue.empty():
+                mqtt_msg: MqttMessage = queue.get_nowait()
+                try:
+                    self._update_utility_stats(feed_name, json.loads(mqtt_msg.msg))
+                except (json.JSONDecodeError, KeyError, TypeError) as e:
+                    LOGGER.warning(f"WARNING: FeedController: invalid stats of feed {feed_name}, reason: {e}")
+
+    def _update_utility_stats(self, feed_name: str, gst_stats: Dict[str, Any]) -> None:
+        # the stats helpers need GStreamer, the controller only imports them once the utility strategy gets stats
+        from gstwebrtcapp.utils.gst import GstWebRTCStatsType, find_stat
+
+        rtp_outbound = find_stat(gst_stats, GstWebRTCStatsType.RTP_OUTBOUND_STREAM)
+        if not rtp_outbound:
+            return
+        rtp_inbound = find_stat(gst_stats, GstWebRTCStatsType.RTP_REMOTE_INBOUND_STREAM)
+        ice_candidate_pair = find_stat(gst_stats, GstWebRTCStatsType.ICE_CANDIDATE_PAIR)
+        bitrate_sent_kbps = None
+        if ice_candidate_pair and "bitrate-sent" in ice_candidate_pair[0]:
+            bitrate_sent_kbps = ice_candidate_pair[0]["bitrate-sent"] / 1000
+
+        # rb-fractionlost is in 1/256 units. The additional viewers of the feed share its encoder, so the worst of
+        # them bounds the delivery quality
+        losses = []
+        for viewer_rtp_inbound in [rtp_inbound, *gst_stats.get("viewers", {}).values()]:
+            viewer_losses = [stat["rb-fractionlost"] / 256 for stat in viewer_rtp_inbound if "rb-fractionlost" in stat]
+            if viewer_losses:
+                losses.append(sum(viewer_losses) / len(viewer_losses))
+
+        self.utility_allocator.update_stats(
+            feed_name,
+            rtp_outbound[0].get("ssrc", None),
+            rtp_outbound[0]["timestamp"],
+            rtp_outbound[0]["bytes-sent"],
+            loss=max(losses) if losses else None,
+            bitrate_sent_kbps=bitrate_sent_kbps,
+        )
+
+    def _get_pooled_capacity(self) -> float | None:
+        if not self.is_pool_uplink:
+            return None
+        # drain the GCC estimates accumulated since the last allocation, they are in bps
+        for feed_name, gcc_topic in self.gcc_topics.items():
+            queue = self.mqtts.subscriber.message_queues.get(gcc_topic, None)
+            while queue is not None and not queue.empty():
+                mqtt_msg: MqttMessage = queue.get_nowait()
+                try:
+                    self.uplink_estimator.update(feed_name, float(mqtt_msg.msg) / 1e3)
+                except (TypeError, ValueError) as e:
+                    LOGGER.warning(f"WARNING: FeedController: invalid GCC estimate of feed {feed_name}, reason: {e}")
+        return self.uplink_estimator.get_capacity(list(self.allocated_feed_topics))
+
+    def set_uplink_pooling(self, is_pool: bool) -> None:
+        if is_pool and not self.gcc_topics:
+            LOGGER.error("ERROR: FeedController: shared uplink pooling requires the GCC topics of the feeds")
+            return
+
+        if is_pool and not self.is_pool_uplink:
+            self.mqtts.subscriber.subscribe(list(self.gcc_topics.values()))
+        elif not is_pool and self.is_pool_uplink:
+            self.mqtts.subscriber.unsubscribe(list(self.gcc_topics.values()))
+            self.uplink_estimator.reset()
+        self.is_pool_uplink = bool(is_pool)
+        LOGGER.info(f"ACTION: shared uplink pooling is {'on' if self.is_pool_uplink else 'off'}")
+        self._update_passthroughs()
+
+    def set_allocation_strategy(self, strategy: AllocationStrategy | str) -> None:
+        try:
+            strategy = AllocationStrategy(strategy)
+        except ValueError:
+            LOGGER.error(f"ERROR: FeedController: unknown allocation strategy {strategy}")
+            return
+        if strategy == AllocationStrategy.UTILITY and not self.stats_topics:
+            LOGGER.error("ERROR: FeedController: utility allocation requires the stats topics of the feeds")
+            return
+
+        if strategy == AllocationStrategy.UTILITY and self.allocation_strategy != AllocationStrategy.UTILITY:
+            self.mqtts.subscriber.subscribe(list(self.stats_topics.values()))
+        elif strategy != AllocationStrategy.UTILITY and self.allocation_strategy == AllocationStrategy.UTILITY:
+            self.mqtts.subscriber.unsubscribe(list(self.stats_topics.values()))
+        self.allocation_strategy = strategy
+        LOGGER.info(f"ACTION: allocation strategy is set to {strategy.value}")
+        self._update_passthroughs()
+
     def add_feed(
         self,
         name: str,
         action_topic: str | None = None,
         new_weights: Dict[str, float] | None = None,
+        stats_topic: str | None = None,
+        gcc_topic: str | None = None,
     ) -> None:
+        if stats_topic is not None:
+            self.stats_topics[name] = stats_topic
+            if self.allocation_strategy == AllocationStrategy.UTILITY:
+                self.mqtts.subscriber.subscribe([stats_topic])
+        if gcc_topic is not None:
+            self.gcc_topics[name] = gcc_topic
+            if self.is_pool_uplink:
+                self.mqtts.subscriber.subscribe([gcc_topic])
         if name not in self.feeds:
             if action_topic is not None:
                 self.feeds[name] = FeedState.ALLOCATED
+                self.feed_index.add(name)
                 self.feed_topics[name] = action_topic
                 self.allocated_feed_topics[name] = action_topic
                 self.mqtts.subscriber.subscribe([action_topic])
@@ -328,7 +522,16 @@ class FeedController:
                 self.allocated_feed_topics[name] = self.feed_topics[name]
                 self.mqtts.subscriber.subscribe([self.feed_topics[name]])
 
-        self.update_allocation_weights(new_weights or self.allocation_weights)
+        if self.allocation_tree is not None:
+            self.allocation_tree.add_feed(name)
+            if new_weights:
+                self.update_allocation_weights(new_weights)
+        else:
+            self.update_allocation_weights(new_weights or self.allocation_weights)
+
+        # the connector could have been restarted and forgotten its pass-through, so resend it
+        _ = self.passthroughs.pop(name, None)
+        self._update_passthroughs()
 
     def remove_feed(
         self,
@@ -344,8 +547,26 @@ class FeedController:
             if is_forever:
                 _ = self.feed_topics.pop(name, None)
                 _ = self.feeds.pop(name, None)
-
-            self.update_allocation_weights(new_weights or self.allocation_weights)
+                self.feed_index.remove(name)
+                if name in self.stats_topics:
+                    self.mqtts.subscriber.unsubscribe([self.stats_topics.pop(name)])
+                self.utility_allocator.remove_feed(name)
+                if name in self.gcc_topics:
+                    self.mqtts.subscriber.unsubscribe([self.gcc_topics.pop(name)])
+                self.uplink_estimator.remove_feed(name)
+
+            if self.allocation_tree is not None:
+                self.allocation_tree.deactivate(name)
+                _ = self.last_tree_shares.pop(name, None)
+                if is_forever:
+                    self.allocation_tree.remove_feed(name)
+                if new_weights:
+                    self.update_allocation_weights(new_weights)
+            else:
+                self.update_allocation_weights(new_weights or self.allocation_weights)
+            if is_forever:
+                _ = self.passthroughs.pop(name, None)
+            self._update_passthroughs()
         else:
             raise Exception(f"ERROR: FeedController: unknown feed {name} to remove")
 
@@ -362,7 +583,14 @@ class FeedController:
                 # HACK: do not remove the last feed from the allocated feeds
                 _ = self.allocated_feed_topics.pop(name, None)
 
-        self.update_allocation_weights(self.allocation_weights)
+        if self.allocation_tree is not None:
+            if name in self.allocated_feed_topics:
+                self.allocation_tree.activate(name)
+            else:
+                self.allocation_tree.deactivate(name)
+        else:
+            self.update_allocation_weights(self.allocation_weights)
+        self._update_passthroughs()
 
     def _init_allocation_weights(self, weights: Dict[str, float] | None = None) -> None:
         if weights:
@@ -372,10 +600,20 @@ class FeedController:
                 feed_name: 1.0 / len(self.allocated_feed_topics) for feed_name in self.allocated_feed_topics
             }
 
+    def _on_weights_action(self, weights: Dict[str, float]) -> None:
+        # the weights come from the controller topic, override it if they are not relative to this controller's feeds
+        self.update_allocation_weights(weights)
+
     def update_allocation_weights(self, weights: Dict[str, float]) -> None:
+        if self.allocation_tree is not None:
+            # weights of the feeds or groups are relative to their siblings, no re-normalization is needed
+            for name, weight in weights.items():
+                self.allocation_tree.set_weight(name, weight)
+            LOGGER.info(f"ACTION: updated allocation group weights: {weights}")
+            return
         if not self.allocated_feed_topics:
             return
-        if sum(weights.values()) > 1.0:
+        if sum(weights.values()) > 1.0 + 1e-9:
             LOGGER.error(f"ERROR: FeedController: sum of given weights is greater than 1, cannot update the weights")
             return
 
@@ -418,8 +656,11 @@ class FeedController:
             match action_name:
                 case "bitrate":
                     self.action_limits[action_name] = limit
+                    if self.allocation_tree is not None:
+                        self.allocation_tree.set_feed_limits(*limit)
                 case _:
                     pass  # add other cases if needed
+        self._update_passthroughs()
 
     def cleanup(self) -> None:
         self.is_running = False
@@ -0,0 +1,72 @@
+from typing import Any, Dict, Iterable, Set
+
+
+class FeedIndex:
+    """
+    Resolves the feed of an MQTT message. Publishers put their feed name into the 'source' field of the message,
+    which is resolved with one dict lookup. Messages of older or external publishers carry only the client id
+    (e.g., "feed_name_<token>"), they are resolved by the longest registered feed name the id starts with using
+    a prefix trie, so feeds with shared prefixes (e.g., "cam1" and "cam10") are not confused.
+
+    :param feed_names: Initial feed names
+    """
+
+    _END = ""
+
+    def __init__(self, feed_names: Iterable[str] = ()) -> None:
+        self.feeds: Set[str] = set()
+        self.trie: Dict[str, Any] = {}
+        for feed_name in feed_names:
+            self.add(feed_name)
+
+    def add(self, feed_name: str) -> None:
+        if feed_name in self.feeds:
+            return
+        self.feeds.add(feed_name)
+        node = self.trie
+        for char in feed_name:
+            node = node.setdefault(char, {})
+        node[self._END] = feed_name
+
+    def remove(self, feed_name: str) -> None:
+        if feed_name not in self.feeds:
+            return
+        self.feeds.remove(feed_name)
+        # unlink the terminal and prune the branches left empty
+        path = [self.trie]
+        for char in feed_name:
+            path.append(path[-1][char])
+        _ = path[-1].pop(self._END, None)
+        for i in range(len(feed_name) - 1, -1, -1):
+            if path[i + 1]:
+                break
+            del path[i][feed_name[i]]
+
+    def resolve(self, source: str | None, id: str | None = None) -> str | None:
+        """
+        Get the feed name of a message.
+
+        :param source: The 'source' field of the message. Nullable
+        :param id: The 'id' field of the message, used if the source is not a registered feed. Nullable
+        :return: Feed name or None if the message does not belong to any registered feed
+        """
+        if source and source in self.feeds:
+            return source
+        if not id:
+            return None
+        if id in self.feeds:
+            return id
+        feed_name = None
+        node = self.trie
+        for char in id:
+            node = node.get(char, None)
+            if node is None:
+                break
+            feed_name = node.get(self._END, feed_name)
+        return feed_name
+
+    def __contains__(self, feed_name: str) -> bool:
+        return feed_name in self.feeds
+
+    def __len__(self) -> int:
+        return len(self.feeds)
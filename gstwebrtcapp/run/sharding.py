@@ -0,0 +1,382 @@
+import asyncio
+import copy
+import json
+import multiprocessing
+import time
+import zlib
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from gstwebrtcapp.message.client import MqttConfig, MqttPair, MqttPublisher, MqttSubscriber
+from gstwebrtcapp.run.allocation import AllocationStrategy, water_fill
+from gstwebrtcapp.run.feed_controller import FeedController
+from gstwebrtcapp.utils.base import LOGGER
+
+
+def get_feed_shard(feed_name: str, num_shards: int) -> int:
+    # a stable hash: the built-in one is salted per process, so the shards and the connectors would disagree
+    return zlib.crc32(feed_name.encode("utf-8")) % max(1, num_shards)
+
+
+def get_shard_topic(topic: str, shard_id: int) -> str:
+    return f"{topic}/shard_{shard_id}"
+
+
+class FeedShard(FeedController):
+    """
+    FeedController that handles only the feeds hashed to its shard. The agents of its feeds publish to the
+    shard's own aggregation topic, the shared controller topic is filtered by the feed hash.
+
+    Each bitrate allocation round reports the shard's demand (the total bitrate it would allocate on its own,
+    e.g., the summed actions of the agents or the pooled uplink estimate) and the summed weight of its feeds to the
+    coordinator and waits for the budget of the same round. The budget is allocated instead of the demand. If the
+    coordinator does not reply within ``budget_timeout`` (e.g., it is down or another shard is late), the shard
+    allocates its own demand in this round.
+
+    The weights published over the controller topic are global, i.e., relative to the feeds of all shards. The shard
+    keeps them for its feeds and splits its budget between them by their weights relative to each other.
+
+    :param shard_id: Index of the shard
+    :param num_shards: Total number of shards
+    :param coordinator_topic: Topic to report the demands to, the budgets come from ``{coordinator_topic}/budgets``
+    :param default_weight: Global weight of a feed until the controller sets one, e.g., 1 / total number of feeds
+    :param budget_timeout: Max time in seconds to wait for the budget each round. Nullable (max_aggregation_time)
+    """
+
+    def __init__(
+        self,
+        shard_id: int,
+        num_shards: int,
+        coordinator_topic: str,
+        *args,
+        default_weight: float = 1.0,
+        budget_timeout: float | None = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.shard_id = shard_id
+        self.num_shards = num_shards
+        self.coordinator_topic = coordinator_topic
+        self.budget_topic = f"{coordinator_topic}/budgets"
+        self.mqtts.subscriber.subscribe([self.budget_topic])
+        self.feed_weights: Dict[str, float] = {}
+        self.default_weight = default_weight
+        self.budget_round = 0
+        self.budget_timeout = budget_timeout or self.max_aggregation_time
+
+    def _is_single_feed_passthrough(self) -> bool:
+        # even a single feed is bound by the budget of the shard
+        return False
+
+    def _is_own_feed(self, feed_name: str) -> bool:
+        return get_feed_shard(feed_name, self.num_shards) == self.shard_id
+
+    def _on_weights_action(self, weights: Dict[str, float]) -> None:
+        self.feed_weights.update({feed: float(w) for feed, w in weights.items() if self._is_own_feed(feed)})
+        weight_sum = self._get_weight_sum()
+        if weight_sum > 0.0:
+            # the controller keeps the weights of the allocated feeds summed to 1
+            self.update_allocation_weights(
+                {
+                    feed_name: self.feed_weights.get(feed_name, self.default_weight) / weight_sum
+                    for feed_name in self.allocated_feed_topics
+                }
+            )
+
+    def _get_weight_sum(self) -> float:
+        return sum(self.feed_weights.get(feed_name, self.default_weight) for feed_name in self.allocated_feed_topics)
+
+    async def _get_allocation_total(self, action_key: str, summed_action: float, weights_sum: float) -> float:
+        if action_key != "bitrate":
+            return summed_action
+        # the budgets of the previous rounds that came after their deadlines are outdated
+        self.mqtts.subscriber.clean_message_queue(self.budget_topic)
+        self.budget_round += 1
+        self.mqtts.publisher.publish(
+            self.coordinator_topic,
+            json.dumps(
+                {
+                    "shard": self.shard_id,
+                    "round": self.budget_round,
+                    "demand": summed_action,
+                    "feeds": len(self.allocated_feed_topics),
+                    "weight": self._get_weight_sum(),
+                }
+            ),
+        )
+
+        budget = await self._await_budget(self.budget_round)
+        if budget is None:
+            LOGGER.warning(
+                f"WARNING: FeedShard {self.shard_id}: no budget for round {self.budget_round} in"
+                f" {self.budget_timeout} sec, allocating the own demand..."
+            )
+            return summed_action
+        # the budget is granted for all feeds of the shard, the caller takes the part of the arrived ones
+        return budget
+
+    async def _await_budget(self, budget_round: int) -> float | None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.budget_timeout
+        while (time_wait := deadline - loop.time()) > 0.0:
+            mqtt_msg = await self.mqtts.subscriber.await_message(self.budget_topic, time_wait)
+            if mqtt_msg is None:
+                return None
+            try:
+                reply = json.loads(mqtt_msg.msg)
+                shard_id = str(self.shard_id)
+                if reply.get("rounds", {}).get(shard_id, None) == budget_round and shard_id in reply["budgets"]:
+                    return float(reply["budgets"][shard_id])
+            except (json.JSONDecodeError, AttributeError, KeyError, TypeError, ValueError) as e:
+                LOGGER.warning(f"WARNING: FeedShard {self.shard_id}: invalid budget message, reason: {e}")
+        return None
+
+
+class FeedShardCoordinator:
+    """
+    Divides the global bitrate budget between the shards. The shards report their demands, numbers of allocated
+    feeds and summed feed weights each allocation round, the coordinator splits the summed demand (optionally capped)
+    by water-filling proportionally to the weights within the per-shard limits and publishes the budgets of all
+    shards in one message as soon as every live shard has reported. The message also holds the round of each shard's
+    report so that a shard takes only the reply to its current report. It handles one small message per shard and
+    round, so it stays in the main process.
+
+    :param mqtt_config: MQTT config of the coordinator
+    :param coordinator_topic: Topic the shards report to
+    :param action_limits: Per-feed action limits, only the bitrate ones are used
+    :param max_total_bitrate: Global cap of the bitrate in kbps. Nullable (the sum of the demands)
+    :param max_report_age: A shard that has not reported for this time in seconds is not counted
+    """
+
+    def __init__(
+        self,
+        mqtt_config: MqttConfig,
+        coordinator_topic: str,
+        action_limits: Dict[str, Tuple[float, float]] | None = None,
+        max_total_bitrate: float | None = None,
+        max_report_age: float = 10.0,
+    ) -> None:
+        self.mqtt_config = mqtt_config
+        self.mqtts = MqttPair(
+            publisher=MqttPublisher(self.mqtt_config),
+            subscriber=MqttSubscriber(self.mqtt_config),
+        )
+        self.mqtts.publisher.start()
+        self.mqtts.subscriber.start()
+
+        self.coordinator_topic = coordinator_topic
+        self.budget_topic = f"{coordinator_topic}/budgets"
+        self.mqtts.subscriber.subscribe([self.coordinator_topic])
+
+        self.min_limit, self.max_limit = (action_limits or {}).get("bitrate", (0.0, float("inf")))
+        self.max_total_bitrate = max_total_bitrate
+        self.max_report_age = max_report_age
+
+        # shard id -> (demand, number of feeds, summed weight, round, report time)
+        self.reports: Dict[int, Tuple[float, int, float, int, float]] = {}
+        self.pending_shards = set()
+        self.is_running = False
+
+    async def coordinator_coro(self) -> None:
+        self.is_running = True
+        LOGGER.info(f"INFO: FeedShardCoordinator's coroutine is starting...")
+
+        while self.is_running:
+            try:
+                mqtt_msg = await self.mqtts.subscriber.await_message(self.coordinator_topic, self.max_report_age)
+                if mqtt_msg is None:
+                    continue
+                report = json.loads(mqtt_msg.msg)
+                shard_id = int(report["shard"])
+                self.reports[shard_id] = (
+                    float(report["demand"]),
+                    int(report["feeds"]),
+                    float(report["weight"]),
+                    int(report["round"]),
+                    time.monotonic(),
+                )
+                self.pending_shards.add(shard_id)
+
+                live_shards = self._get_live_shards()
+                if self.pending_shards.issuperset(live_shards):
+                    budgets = self.divide_budget(live_shards)
+                    rounds = {str(shard_id): self.reports[shard_id][3] for shard_id in live_shards}
+                    self.mqtts.publisher.publish(self.budget_topic, json.dumps({"budgets": budgets, "rounds": rounds}))
+                    self.pending_shards.clear()
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+                LOGGER.warning(f"WARNING: FeedShardCoordinator: invalid shard report, reason: {e}")
+            except Exception as e:
+                raise Exception(f"ERROR: FeedShardCoordinator's coro has thrown an exception: reason {e}")
+
+    def divide_budget(self, shards: List[int]) -> Dict[str, float]:
+        """
+        Split the summed demand of the shards between them.
+
+        :param shards: Ids of the shards to split the budget between
+        :return: Budgets in kbps by the shard ids (as strings to survive the JSON round trip)
+        """
+        shards = [shard_id for shard_id in shards if self.reports[shard_id][1] > 0]
+        if not shards:
+            return {}
+        demands = np.array([self.reports[shard_id][0] for shard_id in shards], dtype=np.float64)
+        num_feeds = np.array([self.reports[shard_id][1] for shard_id in shards], dtype=np.float64)
+        weights = np.array([self.reports[shard_id][2] for shard_id in shards], dtype=np.float64)
+        total = float(demands.sum())
+        if self.max_total_bitrate is not None:
+            total = min(total, self.max_total_bitrate)
+        budgets = water_fill(total, weights, num_feeds * self.min_limit, num_feeds * self.max_limit)
+        return {str(shard_id): budget for shard_id, budget in zip(shards, budgets.tolist())}
+
+    def _get_live_shards(self) -> List[int]:
+        now = time.monotonic()
+        return [shard_id for shard_id, (*_, t) in self.reports.items() if now - t <= self.max_report_age]
+
+    def cleanup(self) -> None:
+        self.is_running = False
+        self.mqtts.publisher.stop()
+        self.mqtts.subscriber.stop()
+
+
+class ShardedFeedController:
+    """
+    Partitions the feeds by a stable hash of their names into N FeedShard worker processes, each running its own
+    controller and allocation coroutines, and runs FeedShardCoordinator to divide the global bitrate budget between
+    the shards. The agents of a feed must publish to ``get_shard_topic(aggregation_topic, get_feed_shard(feed, N))``,
+    the controller topic stays shared. Hierarchical allocation groups are not supported.
+
+    :param num_shards: Number of shard processes
+    :param mqtt_config: MQTT config template, the shards and the coordinator get own ids
+    :param feed_topics: Action topics of all feeds
+    :param controller_topic: Shared controller topic
+    :param aggregation_topic: Base aggregation topic, each shard listens to its subtopic
+    :param action_limits: Per-feed action limits
+    :param max_aggregation_time: Max aggregation time of a shard's round in seconds
+    :param warmup: Warmup time of the shards in seconds
+    :param allocation_strategy: Allocation strategy of the shards
+    :param stats_topics: Stats topics of all feeds. Nullable
+    :param gcc_topics: GCC topics of all feeds. Nullable
+    :param is_pool_uplink: If True, each shard allocates against the pooled GCC estimate of its feeds
+    :param is_passthrough: If True, the agents of the INDEPENDENT feeds publish straight to their connectors
+    :param max_total_bitrate: Global cap of the bitrate in kbps. Nullable
+    """
+
+    def __init__(
+        self,
+        num_shards: int,
+        mqtt_config: MqttConfig,
+        feed_topics: Dict[str, str],
+        controller_topic: str | None = None,
+        aggregation_topic: str | None = None,
+        action_limits: Dict[str, Tuple[float, float]] = {},
+        max_aggregation_time: float = 5.0,
+        warmup: float = 0.0,
+        allocation_strategy: AllocationStrategy | str = AllocationStrategy.WEIGHTS,
+        stats_topics: Dict[str, str] | None = None,
+        gcc_topics: Dict[str, str] | None = None,
+        is_pool_uplink: bool = False,
+        is_passthrough: bool = True,
+        max_total_bitrate: float | None = None,
+    ) -> None:
+        if num_shards < 1:
+            raise ValueError(f"ERROR: ShardedFeedController: invalid number of shards {num_shards}")
+        self.num_shards = num_shards
+        self.controller_topic = controller_topic or mqtt_config.topics.controller
+        self.aggregation_topic = aggregation_topic or mqtt_config.topics.actions
+        self.coordinator_topic = f"{self.aggregation_topic}/coordinator"
+
+        stats_topics = stats_topics or {}
+        gcc_topics = gcc_topics or {}
+        self.shard_kwargs = []
+        for shard_id in range(num_shards):
+            shard_mqtt_config = copy.deepcopy(mqtt_config)
+            shard_mqtt_config.id = f"{mqtt_config.id}_shard_{shard_id}"
+            own_feeds = [feed for feed in feed_topics if get_feed_shard(feed, num_shards) == shard_id]
+            self.shard_kwargs.append(
+                {
+                    "shard_id": shard_id,
+                    "num_shards": num_shards,
+                    "coordinator_topic": self.coordinator_topic,
+                    "mqtt_config": shard_mqtt_config,
+                    "feed_topics": {feed: feed_topics[feed] for feed in own_feeds},
+                    "controller_topic": self.controller_topic,
+                    "aggregation_topic": get_shard_topic(self.aggregation_topic, shard_id),
+                    "action_limits": copy.deepcopy(action_limits),
+                    "max_aggregation_time": max_aggregation_time,
+                    "warmup": warmup,
+                    "allocation_strategy": AllocationStrategy(allocation_strategy).value,
+                    "stats_topics": {feed: stats_topics[feed] for feed in own_feeds if feed in stats_topics},
+                    "gcc_topics": {feed: gcc_topics[feed] for feed in own_feeds if feed in gcc_topics},
+                    "is_pool_uplink": is_pool_uplink,
+                    "is_passthrough": is_passthrough,
+                    "default_weight": 1.0 / max(1, len(feed_topics)),
+                }
+            )
+
+        coordinator_mqtt_config = copy.deepcopy(mqtt_config)
+        coordinator_mqtt_config.id = f"{mqtt_config.id}_coordinator"
+        self.coordinator = FeedShardCoordinator(
+            mqtt_config=coordinator_mqtt_config,
+            coordinator_topic=self.coordinator_topic,
+            action_limits=action_limits,
+            max_total_bitrate=max_total_bitrate,
+            max_report_age=2 * max_aggregation_time,
+        )
+        self.processes: List[multiprocessing.Process] = []
+
+    def start(self) -> None:
+        if self.processes:
+            return
+        # spawn: the MQTT clients' threads and the event loops must not be inherited
+        ctx = multiprocessing.get_context("spawn")
+        for kwargs in self.shard_kwargs:
+            process = ctx.Process(
+                target=run_feed_shard,
+                args=(kwargs,),
+                name=f"feed_shard_{kwargs['shard_id']}",
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+            LOGGER.info(
+                f"OK: ShardedFeedController: shard {kwargs['shard_id']} with {len(kwargs['feed_topics'])} feeds"
+                f" is started in process {process.pid}"
+            )
+
+    async def coordinator_coro(self) -> None:
+        self.start()
+        await self.coordinator.coordinator_coro()
+
+    def cleanup(self) -> None:
+        self.coordinator.cleanup()
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+            process.join(timeout=5.0)
+        self.processes.clear()
+
+
+def run_feed_shard(kwargs: Dict[str, Any]) -> None:
+    """
+    Run one FeedShard. It is a module-level function to be picklable for the spawned process.
+
+    :param kwargs: FeedShard parameters made by ShardedFeedController
+    """
+    try:
+        import uvloop
+
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+
+    async def _run() -> None:
+        shard = FeedShard(**kwargs)
+        try:
+            await asyncio.gather(shard.controller_coro(), shard.allocation_coro())
+        finally:
+            shard.cleanup()
+
+    try:
+        asyncio.run(_run())
+    except KeyboardInterrupt:
+        pass
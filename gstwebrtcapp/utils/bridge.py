@@ -0,0 +1,154 @@
+import asyncio
+import collections
+import threading
+import time
+from typing import Any, Dict
+
+_EMPTY = object()
+
+
+class SignalBridge:
+    """
+    Hands payloads of signals emitted in foreign threads (e.g., GStreamer streaming threads) over to the asyncio loop
+    that consumes them. ``emit`` is thread-safe and never blocks the emitting thread: the payloads are buffered
+    under a lock and the loop is woken up with ``call_soon_threadsafe`` once per batch, not once per payload.
+
+    The buffer is bounded, the oldest payloads are dropped when it is full. With a positive conflation interval only
+    the latest payload of each interval is delivered (e.g., the latest bandwidth estimate every 100 ms), so the
+    consumer is not flooded by the signals that fire on every change. The drops, the conflations and the rates are
+    counted and could be reported with ``get_stats``.
+
+    The bridge binds to the loop of the first ``get`` call, the payloads emitted before are kept.
+
+    :param name: Name of the bridge for the stats
+    :param maxsize: Max number of buffered payloads
+    :param conflate_interval: Interval in seconds to deliver only the latest payload within. Non-positive disables it
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int = 100,
+        conflate_interval: float = 0.0,
+    ) -> None:
+        self.name = name
+        self.maxsize = max(1, maxsize)
+        self.conflate_interval = conflate_interval
+
+        self.lock = threading.Lock()
+        self.buffer = collections.deque()
+        self.latest = _EMPTY
+        self.is_flush_pending = False
+        self.loop = None
+        self.event = None
+
+        self.counters = {"emitted": 0, "delivered": 0, "dropped": 0, "conflated": 0, "wakeups": 0}
+        self.start_time = time.monotonic()
+
+    def emit(self, payload: Any) -> None:
+        """
+        Hand the payload over to the consumer. Safe to call from any thread.
+
+        :param payload: Signal payload
+        """
+        with self.lock:
+            self.counters["emitted"] += 1
+            if self.conflate_interval > 0.0:
+                if self.latest is not _EMPTY:
+                    self.counters["conflated"] += 1
+                self.latest = payload
+            else:
+                self._push(payload)
+            if self.is_flush_pending or self.loop is None:
+                return
+            self.is_flush_pending = True
+            loop = self.loop
+        self._wakeup(loop)
+
+    async def get(self) -> Any:
+        """
+        Wait for the next payload. It has the same semantics as ``asyncio.Queue.get``.
+
+        :return: The oldest buffered payload
+        """
+        self._bind()
+        while True:
+            with self.lock:
+                if self.buffer:
+                    self.counters["delivered"] += 1
+                    return self.buffer.popleft()
+                self.event.clear()
+            await self.event.wait()
+
+    def empty(self) -> bool:
+        with self.lock:
+            return not self.buffer
+
+    def qsize(self) -> int:
+        with self.lock:
+            return len(self.buffer)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the counters of the bridge.
+
+        :return: The counters, the emit and delivery rates per second since the start and the buffer size
+        """
+        with self.lock:
+            counters = dict(self.counters)
+            size = len(self.buffer)
+        elapsed = max(1e-9, time.monotonic() - self.start_time)
+        return {
+            "name": self.name,
+            **counters,
+            "emit_rate": round(counters["emitted"] / elapsed, 3),
+            "delivery_rate": round(counters["delivered"] / elapsed, 3),
+            "size": size,
+        }
+
+    def _push(self, payload: Any) -> None:
+        # under the lock
+        if len(self.buffer) >= self.maxsize:
+            _ = self.buffer.popleft()
+            self.counters["dropped"] += 1
+        self.buffer.append(payload)
+
+    def _bind(self) -> None:
+        loop = asyncio.get_running_loop()
+        if loop is self.loop:
+            return
+        with self.lock:
+            self.loop = loop
+            self.event = asyncio.Event()
+            # deliver what has been emitted before the binding
+            is_pending = self.latest is not _EMPTY
+            self.is_flush_pending = is_pending
+        if is_pending:
+            self._wakeup(loop)
+
+    def _wakeup(self, loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            loop.call_soon_threadsafe(self._on_emitted)
+        except RuntimeError:
+            # the loop is closed, the payloads stay buffered for the next binding
+            with self.lock:
+                self.is_flush_pending = False
+
+    def _on_emitted(self) -> None:
+        # in the loop's thread
+        with self.lock:
+            self.counters["wakeups"] += 1
+        if self.conflate_interval > 0.0:
+            self.loop.call_later(self.conflate_interval, self._flush)
+        else:
+            self._flush()
+
+    def _flush(self) -> None:
+        # in the loop's thread
+        with self.lock:
+            self.is_flush_pending = False
+            if self.latest is not _EMPTY:
+                self._push(self.latest)
+                self.latest = _EMPTY
+        if self.event is not None:
+            self.event.set()
@@ -0,0 +1,166 @@
+import asyncio
+import collections
+import json
+import threading
+import zlib
+from typing import Any, Dict
+import gi
+
+gi.require_version('Gst', '1.0')
+gi.require_version('GstWebRTC', '1.0')
+from gi.repository import GLib
+from gi.repository import GstWebRTC
+
+
+class DataChannelSender:
+    """
+    Sends the messages over a webrtcbin data channel without letting them queue up without bound in SCTP, e.g., the
+    telemetry relayed to the UI that competes with the video on a constrained uplink.
+
+    The messages are collected for a batch interval and sent as one ``{"batch": [...]}`` message. The channel's
+    ``buffered-amount`` is checked before each send: above the high watermark the channel is congested and nothing is
+    sent until the buffered amount drains below the low watermark. Meanwhile, the low-priority messages (telemetry) are
+    decimated to the latest one, the other messages are kept. The pending messages are bounded, the oldest low-priority
+    ones are dropped first when the bound is reached. The drops, the decimations and the volume are counted and could be
+    reported with ``get_stats``.
+
+    The sender binds to the loop of the first ``send`` call, all calls are expected from that loop.
+
+    :param data_channel: webrtcbin data channel
+    :param name: Name of the data channel for the stats
+    :param batch_interval: Interval in seconds to batch the messages within. Non-positive sends each message on its own
+    :param low_watermark: Buffered amount in bytes to resume sending at after the congestion
+    :param high_watermark: Buffered amount in bytes to stop sending at
+    :param max_pending: Max number of the pending messages
+    :param is_binary: If True, the messages are sent as binary zlib-compressed JSON instead of strings
+    """
+
+    def __init__(
+        self,
+        data_channel: GstWebRTC.WebRTCDataChannel,
+        name: str,
+        batch_interval: float = 0.0,
+        low_watermark: int = 64 * 1024,
+        high_watermark: int = 1024 * 1024,
+        max_pending: int = 256,
+        is_binary: bool = False,
+    ) -> None:
+        self.data_channel = data_channel
+        self.name = name
+        self.batch_interval = batch_interval
+        self.low_watermark = low_watermark
+        self.high_watermark = max(low_watermark, high_watermark)
+        self.max_pending = max(1, max_pending)
+        self.is_binary = is_binary
+
+        # (is_low_priority, message)
+        self.pending = collections.deque()
+        self.is_congested = False
+        self.loop = None
+        self.timer = None
+        self.lock = threading.Lock()
+        self.counters = {"queued": 0, "sent": 0, "batches": 0, "bytes": 0, "dropped": 0, "decimated": 0, "congested": 0}
+
+        self.data_channel.set_property("buffered-amount-low-threshold", self.low_watermark)
+        self.data_channel.connect("on-buffered-amount-low", self._on_buffered_amount_low)
+
+    def send(self, message: Dict[str, Any], is_low_priority: bool = False) -> None:
+        """
+        Queue the message to be sent with the next batch.
+
+        :param message: JSON-serializable message
+        :param is_low_priority: If True, the message could be decimated or dropped under congestion
+        """
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+        with self.lock:
+            self.counters["queued"] += 1
+        if is_low_priority and self.is_congested:
+            # only the latest telemetry is worth sending once the channel has drained
+            n_pending = len(self.pending)
+            self.pending = collections.deque(m for m in self.pending if not m[0])
+            with self.lock:
+                self.counters["decimated"] += n_pending - len(self.pending)
+        if len(self.pending) >= self.max_pending:
+            self._drop_oldest()
+        self.pending.append((is_low_priority, message))
+
+        if self.batch_interval <= 0.0:
+            self.flush()
+        elif self.timer is None:
+            self.timer = self.loop.call_later(self.batch_interval, self._on_timer)
+
+    def flush(self) -> None:
+        """
+        Send the pending messages unless the channel is congested.
+        """
+        if not self.pending:
+            return
+        buffered_amount = self.data_channel.get_property("buffered-amount")
+        if not self.is_congested and buffered_amount >= self.high_watermark:
+            self.is_congested = True
+            with self.lock:
+                self.counters["congested"] += 1
+        elif self.is_congested and buffered_amount <= self.low_watermark:
+            self.is_congested = False
+        if self.is_congested:
+            if self.timer is None:
+                # the low threshold signal resumes the sending, the timer is a fallback if it does not come
+                self.timer = self.loop.call_later(max(self.batch_interval, 0.1), self._on_timer)
+            return
+
+        messages = [m for _, m in self.pending]
+        self.pending.clear()
+        if self.batch_interval > 0.0 and len(messages) > 1:
+            self._send({"batch": messages})
+        else:
+            for message in messages:
+                self._send(message)
+        with self.lock:
+            self.counters["sent"] += len(messages)
+
+    def close(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.pending.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the counters of the sender.
+
+        :return: The counters, the number of pending messages and the congestion flag
+        """
+        with self.lock:
+            counters = dict(self.counters)
+        return {"name": self.name, **counters, "pending": len(self.pending), "is_congested": self.is_congested}
+
+    def _send(self, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload, separators=(",", ":")).encode()
+        if self.is_binary:
+            data = zlib.compress(data)
+            self.data_channel.emit("send-data", GLib.Bytes.new(data))
+        else:
+            self.data_channel.emit("send-string", data.decode())
+        with self.lock:
+            self.counters["batches"] += 1
+            self.counters["bytes"] += len(data)
+
+    def _drop_oldest(self) -> None:
+        index = next((i for i, m in enumerate(self.pending) if m[0]), 0)
+        del self.pending[index]
+        with self.lock:
+            self.counters["dropped"] += 1
+
+    def _on_timer(self) -> None:
+        # in the loop's thread
+        self.timer = None
+        self.flush()
+
+    def _on_buffered_amount_low(self, _) -> None:
+        # in a GStreamer thread
+        if self.loop is not None and self.is_congested:
+            try:
+                self.loop.call_soon_threadsafe(self.flush)
+            except RuntimeError:
+                pass
@@ -1,6 +1,7 @@
+import asyncio
 from enum import Enum
 import re
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List
 import gi
 
 gi.require_version('Gst', '1.0')
@@ -8,6 +9,8 @@ gi.require_version('GstWebRTC', '1.0')
 from gi.repository import Gst
 from gi.repository import GstWebRTC
 
+from gstwebrtcapp.utils.base import GSTWEBRTCAPP_EXCEPTION
+
 
 # encoder
 CODECS = ["h264", "h265", "vp8", "vp9", "av1"]
@@ -158,6 +161,49 @@ def is_same_rtcp(rtp_inbound: Dict[str, Any], last_rtp_inbound: Dict[str, Any] |
         )
 
 
+# promises
+async def await_promise(emit: Callable[[Gst.Promise], Any], timeout: float | None = None) -> Gst.Structure | None:
+    """
+    Await a Gst.Promise in the running asyncio loop instead of blocking on it or handling its reply in a GStreamer
+    thread. The promise is created and passed to ``emit``, e.g., ``lambda promise: webrtcbin.emit('get-stats', None,
+    promise)``. The GStreamer thread that replies only hands the promise over to the loop, the reply is read there.
+    The promise is interrupted if the awaiting is cancelled or timed out.
+
+    :param emit: Function that passes the promise to the element
+    :param timeout: Timeout in seconds, None to wait forever
+    :return: Reply of the promise, could be None (e.g., for set-*-description)
+    :raises asyncio.TimeoutError: If the promise is not replied in time
+    :raises GSTWEBRTCAPP_EXCEPTION: If the promise is interrupted or expired instead of replied
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def _set_result(promise: Gst.Promise) -> None:
+        # in the loop's thread
+        if not future.done():
+            future.set_result(promise)
+
+    def _on_changed(promise: Gst.Promise, *_) -> None:
+        # in a GStreamer thread
+        try:
+            loop.call_soon_threadsafe(_set_result, promise)
+        except RuntimeError:
+            # the loop is closed, nobody awaits the reply
+            pass
+
+    promise = Gst.Promise.new_with_change_func(_on_changed, None, None)
+    emit(promise)
+    try:
+        _ = await asyncio.wait_for(future, timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        promise.interrupt()
+        raise
+    result = promise.wait()
+    if result != Gst.PromiseResult.REPLIED:
+        raise GSTWEBRTCAPP_EXCEPTION(f"promise is not replied, result: {result}")
+    return promise.get_reply()
+
+
 # dump as dot file
 def dump_to_dot(
     # NOTE: run with GST_DEBUG_DUMP_DOT_DIR=. // convert to png as dot -Tpng filename.dot > filename.png
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from gstwebrtcapp.run import allocation
+from gstwebrtcapp.run.allocation import AllocationTree, UtilityAllocator, water_fill
+
+
+def test_water_fill_sums_to_total():
+    rng = np.random.default_rng(0)
+    for _ in range(20000):
+        n = int(rng.integers(1, 12))
+        weights = rng.uniform(0.0, 1.0, n)
+        weights[rng.uniform(size=n) < 0.3] = 0.0
+        min_limits = rng.uniform(0.0, 100.0, n)
+        max_limits = min_limits + rng.uniform(0.0, 200.0, n)
+        total = rng.uniform(0.8 * min_limits.sum(), 1.1 * max_limits.sum())
+
+        shares = water_fill(total, weights, min_limits, max_limits)
+
+        assert shares.sum() == pytest.approx(np.clip(total, min_limits.sum(), max_limits.sum()))
+        assert np.all(shares >= min_limits - 1e-9)
+        assert np.all(shares <= max_limits + 1e-9)
+
+
+def test_water_fill_zero_weights_absorb_remainder():
+    shares = water_fill(1000.0, np.array([1.0, 0.0, 0.0]), 100.0, 500.0)
+    np.testing.assert_allclose(shares, [500.0, 250.0, 250.0])
+
+
+def test_water_fill_zero_weights_keep_min_limits():
+    shares = water_fill(600.0, np.array([1.0, 0.0]), 100.0, 1000.0)
+    np.testing.assert_allclose(shares, [500.0, 100.0])
+
+
+def test_utility_allocator_restarts_counters_on_ssrc_change():
+    allocator = UtilityAllocator(alpha=1.0)
+    allocator.update_stats("feed", 1, 0.0, 0.0)
+    allocator.update_stats("feed", 1, 1000.0, 125000.0, loss=0.5)
+    assert allocator.feeds["feed"].tx_kbps == pytest.approx(1000.0)
+    assert allocator.feeds["feed"].loss == pytest.approx(0.5)
+
+    allocator.update_stats("feed", 2, 2000.0, 1000.0)
+    assert allocator.feeds["feed"].tx_kbps == pytest.approx(1000.0)
+
+
+def _make_groups(weights):
+    return {
+        "site": {
+            "children": {
+                "uplink_1": {"budget": 3000.0, "children": {"feed1": {"weight": weights[0]}, "feed2": {}}},
+                "uplink_2": {"min_budget": 1500.0, "children": {"feed3": {"weight": weights[1]}, "feed4": {}}},
+            }
+        },
+        "feed5": {},
+    }
+
+
+def test_allocation_tree_reuses_only_unchanged_subtrees():
+    rng = np.random.default_rng(0)
+    weights = [1.0, 1.0]
+    active = {f"feed{i}": True for i in range(1, 6)}
+    tree = AllocationTree.from_dict(_make_groups(weights), 100.0, 2500.0)
+    for feed_name in active:
+        tree.activate(feed_name)
+    for _ in range(500):
+        op = rng.integers(0, 4)
+        if op == 0:
+            feed_name = f"feed{rng.integers(1, 6)}"
+            active[feed_name] = not active[feed_name]
+            tree.activate(feed_name) if active[feed_name] else tree.deactivate(feed_name)
+        elif op == 1:
+            i = int(rng.integers(0, 2))
+            weights[i] = float(rng.uniform(0.1, 3.0))
+            tree.set_weight(["feed1", "feed3"][i], weights[i])
+        total = float(rng.choice([4000.0, 6000.0, rng.uniform(0.0, 15000.0)]))
+
+        fresh = AllocationTree.from_dict(_make_groups(weights), 100.0, 2500.0)
+        for feed_name, is_active in active.items():
+            if is_active:
+                fresh.activate(feed_name)
+        shares = tree.allocate(total)
+        expected = fresh.allocate(total)
+        assert shares.keys() == expected.keys()
+        for feed_name, share in expected.items():
+            assert shares[feed_name] == pytest.approx(share)
+
+
+def test_allocation_tree_skips_clamped_groups(monkeypatch):
+    tree = AllocationTree.from_dict(_make_groups([1.0, 1.0]), 100.0, 2500.0)
+    for i in range(1, 6):
+        tree.activate(f"feed{i}")
+    _ = tree.allocate(10000.0)
+
+    calls = []
+
+    def _water_fill(total, *args):
+        calls.append(total)
+        return water_fill(total, *args)
+
+    monkeypatch.setattr(allocation, "water_fill", _water_fill)
+    # uplink_1 stays clamped to its budget, only the root, the site and uplink_2 are recomputed
+    shares = tree.allocate(11000.0)
+    assert len(calls) == 3
+    assert shares["feed1"] + shares["feed2"] == pytest.approx(3000.0)
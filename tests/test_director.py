@@ -0,0 +1,174 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from gstwebrtcapp.apps.ahoyapp.director import DirectorClient
+from gstwebrtcapp.utils.base import GSTWEBRTCAPP_EXCEPTION
+
+
+class StubDirector:
+    """
+    A local Director stub that answers the feed registrations with a fake SDP answer. It records the requests, the
+    client connections and the max number of the concurrent requests.
+    """
+
+    def __init__(self, delay: float = 0.0, fail_first: int = 0, fail_status: int = 503) -> None:
+        self.delay = delay
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.requests = []
+        self.connections = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/feeds/"
+
+    def __enter__(self) -> "StubDirector":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _make_handler(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep-alive, so that the pooled connections are reused
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["content-length"])))
+                with stub.lock:
+                    stub.requests.append((self.path, self.headers["x-api-key"], body))
+                    stub.connections.add(self.client_address)
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    is_failed = len(stub.requests) <= stub.fail_first
+                time.sleep(stub.delay)
+                with stub.lock:
+                    stub.in_flight -= 1
+                if is_failed:
+                    self._reply(stub.fail_status, {"error": "unavailable"})
+                else:
+                    self._reply(200, {"sdp": "v=0\r\n", "candidates": []})
+
+            def _reply(self, status: int, payload: dict) -> None:
+                data = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("content-type", "application/json")
+                    self.send_header("content-length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except OSError:
+                    # the client has given up waiting
+                    pass
+
+            def log_message(self, *_) -> None:
+                pass
+
+        return Handler
+
+
+def _register(client: DirectorClient, feed_names: list) -> list:
+    async def _run():
+        return await asyncio.gather(*[client.register_feed(f, "key", {"sdp": f}) for f in feed_names])
+
+    return asyncio.run(_run())
+
+
+def test_register_feeds_concurrently():
+    with StubDirector(delay=0.3) as director:
+        client = DirectorClient(director.url, max_connections=8)
+        start = time.monotonic()
+        responses = _register(client, [f"feed_{i}" for i in range(8)])
+        elapsed = time.monotonic() - start
+        client.close()
+
+    assert all(response["sdp"] == "v=0\r\n" for response in responses)
+    assert sorted(path for path, _, _ in director.requests) == sorted(f"/feeds/feed_{i}" for i in range(8))
+    assert director.max_in_flight > 1
+    # one by one, the registrations would take 8 * 0.3 sec
+    assert elapsed < 1.5
+
+
+def test_register_feeds_reuses_pooled_connection():
+    with StubDirector() as director:
+        client = DirectorClient(director.url)
+        for i in range(5):
+            _register(client, [f"feed_{i}"])
+        client.close()
+
+    assert len(director.requests) == 5
+    assert len(director.connections) == 1
+
+
+def test_register_feed_retries_on_5xx():
+    with StubDirector(fail_first=2) as director:
+        client = DirectorClient(director.url, max_retries=3, backoff=0.01)
+        response = _register(client, ["feed"])[0]
+        client.close()
+
+    assert response["sdp"] == "v=0\r\n"
+    assert len(director.requests) == 3
+
+
+def test_register_feed_gives_up_after_max_retries():
+    with StubDirector(fail_first=10) as director:
+        client = DirectorClient(director.url, max_retries=2, backoff=0.01)
+        with pytest.raises(GSTWEBRTCAPP_EXCEPTION):
+            _register(client, ["feed"])
+        client.close()
+
+    assert len(director.requests) == 3
+
+
+def test_register_feed_does_not_retry_4xx():
+    with StubDirector(fail_first=1, fail_status=401) as director:
+        client = DirectorClient(director.url, max_retries=3, backoff=0.01)
+        with pytest.raises(GSTWEBRTCAPP_EXCEPTION):
+            _register(client, ["feed"])
+        client.close()
+
+    assert len(director.requests) == 1
+
+
+def test_register_feed_does_not_resend_post_on_read_timeout():
+    with StubDirector(delay=0.5) as director:
+        client = DirectorClient(director.url, timeout=0.1, max_retries=3, backoff=0.01)
+        with pytest.raises(GSTWEBRTCAPP_EXCEPTION):
+            _register(client, ["feed"])
+        client.close()
+        # let the stub finish the request it has been sleeping on
+        time.sleep(0.5)
+
+    assert len(director.requests) == 1
+
+
+def test_register_feed_retries_on_connect_error():
+    # a port nobody listens on
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    client = DirectorClient(f"http://127.0.0.1:{port}/feeds/", max_retries=2, backoff=0.01)
+    attempts = []
+    post = client.session.post
+    client.session.post = lambda *args, **kwargs: attempts.append(1) or post(*args, **kwargs)
+    with pytest.raises(GSTWEBRTCAPP_EXCEPTION):
+        _register(client, ["feed"])
+    client.close()
+
+    assert len(attempts) == 3
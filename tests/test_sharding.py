@@ -0,0 +1,90 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from gstwebrtcapp.run.sharding import FeedShard, FeedShardCoordinator
+
+
+class FakePublisher:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, msg):
+        self.published.append((topic, json.loads(msg)))
+
+
+class FakeSubscriber:
+    def __init__(self, replies):
+        self.replies = [SimpleNamespace(msg=json.dumps(reply)) for reply in replies]
+
+    def clean_message_queue(self, topic):
+        pass
+
+    async def await_message(self, topic, timeout=None):
+        if not self.replies:
+            await asyncio.sleep(timeout)
+            return None
+        return self.replies.pop(0)
+
+
+def _make_shard(replies, budget_timeout=0.05):
+    # the shard without its MQTT clients and the FeedController state it does not need for a budget round
+    shard = FeedShard.__new__(FeedShard)
+    shard.shard_id = 1
+    shard.coordinator_topic = "coordinator"
+    shard.budget_topic = "coordinator/budgets"
+    shard.mqtts = SimpleNamespace(publisher=FakePublisher(), subscriber=FakeSubscriber(replies))
+    shard.allocated_feed_topics = {"feed1": "feed1/actions", "feed2": "feed2/actions"}
+    shard.feed_weights = {"feed1": 0.5}
+    shard.default_weight = 0.25
+    shard.budget_round = 0
+    shard.budget_timeout = budget_timeout
+    return shard
+
+
+def _make_coordinator(reports, max_total_bitrate=None):
+    coordinator = FeedShardCoordinator.__new__(FeedShardCoordinator)
+    coordinator.min_limit, coordinator.max_limit = 400.0, 10000.0
+    coordinator.max_total_bitrate = max_total_bitrate
+    coordinator.reports = {
+        shard_id: (demand, feeds, weight, 1, 0.0) for shard_id, (demand, feeds, weight) in reports.items()
+    }
+    return coordinator
+
+
+def test_coordinator_splits_by_weights():
+    coordinator = _make_coordinator({0: (2000.0, 2, 0.75), 1: (2000.0, 2, 0.25)})
+    budgets = coordinator.divide_budget([0, 1])
+    assert budgets["0"] == pytest.approx(3000.0)
+    assert budgets["1"] == pytest.approx(1000.0)
+
+
+def test_coordinator_caps_total_bitrate():
+    coordinator = _make_coordinator({0: (2000.0, 2, 0.75), 1: (2000.0, 2, 0.25)}, max_total_bitrate=2000.0)
+    budgets = coordinator.divide_budget([0, 1])
+    # the min limits of the second shard (2 x 400) hold
+    assert budgets["0"] == pytest.approx(1200.0)
+    assert budgets["1"] == pytest.approx(800.0)
+
+
+def test_shard_waits_for_budget_of_its_round():
+    shard = _make_shard(
+        [
+            {"budgets": {"1": 500.0}, "rounds": {"1": 0}},
+            {"budgets": {"0": 3000.0}, "rounds": {"0": 1}},
+            {"budgets": {"0": 2500.0, "1": 1500.0}, "rounds": {"0": 1, "1": 1}},
+        ]
+    )
+    total = asyncio.run(shard._get_allocation_total("bitrate", 4000.0, 1.0))
+    assert total == 1500.0
+    topic, report = shard.mqtts.publisher.published[0]
+    assert topic == "coordinator"
+    assert report == {"shard": 1, "round": 1, "demand": 4000.0, "feeds": 2, "weight": 0.75}
+
+
+def test_shard_allocates_own_demand_without_budget():
+    shard = _make_shard([{"budgets": {"1": 500.0}, "rounds": {"1": 0}}])
+    assert asyncio.run(shard._get_allocation_total("bitrate", 4000.0, 1.0)) == 4000.0
+    assert asyncio.run(shard._get_allocation_total("framerate", 30.0, 1.0)) == 30.0
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from gstwebrtcapp.apps.ahoyapp.signalling import DirectorSignallingMux
+from gstwebrtcapp.utils.base import GSTWEBRTCAPP_EXCEPTION
+
+
+class FakeChannel:
+    """
+    An open signalling channel that records the sent messages and lets the test answer them as the Director.
+    """
+
+    def __init__(self, mux: DirectorSignallingMux, reply=None) -> None:
+        self.mux = mux
+        self.reply = reply
+        self.readyState = "open"
+        self.sent = []
+
+    def send(self, data: str) -> None:
+        self.sent.append(json.loads(data))
+        if self.reply is not None:
+            response = self.reply(json.loads(data)["message"]["payload"])
+            if response is not None:
+                self.mux.loop.call_soon(self.mux._route, response)
+
+
+class FakeConnector:
+    def __init__(self, feed_name: str) -> None:
+        self.feed_name = feed_name
+        self.app_config = SimpleNamespace(codec="h264")
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.messages = []
+        self.states = []
+
+    def _handle_signalling_message(self, msg: dict) -> None:
+        self.messages.append(msg)
+
+    def _on_pc_out_state_change(self, state: str) -> None:
+        self.states.append(state)
+
+    def flush(self) -> None:
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), self.loop).result(timeout=5.0)
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5.0)
+
+
+def accept_registration(payload: dict) -> dict | None:
+    request = payload.get("feedRegistrationRequest", None)
+    if request is None:
+        return None
+    return {"feedRegistrationResponse": {"uuid": request["uuid"], "feedUuid": request["feedUuid"], "success": True}}
+
+
+@pytest.fixture
+def mux():
+    mux = DirectorSignallingMux("http://127.0.0.1:1/", "key", ice_servers=[], registration_timeout=0.5)
+
+    async def connected() -> None:
+        # pretend the shared connection has been established by the first feed
+        mux._connect_task = asyncio.get_running_loop().create_future()
+        mux._connect_task.set_result(None)
+
+    asyncio.run_coroutine_threadsafe(connected(), mux.loop).result(timeout=5.0)
+    yield mux
+    mux.close()
+
+
+def run_in_mux(mux: DirectorSignallingMux, coro) -> None:
+    asyncio.run_coroutine_threadsafe(coro, mux.loop).result(timeout=5.0)
+
+
+def test_registers_next_feeds_over_the_channel(mux):
+    mux.signalling_channel = FakeChannel(mux, reply=accept_registration)
+    connector = FakeConnector("feed_1")
+    try:
+        run_in_mux(mux, mux._attach(connector))
+        request = mux.signalling_channel.sent[0]["message"]["payload"]["feedRegistrationRequest"]
+        assert request["feedUuid"] == "feed_1"
+        assert request["capabilities"] == {"video": {"codecs": ["H264"]}}
+        assert "feed_1" in mux.registered_feeds
+        assert mux.get_stats()["feeds"] == 1
+    finally:
+        connector.stop()
+
+
+@pytest.mark.parametrize("is_answered", [False, True])
+def test_unanswered_or_rejected_registration_fails_the_attach(mux, is_answered):
+    def respond(payload: dict) -> dict | None:
+        if not is_answered:
+            return None
+        response = accept_registration(payload)
+        response["feedRegistrationResponse"]["success"] = False
+        return response
+
+    mux.signalling_channel = FakeChannel(mux, reply=respond)
+    connector = FakeConnector("feed_1")
+    try:
+        with pytest.raises(GSTWEBRTCAPP_EXCEPTION):
+            run_in_mux(mux, mux._attach(connector))
+        assert mux.get_stats()["feeds"] == 0
+        assert "feed_1" not in mux.registered_feeds
+    finally:
+        connector.stop()
+
+
+def test_routes_by_feed_uuid_only(mux):
+    mux.signalling_channel = FakeChannel(mux, reply=accept_registration)
+    connectors = [FakeConnector("feed_1"), FakeConnector("feed_2")]
+    try:
+        for connector in connectors:
+            run_in_mux(mux, mux._attach(connector))
+        messages = [
+            {"sdpRequest": {"uuid": "1", "feedUuid": "feed_2"}},
+            {"sdpRequest": {"uuid": "2", "feedUuid": "feed_1"}},
+            # no feedUuid and an unknown one: never guessed
+            {"sdpRequest": {"uuid": "3"}},
+            {"sdpRequest": {"uuid": "4", "feedUuid": "feed_3"}},
+        ]
+
+        async def route() -> None:
+            for msg in messages:
+                mux._route(msg)
+
+        run_in_mux(mux, route())
+        for connector in connectors:
+            connector.flush()
+        assert connectors[0].messages == [messages[1]]
+        assert connectors[1].messages == [messages[0]]
+        stats = mux.get_stats()
+        assert (stats["routed"], stats["unrouted"]) == (2, 2)
+    finally:
+        for connector in connectors:
+            connector.stop()
+
+
+def test_tags_outgoing_messages_with_feed_uuid(mux):
+    mux.signalling_channel = FakeChannel(mux)
+    mux.send("feed_1", {"sdpResponse": {"uuid": "1", "sdp": "v=0"}})
+    mux.send("feed_1", {"streamStartResponse": {"uuid": "2", "feedUuid": "feed_1"}})
+    run_in_mux(mux, asyncio.sleep(0))
+    payloads = [msg["message"]["payload"] for msg in mux.signalling_channel.sent]
+    assert payloads == [
+        {"sdpResponse": {"uuid": "1", "sdp": "v=0", "feedUuid": "feed_1"}},
+        {"streamStartResponse": {"uuid": "2", "feedUuid": "feed_1"}},
+    ]
+    assert all(msg["message"]["to"] == "director.api_key" for msg in mux.signalling_channel.sent)
@@ -0,0 +1,101 @@
+"""
+Compares the former iterative clamp-and-redistribute allocation of FeedController with the vectorised
+water-filling (gstwebrtcapp.run.allocation.water_fill) for a growing number of feeds.
+
+Usage: python allocation.py -f 2 10 100 1000 5000 -r 20
+"""
+
+import argparse
+import time
+from typing import Dict
+
+import numpy as np
+
+from gstwebrtcapp.run.allocation import water_fill
+
+
+def legacy_allocate(
+    total: float,
+    weights: Dict[str, float],
+    min_limit: float,
+    max_limit: float,
+    max_rounds: int,
+) -> Dict[str, float] | None:
+    # the former FeedController._allocate_actions loop for one action key, capped by max_rounds (None if not converged)
+    feeds = list(weights.keys())
+    allocated = {feed: total * weights[feed] for feed in feeds}
+    for _ in range(max_rounds):
+        adjustment_value = 0.0
+        max_feeds = []
+        min_feeds = []
+        for feed in feeds:
+            if allocated[feed] > max_limit:
+                adjustment_value += allocated[feed] - max_limit
+                allocated[feed] = max_limit
+                max_feeds.append(feed)
+            elif allocated[feed] < min_limit:
+                adjustment_value -= min_limit - allocated[feed]
+                allocated[feed] = min_limit
+                min_feeds.append(feed)
+        if adjustment_value == 0.0:
+            return allocated
+        no_more_feeds = min_feeds if adjustment_value < 0.0 else max_feeds
+        remaining_feeds = [feed for feed in feeds if feed not in no_more_feeds]
+        if not remaining_feeds:
+            return allocated
+        remaining_weight_denom = sum([weights[feed] for feed in remaining_feeds])
+        for feed in remaining_feeds:
+            allocated[feed] += adjustment_value * weights[feed] / remaining_weight_denom
+    return None
+
+
+def make_case(num_feeds: int, rng: np.random.Generator) -> tuple:
+    # skewed weights so that both limits are hit, the budget fits into the limits
+    weights = rng.pareto(1.5, num_feeds) + 0.05
+    weights /= weights.sum()
+    min_limit, max_limit = 400.0, 10000.0
+    total = rng.uniform(0.3, 0.7) * num_feeds * max_limit
+    return total, weights, min_limit, max_limit
+
+
+def bench(num_feeds: int, repeats: int, max_rounds: int, is_skip_legacy: bool) -> None:
+    rng = np.random.default_rng(num_feeds)
+    cases = [make_case(num_feeds, rng) for _ in range(repeats)]
+    _ = water_fill(*cases[0])  # warmup
+
+    start = time.perf_counter()
+    results = [water_fill(*case) for case in cases]
+    water_fill_ms = (time.perf_counter() - start) / repeats * 1000
+
+    legacy_ms = float("nan")
+    not_converged = 0
+    max_diff = 0.0
+    if not is_skip_legacy:
+        start = time.perf_counter()
+        legacy_results = []
+        for total, weights, min_limit, max_limit in cases:
+            feed_weights = {str(i): w for i, w in enumerate(weights.tolist())}
+            legacy_results.append(legacy_allocate(total, feed_weights, min_limit, max_limit, max_rounds))
+        legacy_ms = (time.perf_counter() - start) / repeats * 1000
+        for legacy, result in zip(legacy_results, results):
+            if legacy is None:
+                not_converged += 1
+            else:
+                max_diff = max(max_diff, float(np.max(np.abs(np.array(list(legacy.values())) - result))))
+
+    print(
+        f"{num_feeds:>6} feeds  water-filling: {water_fill_ms:>9.3f}ms  legacy: {legacy_ms:>10.3f}ms"
+        f"  legacy not converged: {not_converged}/{repeats}  max abs diff: {max_diff:.3e}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--feeds", type=int, nargs="+", default=[2, 10, 100, 1000, 5000], help="Numbers of feeds")
+    parser.add_argument("-r", "--repeats", type=int, default=20, help="Number of random cases per number of feeds")
+    parser.add_argument("-m", "--max_rounds", type=int, default=1000, help="Max rounds of the legacy loop")
+    parser.add_argument("--skip_legacy_from", type=int, default=2000, help="Skip the legacy loop from this number of feeds")
+    args = parser.parse_args()
+
+    for num_feeds in args.feeds:
+        bench(num_feeds, args.repeats, args.max_rounds, num_feeds >= args.skip_legacy_from)
@@ -0,0 +1,85 @@
+"""
+Compares the time-to-first-frame of an AhoyApp built when a viewer comes (cold) with a warm pipeline that runs into
+the parked sink until the viewer comes and only attaches a new webrtcbin (warm, the -wp flag of cmd/run.py). The time
+is measured from the pipeline creation or the sink swap to the first keyframe reaching the sink, as logged by AhoyApp.
+
+The source is a local live videotestsrc, so no camera or RTSP server is needed. The connector requests a keyframe
+once the peer is connected, here it is requested right after the swap, i.e., without the ICE and DTLS setup time.
+
+Usage: python first_frame.py -r 20 -w 2.0
+"""
+
+import argparse
+import statistics
+import time
+
+from gstwebrtcapp.apps.ahoyapp.app import AhoyApp
+from gstwebrtcapp.apps.app import GstWebRTCAppConfig
+from gstwebrtcapp.utils.base import LOGGER
+
+VIDEOTESTSRC_H264_PIPELINE = '''
+    webrtcbin name=webrtc latency=40 bundle-policy=max-bundle
+    videotestsrc name=source is-live=true pattern=ball ! video/x-raw,width=1920,height=1080,framerate=30/1 ! queue !
+    videoconvertscale n-threads=4 ! videorate skip-to-first=true !
+    capsfilter name=raw_capsfilter caps=video/x-raw !
+    x264enc name=encoder tune=zerolatency speed-preset=ultrafast threads=4 key-int-max=2560 b-adapt=false cabac=1 vbv-buf-capacity=120 ! queue !
+    rtph264pay name=payloader auto-header-extension=true aggregate-mode=zero-latency config-interval=1 mtu=1200 !
+    capsfilter name=payloader_capsfilter caps="application/x-rtp, media=(string)video, clock-rate=(int)90000, encoding-name=(string)H264, payload=(int)126" ! queue ! webrtc.
+'''
+
+
+def wait_first_frame(app: AhoyApp, timeout: float) -> float:
+    deadline = time.monotonic() + timeout
+    while app.first_frame_latency is None:
+        if time.monotonic() > deadline:
+            raise TimeoutError("no keyframe has reached the sink")
+        time.sleep(0.001)
+    return app.first_frame_latency * 1000
+
+
+def bench_cold(config: GstWebRTCAppConfig, timeout: float) -> float:
+    app = AhoyApp(config)
+    try:
+        return wait_first_frame(app, timeout)
+    finally:
+        app.terminate_pipeline()
+
+
+def bench_warm(config: GstWebRTCAppConfig, warmup: float, timeout: float) -> float:
+    app = AhoyApp(config)
+    try:
+        _ = wait_first_frame(app, timeout)
+        if not app.park_webrtcbin():
+            raise RuntimeError("can't park webrtcbin")
+        time.sleep(warmup)
+        # a viewer comes
+        if not app.swap_webrtcbin():
+            raise RuntimeError("can't swap the parked sink for webrtcbin")
+        _ = app.request_keyframe()
+        return wait_first_frame(app, timeout)
+    finally:
+        app.terminate_pipeline()
+
+
+def report(name: str, latencies: list) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    print(
+        f"{name:>5}: median {statistics.median(latencies):>7.1f}ms  p95 {p95:>7.1f}ms  "
+        f"min {latencies[0]:>7.1f}ms  max {latencies[-1]:>7.1f}ms  ({len(latencies)} runs)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--runs", type=int, default=20, help="Number of runs per mode")
+    parser.add_argument("-w", "--warmup", type=float, default=2.0, help="Time in seconds the warm pipeline is parked")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Max time in seconds to wait for a keyframe")
+    args = parser.parse_args()
+
+    LOGGER.disabled = True
+    config = GstWebRTCAppConfig(pipeline_str=VIDEOTESTSRC_H264_PIPELINE, gcc_settings=None)
+    cold = [bench_cold(config, args.timeout) for _ in range(args.runs)]
+    warm = [bench_warm(config, args.warmup, args.timeout) for _ in range(args.runs)]
+    report("cold", cold)
+    report("warm", warm)
@@ -0,0 +1,176 @@
+"""
+Soak test of the AhoyConnector session loop: thousands of simulated viewer reconnects served by one connector.
+The session tasks and their handlers are the real ones, only the GStreamer pipeline and the MQTT clients are
+replaced by fakes, so no Director, broker or media is needed. The memory, the number of asyncio tasks and of
+the GC-tracked objects are sampled along the way and must stay flat.
+
+Usage: python reconnect_soak.py -n 5000 -i 500 --fail-every 10
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import resource
+import time
+import tracemalloc
+
+from gstwebrtcapp.apps.ahoyapp.connector import AhoyConnector
+from gstwebrtcapp.utils.base import LOGGER
+from gstwebrtcapp.utils.bridge import SignalBridge
+
+
+class FakeAhoyApp:
+    # the parts of AhoyApp the session loop touches, the pipeline runs until an error is posted
+    def __init__(self) -> None:
+        self.is_running = True
+        self.error = asyncio.Event()
+        self.webrtcbin = None
+        self.viewers = {}
+        self.gcc_estimated_bitrates = SignalBridge("gcc_estimated_bitrates", conflate_interval=0.1)
+        self.data_channels_data = {}
+        self.data_channels_senders = {}
+
+    async def handle_pipeline(self) -> None:
+        # e.g., an error message on the bus
+        await self.error.wait()
+        raise RuntimeError("simulated pipeline error")
+
+    def is_webrtc_ready(self) -> bool:
+        return self.webrtcbin is not None
+
+    def park_webrtcbin(self) -> bool:
+        return True
+
+    def send_termination_message_to_bus(self) -> None:
+        self.is_running = False
+
+    def terminate_pipeline(self) -> None:
+        self.is_running = False
+
+
+class FakeMqttClient:
+    def __init__(self) -> None:
+        self.client = self
+        self.message_queues = {}
+
+    def is_connected(self) -> bool:
+        return True
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def publish(self, *_) -> None:
+        pass
+
+    def subscribe(self, topics) -> None:
+        for topic in topics:
+            self.message_queues.setdefault(topic, asyncio.Queue())
+
+
+def get_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        # peak RSS in KB on Linux, the only option without procfs
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def sample(i: int, connector: AhoyConnector) -> dict:
+    gc.collect()
+    return {
+        "reconnects": i,
+        "traced_kb": tracemalloc.get_traced_memory()[0] / 1e3,
+        "rss_mb": get_rss_mb(),
+        "tasks": len(asyncio.all_tasks()),
+        "objects": len(gc.get_objects()),
+        **connector.get_session_stats(),
+    }
+
+
+async def wait_for(condition, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("the connector has not reached the expected state")
+        await asyncio.sleep(0.001)
+
+
+async def soak(
+    num_reconnects: int,
+    interval: int,
+    fail_every: int,
+    session_time: float,
+    is_keep_pipeline: bool,
+) -> list:
+    connector = AhoyConnector(
+        server="http://127.0.0.1/",
+        api_key="soak",
+        feed_name="soak",
+        is_keep_pipeline=is_keep_pipeline,
+        max_session_retries=num_reconnects,
+        session_backoff=(0.0, 0.0),
+    )
+    connector.mqtts.publisher = FakeMqttClient()
+    connector.mqtts.subscriber = FakeMqttClient()
+    connector.loop = asyncio.get_running_loop()
+    session_loop = asyncio.create_task(connector.webrtc_coro())
+
+    samples = []
+    for i in range(1, num_reconnects + 1):
+        # a viewer comes: the pipeline is kept from the previous session or built anew and the answer is sent
+        if connector._app is None:
+            connector._app = FakeAhoyApp()
+        restarts = connector.session_stats["restarts"]
+        connector.is_running = True
+        connector.webrtcbin_sdp = "answer"
+        await wait_for(lambda: connector.webrtc_coro_control_task is not None)
+        await asyncio.sleep(session_time)
+        if fail_every > 0 and i % fail_every == 0:
+            # the pipeline fails, the session is torn down with the pipeline and retried after the backoff
+            connector._app.error.set()
+        else:
+            # the viewer leaves
+            connector._handle_signalling_message({"streamStopRequest": {"feedUuid": connector.feed_name}})
+        await wait_for(lambda: connector.session_stats["restarts"] > restarts)
+        if i == 1 or i % interval == 0:
+            samples.append(sample(i, connector))
+            print(", ".join(f"{k}: {v:.1f}" if isinstance(v, float) else f"{k}: {v}" for k, v in samples[-1].items()))
+
+    connector.terminate_webrtc_coro()
+    session_loop.cancel()
+    _ = await asyncio.gather(session_loop, return_exceptions=True)
+    connector.director.close()
+    return samples
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--num_reconnects", type=int, default=5000, help="Number of simulated reconnects")
+    parser.add_argument("-i", "--interval", type=int, default=500, help="Number of reconnects between the samples")
+    parser.add_argument("--fail-every", type=int, default=10, help="Every n-th session fails, 0 -- none")
+    parser.add_argument("-t", "--session_time", type=float, default=0.01, help="Duration of a session in seconds")
+    parser.add_argument("--no-keep-pipeline", action="store_true", help="Rebuild the pipeline for each session")
+    parser.add_argument("--max-growth-kb", type=float, default=256.0, help="Allowed growth of the traced memory")
+    args = parser.parse_args()
+
+    LOGGER.disabled = True
+    tracemalloc.start()
+    samples = asyncio.run(
+        soak(args.num_reconnects, args.interval, args.fail_every, args.session_time, not args.no_keep_pipeline)
+    )
+
+    # the first sample includes the one-off allocations (imports, caches), the growth is measured after it
+    first, last = samples[min(1, len(samples) - 1)], samples[-1]
+    growth_kb = last["traced_kb"] - first["traced_kb"]
+    print(
+        f"traced memory growth from {first['reconnects']} to {last['reconnects']} reconnects: {growth_kb:.1f}KB, "
+        f"tasks: {first['tasks']} -> {last['tasks']}, objects: {first['objects']} -> {last['objects']}"
+    )
+    if growth_kb > args.max_growth_kb or last["tasks"] > first["tasks"]:
+        raise SystemExit("FAILED: the session loop leaks")
+    print("OK: memory is flat")
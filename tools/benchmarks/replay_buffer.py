@@ -0,0 +1,74 @@
+"""
+Compares the default SB3 DictReplayBuffer with MmapDictReplayBuffer (float32 and float16 storage)
+in terms of the observation memory footprint and the add/sample throughput.
+
+Usage: python replay_buffer.py -s 100000 -o 20 -b 256
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from gymnasium import spaces
+import numpy as np
+from stable_baselines3.common.buffers import DictReplayBuffer
+
+from gstwebrtcapp.control.drl.buffers import MmapDictReplayBuffer
+
+
+def make_observation_space(num_obs: int) -> spaces.Dict:
+    # mimics ViewerSeqMDP: most keys are sequences of num_obs values scaled to [0,1]
+    keys = ["fractionLossRate", "fractionNackRate", "fractionPliRate", "fractionQueueingRtt", "fractionRtt"]
+    keys += ["interarrivalRttJitter", "lossRate", "rxGoodput", "txGoodput"]
+    obs_space = {k: spaces.Box(low=0, high=1, shape=(num_obs,), dtype=np.float32) for k in keys}
+    obs_space["bandwidth"] = spaces.Box(low=0, high=1, shape=(2,), dtype=np.float32)
+    obs_space["rttMean"] = spaces.Box(low=0, high=1, shape=(1,), dtype=np.float32)
+    obs_space["rttStd"] = spaces.Box(low=0, high=1, shape=(1,), dtype=np.float32)
+    return spaces.Dict(obs_space)
+
+
+def bench(name: str, buffer, obs_space: spaces.Dict, size: int, batch_size: int, samples: int) -> None:
+    action = np.zeros((1, 1), dtype=np.float32)
+    obs = {k: v[None, :] for k, v in obs_space.sample().items()}
+    start = time.perf_counter()
+    for _ in range(size):
+        buffer.add(obs, obs, action, np.zeros(1), np.zeros(1), [{}])
+    add_rate = size / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(samples):
+        buffer.sample(batch_size)
+    sample_rate = samples * batch_size / (time.perf_counter() - start)
+
+    if isinstance(buffer, MmapDictReplayBuffer):
+        nbytes = buffer.storage_nbytes()
+    else:
+        nbytes = sum(v.nbytes for v in buffer.observations.values()) * 2
+    print(f"{name:<20} obs memory: {nbytes / 1e6:>9.2f}MB  add: {add_rate:>10.0f}/s  sample: {sample_rate:>12.0f} transitions/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--size", type=int, default=100_000, help="Replay buffer size")
+    parser.add_argument("-o", "--num_obs", type=int, default=20, help="Number of values per sequence feature")
+    parser.add_argument("-b", "--batch_size", type=int, default=256, help="Batch size")
+    parser.add_argument("-n", "--samples", type=int, default=500, help="Number of sampled batches")
+    args = parser.parse_args()
+
+    obs_space = make_observation_space(args.num_obs)
+    action_space = spaces.Box(low=-1, high=1, shape=(1,), dtype=np.float32)
+    bench_args = (obs_space, args.size, args.batch_size, args.samples)
+
+    bench("DictReplayBuffer", DictReplayBuffer(args.size, obs_space, action_space, device="cpu"), *bench_args)
+    with tempfile.TemporaryDirectory() as tmp:
+        for is_half_precision in (False, True):
+            buffer = MmapDictReplayBuffer(
+                args.size,
+                obs_space,
+                action_space,
+                device="cpu",
+                mmap_path=os.path.join(tmp, f"rb_{is_half_precision}.mmap"),
+                is_half_precision=is_half_precision,
+            )
+            bench(f"Mmap {'float16' if is_half_precision else 'float32'}", buffer, *bench_args)
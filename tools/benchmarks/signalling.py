@@ -0,0 +1,274 @@
+"""
+Compares the per-feed signalling connections to the Director with one connection shared by all feeds of the process
+(DirectorSignallingMux, the -ss flag of cmd/run.py). A loopback Director stub runs in a child process: it answers the
+feed registrations over HTTP with aiortc peer connections, registers the next feeds of a shared connection over its
+signalling channel and sends every feed a streamStartRequest each --period seconds, which the feed answers.
+
+The feeds are stand-ins for AhoyConnector that keep only its signalling part: each feed runs in its own thread with
+its own event loop like the connectors of cmd/run.py, and either connects its own peer connection to the Director or
+attaches to the shared multiplexer. The open file descriptors and the threads of the feeds' process are counted once
+all feeds have got their first streamStartRequest, the CPU time of both processes is measured over --duration seconds
+after that. No GStreamer, MQTT broker or STUN server is needed.
+
+Usage: python signalling.py -n 10 100 300 -d 30 -p 1.0
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from aiortc import RTCConfiguration, RTCPeerConnection, RTCSessionDescription
+
+from gstwebrtcapp.apps.ahoyapp.director import DirectorClient
+from gstwebrtcapp.apps.ahoyapp.signalling import DirectorSignallingMux, connect_pc_out
+from gstwebrtcapp.utils.base import LOGGER
+
+API_KEY = "benchmark"
+
+
+def get_cpu_time(pid: int) -> float:
+    # utime + stime of the process in seconds
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def get_num_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+def get_num_threads() -> int:
+    return len(os.listdir("/proc/self/task"))
+
+
+class DirectorStub:
+    # the Director's side of the signalling: one aiortc peer connection per registration POST
+    def __init__(self, period: float) -> None:
+        self.period = period
+        self.loop = asyncio.new_event_loop()
+        self.pcs = []
+        # feed name -> signalling channel the feed is reached over
+        self.channels = {}
+        self.counters = {"connections": 0, "feeds": 0, "requests": 0, "responses": 0}
+
+    async def register(self, feed_name: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        pc = RTCPeerConnection(RTCConfiguration([]))
+        self.pcs.append(pc)
+
+        @pc.on("datachannel")
+        def on_datachannel(channel) -> None:
+            if channel.label != "control":
+                return
+            self.channels[feed_name] = channel
+            self.counters["feeds"] += 1
+
+            @channel.on("message")
+            def on_message(msg) -> None:
+                self.on_message(channel, json.loads(msg)["message"]["payload"])
+
+        await pc.setRemoteDescription(RTCSessionDescription(type="offer", sdp=body["sdp"]))
+        await pc.setLocalDescription(await pc.createAnswer())
+        self.counters["connections"] += 1
+        return {"sdp": pc.localDescription.sdp, "candidates": []}
+
+    def on_message(self, channel, payload: Dict[str, Any]) -> None:
+        if "feedRegistrationRequest" in payload:
+            request = payload["feedRegistrationRequest"]
+            self.channels[request["feedUuid"]] = channel
+            self.counters["feeds"] += 1
+            response = {"feedRegistrationResponse": {**request, "success": True}}
+            channel.send(json.dumps(response))
+        elif "streamStartResponse" in payload:
+            self.counters["responses"] += 1
+
+    async def request_streams(self) -> None:
+        while True:
+            await asyncio.sleep(self.period)
+            for feed_name, channel in list(self.channels.items()):
+                if channel.readyState == "open":
+                    request = {"streamStartRequest": {"uuid": str(self.counters["requests"]), "feedUuid": feed_name}}
+                    channel.send(json.dumps(request))
+                    self.counters["requests"] += 1
+
+    def serve(self, port_queue: multiprocessing.Queue) -> None:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["content-length"])))
+                feed_name = self.path.lstrip("/")
+                future = asyncio.run_coroutine_threadsafe(stub.register(feed_name, body), stub.loop)
+                self._reply(future.result(timeout=30.0))
+
+            def do_GET(self) -> None:
+                self._reply({**stub.counters, "cpu": get_cpu_time(os.getpid())})
+
+            def _reply(self, data: Dict[str, Any]) -> None:
+                payload = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self.request_streams(), self.loop)
+        port_queue.put(server.server_address[1])
+        server.serve_forever()
+
+
+def disable_logs() -> None:
+    LOGGER.disabled = True
+    for name in ("aioice", "aiortc"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
+def run_director_stub(period: float, port_queue: multiprocessing.Queue) -> None:
+    disable_logs()
+    DirectorStub(period).serve(port_queue)
+
+
+class Feed:
+    # the signalling part of AhoyConnector: it answers each streamStartRequest with a streamStartResponse
+    def __init__(self, feed_name: str, director: DirectorClient, mux: DirectorSignallingMux | None) -> None:
+        self.feed_name = feed_name
+        self.director = director
+        self.signalling_mux = mux
+        self.app_config = SimpleNamespace(codec="h264")
+        self.loop = None
+        self.pc_out = None
+        self.signalling_channel = None
+        self.requests = 0
+        self.stop_event = None
+        self.connected = threading.Event()
+
+    async def run(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        if self.signalling_mux is not None:
+            await self.signalling_mux.attach(self)
+        else:
+            self.pc_out = RTCPeerConnection(RTCConfiguration([]))
+            self.signalling_channel = self.pc_out.createDataChannel("control", ordered=True)
+            _ = self.pc_out.createDataChannel("telemetry", ordered=True)
+
+            @self.signalling_channel.on("message")
+            def on_message(msg) -> None:
+                self._handle_signalling_message(json.loads(msg))
+
+            await connect_pc_out(self.pc_out, self.director, self.feed_name, API_KEY, self.app_config.codec)
+        self.connected.set()
+        await self.stop_event.wait()
+        if self.pc_out is not None:
+            await self.pc_out.close()
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.stop_event.set)
+
+    def _on_pc_out_state_change(self, state: str) -> None:
+        pass
+
+    def _handle_signalling_message(self, msg: Dict[str, Any]) -> None:
+        if "streamStartRequest" in msg:
+            self.requests += 1
+            request = msg["streamStartRequest"]
+            response = {"streamStartResponse": {"success": True, "uuid": request["uuid"], "feedUuid": self.feed_name}}
+            self._send_signalling_message(response)
+
+    def _send_signalling_message(self, payload: Dict[str, Any]) -> None:
+        if self.signalling_mux is not None:
+            self.signalling_mux.send(self.feed_name, payload)
+            return
+        data = {"message": {"to": f"director.api_{API_KEY}", "payload": payload}}
+        self.signalling_channel.send(json.dumps(data))
+
+
+def get_stub_stats(director: DirectorClient) -> Dict[str, Any]:
+    return director.session.get(director.server + "stats", timeout=10.0).json()
+
+
+def bench(num_feeds: int, is_shared: bool, duration: float, period: float) -> Dict[str, Any]:
+    ctx = multiprocessing.get_context("spawn")
+    port_queue = ctx.Queue()
+    stub = ctx.Process(target=run_director_stub, args=(period, port_queue), daemon=True)
+    stub.start()
+    server = f"http://127.0.0.1:{port_queue.get(timeout=30.0)}/"
+    director = DirectorClient.get_shared(server)
+
+    fds_before, threads_before = get_num_fds(), get_num_threads()
+    mux = DirectorSignallingMux.get_shared(server, API_KEY, ice_servers=[]) if is_shared else None
+    feeds = [Feed(f"feed_{i}", director, mux) for i in range(num_feeds)]
+    threads = [threading.Thread(target=asyncio.run, args=(feed.run(),), daemon=True) for feed in feeds]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for feed in feeds:
+        if not feed.connected.wait(timeout=120.0):
+            raise TimeoutError(f"{feed.feed_name} has not connected")
+    while not all(feed.requests > 0 for feed in feeds):
+        if time.monotonic() - start > 120.0:
+            raise TimeoutError("not all feeds have got a streamStartRequest")
+        time.sleep(0.1)
+    setup_time = time.monotonic() - start
+
+    fds, num_threads = get_num_fds() - fds_before, get_num_threads() - threads_before
+    requests_before = sum(feed.requests for feed in feeds)
+    stub_before = get_stub_stats(director)
+    cpu_before = time.process_time()
+    time.sleep(duration)
+    cpu = time.process_time() - cpu_before
+    stub_after = get_stub_stats(director)
+    requests = sum(feed.requests for feed in feeds) - requests_before
+
+    for feed in feeds:
+        feed.stop()
+    for thread in threads:
+        thread.join(timeout=10.0)
+    if mux is not None:
+        mux.close()
+    director.close()
+    stub.terminate()
+    stub.join()
+    return {
+        "connections": stub_after["connections"],
+        "setup": setup_time,
+        "fds": fds,
+        "threads": num_threads,
+        "cpu": 100 * cpu / duration,
+        "stub_cpu": 100 * (stub_after["cpu"] - stub_before["cpu"]) / duration,
+        "requests": requests,
+        "responses": stub_after["responses"] - stub_before["responses"],
+    }
+
+
+def report(num_feeds: int, name: str, result: Dict[str, Any]) -> None:
+    print(
+        f"{num_feeds:>5} feeds {name:>8}: {result['connections']:>4} connections  setup {result['setup']:>6.1f}s  "
+        f"+{result['fds']:>5} fds  +{result['threads']:>4} threads  feeds CPU {result['cpu']:>6.1f}%  "
+        f"Director CPU {result['stub_cpu']:>6.1f}%  ({result['requests']} requests routed)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--num-feeds", type=int, nargs="+", default=[10, 100], help="Numbers of feeds")
+    parser.add_argument("-d", "--duration", type=float, default=30.0, help="CPU measurement window in seconds")
+    parser.add_argument("-p", "--period", type=float, default=1.0, help="Period of the Director's requests per feed")
+    args = parser.parse_args()
+
+    disable_logs()
+    for num_feeds in args.num_feeds:
+        for name, is_shared in (("per-feed", False), ("shared", True)):
+            report(num_feeds, name, bench(num_feeds, is_shared, args.duration, args.period))